@@ -5,14 +5,47 @@ budget management strategy.
 """
 
 # use streamlit
-import time
+import uuid
 import numpy as np
 import pandas as pd
 import streamlit as st
+from typing import Any, Callable, Optional
 from style.style import css
+from pkgs.budgets import BudgetTargets, read_budgets
+from pkgs.categorize import CategoryRules, read_rules
+from pkgs.currency import CurrencyConverter, read_fx_rates
+from pkgs.disk_cache import disk_ledger_cache
+from pkgs.drilldown import TransactionIndex
+from pkgs.forecasting import SpendForecast
 from pkgs.global_vars import today, past
+from pkgs.hierarchy import ExpenseHierarchy
 from pkgs.metrics_dataclasses import ExpenseMetric
-from pkgs.plots_dataclasses import ExpensePlot, ExpensePlotMonth
+from pkgs.plots_dataclasses import (
+    ExpensePlot,
+    ExpensePlotCity,
+    ExpensePlotHeatmap,
+    ExpensePlotMonth,
+)
+from pkgs.ingestion import IngestionJob, content_digest
+from pkgs.ledgers import (
+    DEFAULT_TENANT,
+    LedgerCache,
+    ledger_version,
+    shared_ledger_cache,
+    workspaces_enabled,
+)
+from pkgs.periods import PeriodCatalog
+from pkgs.profiling import start_rerun
+from pkgs.recurring import RecurringDetector
+from pkgs.backends import available_engines, build_backend
+from pkgs.search import SearchIndex
+from pkgs.render import (
+    display_ingestion_progress,
+    display_metric,
+    display_plot,
+    display_profiling_panel,
+    display_transactions,
+)
 
 
 # REQUIRED by Streamlit for downloading the data in the correct format:
@@ -21,42 +54,259 @@ def convert_df(df: pd.DataFrame) -> pd.DataFrame:
     return df.to_csv(sep=";", index=False).encode("utf-8")
 
 
+# the category of the bar clicked in a chart, on the axis of the categories, if any
+def selected_category(event, axis: str) -> Optional[str]:
+    points = event["selection"]["points"] if event else []
+    return points[0][axis] if points else None
+
+
+# show the transactions at the positions one page at a time: only the rows of the page are sent
+# to the browser, so that the largest categories stay responsive
+def show_transactions(
+    index: TransactionIndex, positions: np.ndarray, title: str, key: str, side=None
+) -> None:
+    side = st if side is None else side
+    pages = TransactionIndex.page_count(positions)
+    page = side.number_input(
+        f"Page (of {pages})", min_value=1, max_value=pages, value=1, step=1, key=key
+    )
+    display_transactions(index.page(positions, page, title=title), side=side)
+
+
+# stop waiting for the ledger being parsed: the job is cancelled, unless another session of the
+# tenant waits for it too, and the ledger is closed in this session. The ledger opened last among
+# the other ones of the session, if any is still in memory, is shown instead
+def cancel_ledger(ledger_cache: LedgerCache, tenant: str, session_id: str) -> None:
+    ledger_cache.release(tenant, st.session_state.pop("ledger_version"), session_id)
+    ledgers = st.session_state["ledgers"]
+    ledgers.pop(st.session_state.pop("ledger_name"), None)
+    st.session_state.pop("ingestion_job", None)
+    latest = ledger_cache.latest(tenant, ledgers, holder=session_id)
+    if latest is None:
+        st.session_state["ingestion_cancelled"] = True
+        return
+    st.session_state["ledger_name"], ledger = latest
+    st.session_state["ingestion_job"] = ledger.job
+    st.session_state["ledger_version"] = ledger.version
+
+
+# the value of a per-ledger cache for the key, built only if missing: the key starts with the
+# version of the ledger and ends with its currency conversion. The values of the other conversions
+# are kept, to switch base currency back and forth without building them again, and the others
+# dropped
+def ledger_cached(name: str, key: tuple, build: Callable[[], Any]) -> Any:
+    cache = st.session_state.setdefault(f"{name}_cache", {})
+    if key in cache:
+        profiler.count_cache(name, hit=True)
+        return cache[key]
+    for other in [other for other in cache if other[:-1] != key[:-1]]:
+        del cache[other]
+    cache[key] = build()
+    profiler.count_cache(name, hit=False)
+    return cache[key]
+
+
 # --- Main code --- #
 
 # set the page default setting to wide
 st.set_page_config(layout="wide", page_title="Dashboard", page_icon="🔎")
 
+# start collecting the timing of this rerun; the allocations are traced only when the
+# profiling panel is shown, as tracing slows down the whole script
+profiler = start_rerun(track_allocations=st.session_state.get("show_profiling", False))
+
 # sidebar
 with st.sidebar:
     # add sidebar title
     st.sidebar.title("Expense Tracker")
 
+    session_id = st.session_state.setdefault("session_id", uuid.uuid4().hex)
+    # the user, or else the workspace of the team (only if enabled, as anyone can type it), owning
+    # the ledgers of the session: the sessions of the same tenant share the ledgers they open,
+    # within the memory quota of the tenant. Without either, the session is its own tenant
+    user = st.user.get("email")
+    shared_tenant = bool(user) or workspaces_enabled()
+    if user:
+        tenant = user
+    elif shared_tenant:
+        tenant = st.text_input(
+            "Workspace",
+            value=DEFAULT_TENANT,
+            key="workspace",
+            help="The sessions of the same workspace opening the same file share its parsing.",
+        )
+    else:
+        tenant = f"session:{session_id}"
+    ledger_cache = shared_ledger_cache()
+    # the parsed ledgers kept on disk across the restarts of the server, only if enabled
+    disk_cache = disk_ledger_cache()
+
     # allow only .csv and .xlsx files to be uploaded
     uploaded_file = st.file_uploader("Upload a file (.csv OR .xlsx)", type=["csv", "xlsx"])
 
+    # add the next upload to the current ledger, without the transactions already in it,
+    # instead of replacing the ledger: for overlapping exports of the same account
+    merge_uploads = st.toggle(
+        "Merge with the previous upload",
+        key="merge_uploads",
+        help="The transactions of the new file that are already in the ledger (same date, value, "
+        "store and expense type) are dropped, so they are not counted twice.",
+    )
+
+    # the rules to categorize the raw bank exports, whose rows have no expense_category
+    rules_file = st.file_uploader(
+        "Upload the categorization rules (.csv OR .xlsx)",
+        type=["csv", "xlsx"],
+        key="rules_file",
+        help='One rule per row, with the columns "match" (exact, contains or regex), "pattern", '
+        '"expense_category" and "expense_type": the rows without a category get the one of the '
+        "first rule matching their store.",
+    )
+    rules_file_id = rules_file.file_id if rules_file is not None else None
+    if st.session_state.get("category_rules_id") != rules_file_id:
+        category_rules, category_rules_version = None, ""
+        if rules_file is not None:
+            try:
+                category_rules = CategoryRules(
+                    read_rules(rules_file.getvalue(), rules_file.name.split(".")[-1].lower())
+                )
+            except Exception as error:  # reported to the user, as for the ledger
+                st.error(f"The categorization rules could not be read: {error}", icon="🚨")
+                st.stop()
+            category_rules_version = content_digest(rules_file.getvalue()).hex()
+        st.session_state["category_rules"] = category_rules
+        st.session_state["category_rules_version"] = category_rules_version
+        st.session_state["category_rules_id"] = rules_file_id
+        # the ledger has to be categorized again, from scratch, with the new rules
+        st.session_state.pop("ingestion_file_id", None)
+        st.session_state.pop("ingested_file", None)
+
+    # the ledgers opened in this session, by name, and the one shown
+    ledgers = st.session_state.setdefault("ledgers", {})
+    ledger_name = st.session_state.get("ledger_name")
+
     # Check if file was uploaded
-    if uploaded_file is not None:
+    if (
+        uploaded_file is not None
+        and st.session_state.get("ingestion_file_id") != uploaded_file.file_id
+    ):
         # get only the extension, either csv or txt or xlsx
         file_extension = uploaded_file.name.split(".")[-1].lower()
-        if file_extension == "csv":
-            # load the expenses file
-            df_expenses = pd.read_csv(
-                uploaded_file,
-                dtype={
-                    "value": np.float64
-                },  # convert value to float, otherwise the delta does not accept integer
-                sep=";",
-                parse_dates=[
-                    "date"
-                ],  # this parse the date column. There is no datetime dtype to be set for read_csv as csv files can only contain strings, integers and floats.
-                dayfirst=True,  # read the date as dd/mm/yyyy, and not as mm/dd/yyyy
-            )
-        else:
-            # load the expenses file
-            df_expenses = pd.read_excel(
-                uploaded_file,
-                converters={"date": pd.to_datetime},
+        data = uploaded_file.getvalue()
+        base = st.session_state.get("ingested_file")
+        # the version of the ledger: the content of the file, the rules, and the ledger it is
+        # merged into (if any). The sessions of the tenant opening the same version share its job
+        version = ledger_version(
+            data,
+            file_extension,
+            rules_version=st.session_state.get("category_rules_version", ""),
+            base_version=st.session_state.get("ingested_version", "")
+            if merge_uploads and base is not None
+            else "",
+        )
+        ledger = ledger_cache.get(tenant, version, holder=session_id)
+        profiler.count_cache("shared_ledgers", hit=ledger is not None)
+        if ledger is None and disk_cache is not None:
+            # a ledger parsed before the restart of the server is read back from its file
+            restored_job = disk_cache.load(version, data, file_extension)
+            profiler.count_cache("disk_ledgers", hit=restored_job is not None)
+            if restored_job is not None:
+                ledger = ledger_cache.put(tenant, uploaded_file.name, version, restored_job)
+        if ledger is None:
+            # parse the file in a background worker: the job is kept in the shared cache and in
+            # the session state, so the file is parsed once per ledger and not again at every
+            # rerun. If the new upload only appends rows to the previous one, just the new rows
+            # are parsed
+            ingestion_job = IngestionJob(
+                data,
+                file_extension,
+                base=base,
+                rules=st.session_state.get("category_rules"),
+                deduplicate=merge_uploads,
+            ).start()
+            ledger = ledger_cache.put(
+                tenant, uploaded_file.name, version, ingestion_job, holder=session_id
             )
+            # only the session parsing the file reports how it was parsed
+            st.session_state["ingestion_started_job"] = ingestion_job
+        # stop waiting for the ledger shown until now: if it is still being parsed and no other
+        # session waits for it, it is cancelled, and closed
+        previous_version = st.session_state.get("ledger_version")
+        if (
+            previous_version is not None
+            and previous_version != version
+            and ledger_cache.release(tenant, previous_version, session_id)
+        ):
+            ledgers.pop(ledger_name, None)
+        ledgers[uploaded_file.name] = version
+        ledger_name = uploaded_file.name
+        st.session_state["ingestion_job"] = ledger.job
+        st.session_state["ledger_version"] = version
+        st.session_state["ingestion_file_id"] = uploaded_file.file_id
+        st.session_state.pop("ingestion_cancelled", None)
+        profiler.count_cache("ingestion", hit=False)
+    elif ledger_name is not None:
+        profiler.count_cache("ingestion", hit=True)
+
+    # switch between the ledgers opened in this session: a ledger still in the shared cache is
+    # shown at once, without uploading it again
+    if len(ledgers) > 1:
+        selected_ledger = st.selectbox(
+            "Ledger",
+            list(ledgers),
+            index=list(ledgers).index(ledger_name) if ledger_name in ledgers else None,
+            help="The ledgers opened in this session.",
+        )
+        if selected_ledger is not None and selected_ledger != ledger_name:
+            ledger = ledger_cache.get(tenant, ledgers[selected_ledger], holder=session_id)
+            if ledger is None:
+                st.warning(
+                    f"{selected_ledger} is no longer in memory: please, upload it again.", icon="⚠️"
+                )
+                ledgers.pop(selected_ledger)
+            else:
+                # stop waiting for the ledger shown until now: if it is still being parsed and no
+                # other session waits for it, it is cancelled, and closed
+                if ledger_cache.release(tenant, st.session_state["ledger_version"], session_id):
+                    ledgers.pop(ledger_name)
+                ledger_name = selected_ledger
+                st.session_state["ingestion_job"] = ledger.job
+                st.session_state["ledger_version"] = ledger.version
+    st.session_state["ledger_name"] = ledger_name
+    ingestion_job = st.session_state.get("ingestion_job") if ledger_name is not None else None
+    if shared_tenant:
+        st.caption(
+            f"Ledgers of {tenant} in memory: {len(ledger_cache.ledgers(tenant))}, "
+            f"{ledger_cache.usage(tenant) / 2**20:.0f} MB of "
+            f"{ledger_cache.tenant_quota / 2**20:.0f} MB."
+        )
+
+    # the daily FX rates, to convert a ledger with a "currency" column into a single currency
+    fx_rates_file = st.file_uploader(
+        "Upload the FX rates (.csv OR .xlsx)",
+        type=["csv", "xlsx"],
+        key="fx_rates_file",
+        help='Only for ledgers with a "currency" column: one rate per row, with the columns '
+        '"date", "currency" and "rate" (the value of one unit of the currency in a common currency).',
+    )
+
+    # the budget targets, compared with the expenses of each month
+    budgets_file = st.file_uploader(
+        "Upload the budgets (.csv OR .xlsx)",
+        type=["csv", "xlsx"],
+        key="budgets_file",
+        help='One target per row, with the columns "expense_category" and "budget", and optionally '
+        '"year" and "month" (leave them empty for a target that holds for every month).',
+    )
+
+    # search the stores, expense types and cities of the ledger
+    search_query = st.text_input(
+        "Search the transactions",
+        key="search_query",
+        placeholder="lidl or billa in vienna over 50 in 2024",
+        help='Stores, expense types and cities: "or" joins two of them, "in" is followed by a city '
+        'or a year, "over" and "under" by a value. The totals are shown in the Overall Overview.',
+    ).strip()
 
     # adding a download button to download sample of the data in a csv file
     data_example_df = pd.read_csv(
@@ -86,19 +336,129 @@ with st.sidebar:
         "[Documentation page](https://github.com/alessandro-maccario/expense_tracker_streamlit)"
     )
 
-# If the uploaded_file is not None, then show the dashboard;
+    # compute the totals with pandas, or with an embedded SQL database or Polars
+    query_engine = st.selectbox("Query engine", available_engines(), key="query_engine")
+
+    # show the time spent in each step of the rerun, at the bottom of the sidebar
+    st.toggle("Show profiling panel", key="show_profiling")
+
+# While the file is being parsed, show the progress and the partial totals instead of the dashboard
+if ingestion_job is not None:
+    if not ingestion_job.done:
+        display_ingestion_progress(
+            ingestion_job, on_cancel=lambda: cancel_ledger(ledger_cache, tenant, session_id)
+        )
+        st.stop()
+    if ingestion_job.error is not None:
+        st.error(f"The file could not be read: {ingestion_job.error}", icon="🚨")
+        st.stop()
+    if ingestion_job.cancelled:
+        st.warning("The upload has been cancelled. Please, upload the file again.", icon="⚠️")
+        st.stop()
+
+    # the ledger is sorted by date once, by the job, and not again at every rerun
+    df_expenses = ingestion_job.result()
+    aggregates = ingestion_job.aggregates
+    # in the first rerun after the job is done (or after switching ledger): report the parsing
+    # time, and keep the ingested file to parse only the new rows of the next upload of the ledger
+    if st.session_state.get("ingestion_reported_job") is not ingestion_job:
+        st.session_state["ingestion_reported_job"] = ingestion_job
+        st.session_state["ingested_file"] = ingestion_job.ingested()
+        st.session_state["ingested_version"] = st.session_state["ledger_version"]
+        # the parsing is reported by the session that parsed the file, not by those sharing it
+        if st.session_state.pop("ingestion_started_job", None) is ingestion_job:
+            profiler.add("ingestion.background", ingestion_job.seconds)
+            if disk_cache is not None:
+                with profiler.timed("ingestion.disk_cache"):
+                    disk_cache.store(st.session_state["ledger_version"], ingestion_job)
+            if ingestion_job.incremental:
+                new_rows = len(df_expenses) - len(ingestion_job.base.df)
+                st.toast(f"Same ledger as the previous upload: only {new_rows} new rows parsed.")
+            if ingestion_job.merged or ingestion_job.duplicates:
+                st.toast(
+                    f"{ingestion_job.duplicates} duplicate transactions already in the ledger "
+                    "dropped."
+                )
+
+    # the dates and values that could not be read are left out of every total: list them
+    if ingestion_job.report.total:
+        st.warning(
+            f"{ingestion_job.report.total} malformed values in the file "
+            f"({', '.join(f'{count} in {column}' for column, count in ingestion_job.report.counts.items())}): "
+            "their rows are left out of the totals.",
+            icon="⚠️",
+        )
+        with st.expander("Malformed values"):
+            st.dataframe(ingestion_job.report.frame(), hide_index=True)
+
+    # convert a multi-currency ledger into the base currency chosen: the rows are converted
+    # once per ledger, FX rates file and base currency, and not again at every rerun. The caches
+    # built on the values of the ledger are keyed on the conversion, None if not converted
+    conversion = None
+    if "currency" in df_expenses.columns and fx_rates_file is not None:
+        if (
+            st.session_state.get("currency_converter_job") is not ingestion_job
+            or st.session_state.get("currency_converter_rates_id") != fx_rates_file.file_id
+        ):
+            try:
+                fx_rates = read_fx_rates(
+                    fx_rates_file.getvalue(), fx_rates_file.name.split(".")[-1].lower()
+                )
+            except Exception as error:  # reported to the user, as for the ledger
+                st.error(f"The FX rates could not be read: {error}", icon="🚨")
+                st.stop()
+            st.session_state["currency_converter"] = CurrencyConverter(df_expenses, fx_rates)
+            st.session_state["currency_converter_job"] = ingestion_job
+            st.session_state["currency_converter_rates_id"] = fx_rates_file.file_id
+            profiler.count_cache("currency_converter", hit=False)
+        else:
+            profiler.count_cache("currency_converter", hit=True)
+        currency_converter = st.session_state["currency_converter"]
+
+        # by default, the currency of most of the rows
+        currencies = currency_converter.currencies()
+        base_currency = st.sidebar.selectbox(
+            "Base currency",
+            currencies,
+            index=currencies.index(currency_converter.default_base()),
+            key="base_currency",
+        )
+        converted_ledger = currency_converter.convert(base_currency)
+        conversion = (fx_rates_file.file_id, base_currency)
+        df_expenses, aggregates = converted_ledger.df, converted_ledger.aggregates
+        if converted_ledger.missing_rates:
+            st.warning(
+                f"{converted_ledger.missing_rates} rows could not be converted into {base_currency}: "
+                "there is no FX rate for their currency on or before their date.",
+                icon="⚠️",
+            )
+    elif "currency" in df_expenses.columns and df_expenses["currency"].nunique() > 1:
+        st.info(
+            "The ledger has several currencies: upload the FX rates in the sidebar "
+            "to convert them into a single one.",
+            icon="💱",
+        )
+
+# If a ledger is open, then show the dashboard;
 # otherwise show the hint to upload it.
-if uploaded_file is not None:
+if ingestion_job is not None:
     # define three tabs where to insert the plots
-    overall_overview_tab1, monthly_trend_tab2, monthly_comparison_tab3, monthly_breakdown_tab4 = (
-        st.tabs(
-            [
-                "📈 Overall Overview",
-                "👓 Monthly Overview",
-                "👨🏼‍🤝‍👨🏼 Monthly comparison",
-                "🧾 Monthly Breakdown",
-            ]
-        )
+    (
+        overall_overview_tab1,
+        monthly_trend_tab2,
+        monthly_comparison_tab3,
+        monthly_breakdown_tab4,
+        heatmaps_tab5,
+        cities_tab6,
+    ) = st.tabs(
+        [
+            "📈 Overall Overview",
+            "👓 Monthly Overview",
+            "👨🏼‍🤝‍👨🏼 Monthly comparison",
+            "🧾 Monthly Breakdown",
+            "🗓 Spending Heatmaps",
+            "🌍 Cities",
+        ]
     )
 
     # if dataframe is completely empty (no data at all), then show a warning to the user
@@ -107,11 +467,68 @@ if uploaded_file is not None:
             "Empty dataframe! Please, provide a dataframe with data inside it as shown in the _Download sample data as CSV_ button!",
             icon="⚠️",
         )
-        with st.spinner("Hungry for data, please upload a file that contains information..."):
-            time.sleep(500)
+        # stop the script here: there is nothing to show until a new file is uploaded
+        st.stop()
+
+    # the budget targets, read once per budgets file
+    budget_targets = None
+    if budgets_file is not None:
+        if st.session_state.get("budget_targets_id") != budgets_file.file_id:
+            try:
+                st.session_state["budget_targets"] = BudgetTargets(
+                    read_budgets(budgets_file.getvalue(), budgets_file.name.split(".")[-1].lower())
+                )
+            except Exception as error:  # reported to the user, as for the ledger
+                st.error(f"The budgets could not be read: {error}", icon="🚨")
+                st.stop()
+            st.session_state["budget_targets_id"] = budgets_file.file_id
+        budget_targets = st.session_state["budget_targets"]
+
+    # the caches of the ledger shown: the indexes built on its values are built once per
+    # conversion too, those built on its dates and categories only once per ledger
+    version = st.session_state["ledger_version"]
+
+    # the years and months with data, and their rows in the sorted ledger, once per ledger
+    periods = ledger_cached(
+        "period_catalog", (version, None), lambda: PeriodCatalog.from_dataframe(df_expenses)
+    )
+
+    # the recurring expenses (rent, subscriptions, utilities...), found once per ledger
+    recurring_expenses = ledger_cached(
+        "recurring_expenses",
+        (version, conversion),
+        lambda: RecurringDetector().detect(df_expenses),
+    )
 
-    # sort the data by date
-    df_expenses.sort_values(by=["date"], inplace=True)
+    # the index of the transactions behind the bars of the charts, built once per ledger
+    transaction_index = ledger_cached(
+        "transaction_index",
+        (version, conversion),
+        lambda: TransactionIndex.from_dataframe(df_expenses),
+    )
+
+    # the inverted index of the stores, expense types and cities, built once per ledger:
+    # a search is then a lookup instead of a scan of the string columns
+    search_index = ledger_cached(
+        "search_index", (version, conversion), lambda: SearchIndex.from_dataframe(df_expenses)
+    )
+
+    # the category / type / store hierarchy, remembered per timeframe for the whole ledger
+    expense_hierarchy = ledger_cached(
+        "expense_hierarchy", (version, conversion), lambda: ExpenseHierarchy(df_expenses)
+    )
+
+    # the forecast model, fitted once per ledger: at every rerun, a forecast is a lookup
+    spend_forecast = ledger_cached(
+        "spend_forecast", (version, conversion), lambda: SpendForecast.fit(aggregates)
+    )
+
+    # load the ledger into the query engine once per ledger and engine, and reuse it at every rerun
+    def load_backend():
+        with profiler.timed("ingestion.query_backend"):
+            return build_backend(query_engine, df_expenses)
+
+    backend = ledger_cached("query_backend", (version, query_engine, conversion), load_backend)
 
     # Define what has to be shown in the first tab
     with overall_overview_tab1:
@@ -126,22 +543,10 @@ if uploaded_file is not None:
         with select_category_dropdown:
             # define the categories that show some values in it (exclude those categories that are
             # empty with no value). Sort the list from higher to lower sum of expenses.
-            # Get only those categories avalailable in the specific timeframe.
-            df_expenses_filtered_categories = df_expenses.loc[
-                (df_expenses["date"].dt.date >= past_date)
-                & (df_expenses["date"].dt.date < today_date)
-            ]
-            categories_with_data = (
-                round(
-                    df_expenses_filtered_categories.groupby(["expense_category"])["value"].sum(),
-                    2,
-                )
-            ).sort_values(ascending=False)
+            # Get only those categories avalailable in the specific timeframe: they are looked up
+            # in the per-day aggregates built at ingestion, the same used by the metrics below.
+            categories_with_data = aggregates.window_category_totals(past_date, today_date)
 
-            # remove the "income" value
-            categories_with_data = categories_with_data[
-                ~categories_with_data.index.isin(["income", "investment", "savings"])
-            ]
             # let the user select the category
             category_selection = select_category_dropdown.selectbox(
                 "Select the category:", categories_with_data.index.unique()
@@ -163,8 +568,15 @@ if uploaded_file is not None:
                 past_date,
                 delta_color="inverse",
                 help_text="vs. previous 30 days",
+                backend=backend,
+                aggregates=aggregates,
             )
-            metric1_total_amount_spent.compute_metrics()
+            display_metric(metric1_total_amount_spent.compute_metrics())
+            # where the month of the "To" date will end up, from the fitted forecast model
+            forecast_report = spend_forecast.report(today_date.year, today_date.month, as_of=today)
+            display_metric(metric1_total_amount_spent.metric_month_end_forecast(forecast_report))
+            with st.expander("Forecast per category"):
+                st.dataframe(forecast_report.frame, hide_index=True)
         with metric2_total_amount_spent_category:
             # instantiate the class
             metric2_total_amount_spent_category = ExpenseMetric(
@@ -172,8 +584,22 @@ if uploaded_file is not None:
                 today_date,
                 past_date,
                 # label="Available income",
+                backend=backend,
+                aggregates=aggregates,
             )
-            metric2_total_amount_spent_category.compute_metrics_by_category(category_selection)
+            display_metric(
+                metric2_total_amount_spent_category.compute_metrics_by_category(category_selection)
+            )
+            # the budget of the category for the month of the "To" date, from the monthly aggregates
+            if budget_targets is not None:
+                budget_metric = metric2_total_amount_spent_category.metric_budget_by_category(
+                    budget_targets.report(
+                        aggregates.monthly, today_date.year, today_date.month, as_of=today
+                    ),
+                    category_selection,
+                )
+                if budget_metric is not None:
+                    display_metric(budget_metric)
 
         with metric3_income:
             # instantiate the class
@@ -182,8 +608,57 @@ if uploaded_file is not None:
                 today_date,
                 past_date,
                 # label="Available income",
+                backend=backend,
+                aggregates=aggregates,
+            )
+            display_metric(metric3_income.compute_total_income())
+
+        # --- Recurring vs. one-off expenses --- #
+        metric4_recurring, metric5_one_off, recurring_series = st.columns(3)
+        recurring_metrics = metric3_income.compute_recurring_split(recurring_expenses.rows)
+        display_metric(recurring_metrics[0], side=metric4_recurring)
+        display_metric(recurring_metrics[1], side=metric5_one_off)
+        with recurring_series.expander(
+            f"{len(recurring_expenses.series)} recurring expenses detected"
+        ):
+            st.dataframe(recurring_expenses.series, hide_index=True)
+
+        # --- Unusual days and transactions, kept up to date while ingesting --- #
+        metric6_unusual_days, metric7_unusual_transactions, unusual_list = st.columns(3)
+        anomaly_metrics = metric1_total_amount_spent.compute_anomalies(aggregates.anomalies)
+        display_metric(anomaly_metrics[0], side=metric6_unusual_days)
+        display_metric(anomaly_metrics[1], side=metric7_unusual_transactions)
+        with unusual_list.expander("Unusual spending in the timeframe"):
+            st.dataframe(aggregates.anomalies.days_between(past_date, today_date), hide_index=True)
+            st.dataframe(
+                aggregates.anomalies.transactions_between(past_date, today_date), hide_index=True
             )
-            metric3_income.compute_total_income()
+
+        # --- Transactions matching the search of the sidebar --- #
+        if search_query:
+            try:
+                search_rows = search_index.search(search_query)
+            except ValueError as error:
+                st.warning(f"The search could not be understood: {error}", icon="🔎")
+            else:
+                metric8_search_timeframe, metric9_search_total, search_list = st.columns(3)
+                # the totals of the metrics, computed on the matching rows only
+                metric_search = ExpenseMetric(
+                    df_expenses.iloc[search_rows].reset_index(drop=True),
+                    today_date,
+                    past_date,
+                    label_text="Expenses matching the search",
+                )
+                search_metrics = metric_search.compute_search_metrics()
+                display_metric(search_metrics[0], side=metric8_search_timeframe)
+                display_metric(search_metrics[1], side=metric9_search_total)
+                with search_list.expander(f"{len(search_rows)} transactions match the search"):
+                    show_transactions(
+                        transaction_index,
+                        search_rows,
+                        title=search_query,
+                        key=f"search_page_{search_query}",
+                    )
 
         # ###################################################
         # --- Plots --- #
@@ -194,31 +669,67 @@ if uploaded_file is not None:
             df_expenses,
             today_date,
             past_date,
+            backend=backend,
         )
 
         with bar_plot_expense_per_category:
-            plot1 = plot_bar_chart_category.plot_bar_chart_category_total(
-                df_expenses, today_date, past_date
+            # click on a bar to list the transactions of its category in the timeframe
+            plot1 = display_plot(
+                plot_bar_chart_category.plot_bar_chart_category_total(
+                    df_expenses, today_date, past_date
+                ),
+                on_select="rerun",
+                selection_mode="points",
+                key="category_total_plot",
             )
         with donut_chart_expenses_per_store:
-            plot2 = plot_bar_chart_category.plot_donut_chart_store_total(
-                df_expenses, today_date, past_date
+            plot2 = display_plot(
+                plot_bar_chart_category.plot_donut_chart_store_total(
+                    df_expenses, today_date, past_date
+                )
             )
 
+        clicked_category = selected_category(plot1, "x")
+        if clicked_category is not None:
+            show_transactions(
+                transaction_index,
+                transaction_index.positions(clicked_category, past_date, today_date),
+                title=f"{clicked_category.title()} - {past_date} to {today_date}",
+                key=f"category_total_page_{clicked_category}",
+            )
+
+        # --- Category, type and store of the expenses --- #
+        hierarchy_chart = st.radio(
+            "Expenses per category, type and store",
+            ["sunburst", "treemap"],
+            format_func=str.capitalize,
+            horizontal=True,
+            key="hierarchy_chart",
+        )
+        display_plot(
+            plot_bar_chart_category.plot_hierarchy_category_type_store(
+                expense_hierarchy.totals(past_date, today_date), kind=hierarchy_chart
+            )
+        )
+
     # ########################################################
     # --- Bar plot per year and months --- #
 
     # selection box for letting the user filter the year
     choose_year = monthly_trend_tab2.selectbox(
         "Choose the year",
-        df_expenses["year"].unique(),
+        periods.years,
     )
 
     # instantiate the class
-    plot_bar_chart_year_month = ExpensePlotMonth(df_expenses, choose_year, side=monthly_trend_tab2)
+    plot_bar_chart_year_month = ExpensePlotMonth(
+        df_expenses, choose_year, side=monthly_trend_tab2, backend=backend, periods=periods
+    )
 
-    plot3 = plot_bar_chart_year_month.plot_bar_chart_expenses_per_month(
-        df_expenses, choose_year, side=monthly_trend_tab2
+    plot3 = display_plot(
+        plot_bar_chart_year_month.plot_bar_chart_expenses_per_month(df_expenses, choose_year),
+        side=monthly_trend_tab2,
+        theme="streamlit",
     )
 
     #####################################
@@ -232,26 +743,22 @@ if uploaded_file is not None:
         with selector_year1:
             year_selection = selector_year1.selectbox(
                 "Monthly Report - Year - Left",
-                df_expenses["year"].unique(),
+                periods.years,
             )
-            # filter the df based on the selection of the user
-            df_monthly_report_choose_year = df_expenses[df_expenses["year"] == year_selection]
-            # selection box for letting the user filter the month
+            # selection box for letting the user filter the month, among those of the year selected
             monthly_report_choose_month = selector_month1.selectbox(
                 "Monthly Report - Month - Left",
-                df_monthly_report_choose_year["month"].unique(),
+                periods.months_of(year_selection),
             )
         with selector_year2:
             year_selection2 = selector_year2.selectbox(
                 "Monthly Report - Year - Right",
-                df_expenses["year"].unique(),
+                periods.years,
             )
-            # filter the df based on the selection of the user
-            df_monthly_report_choose_year1 = df_expenses[df_expenses["year"] == year_selection2]
-            # selection box for letting the user filter the month
+            # selection box for letting the user filter the month, among those of the year selected
             monthly_report_choose_month1 = selector_month2.selectbox(
                 "Monthly Report - Month - Right",
-                df_monthly_report_choose_year1["month"].unique(),
+                periods.months_of(year_selection2),
             )
 
         # create the columns for the metrics
@@ -266,11 +773,15 @@ if uploaded_file is not None:
             df_expenses,
             today_date,
             past_date,
+            backend=backend,
+            aggregates=aggregates,
         )
         total_expenses_timeframe_left_metric = ExpenseMetric(
             df_expenses,
             today_date,
             past_date,
+            backend=backend,
+            aggregates=aggregates,
         )
 
         # calculate total amount spent for the right side metric
@@ -307,14 +818,18 @@ if uploaded_file is not None:
                 df_expenses,
                 today_date,
                 past_date,
+                backend=backend,
+                aggregates=aggregates,
             )
-            metric_total_expenses_class_left_metric.metric_total_expenses_timeframe_class(
-                metric_total_expenses_class_left_metric.total_expenses_timeframe(
-                    df_expenses,
-                    year_selection,
-                    monthly_report_choose_month,
+            display_metric(
+                metric_total_expenses_class_left_metric.metric_total_expenses_timeframe_class(
+                    metric_total_expenses_class_left_metric.total_expenses_timeframe(
+                        df_expenses,
+                        year_selection,
+                        monthly_report_choose_month,
+                    ),
+                    delta=difference_right2left,
                 ),
-                delta=difference_right2left,
                 side=monthly_report_metric_left_side,
             )
         # set the metric on the right side in the Monthly Comparison tab
@@ -323,14 +838,18 @@ if uploaded_file is not None:
                 df_expenses,
                 today_date,
                 past_date,
+                backend=backend,
+                aggregates=aggregates,
             )
-            metric_total_expenses_class_right_metric.metric_total_expenses_timeframe_class(
-                metric_total_expenses_class_right_metric.total_expenses_timeframe(
-                    df_expenses,
-                    year_selection2,
-                    monthly_report_choose_month1,
+            display_metric(
+                metric_total_expenses_class_right_metric.metric_total_expenses_timeframe_class(
+                    metric_total_expenses_class_right_metric.total_expenses_timeframe(
+                        df_expenses,
+                        year_selection2,
+                        monthly_report_choose_month1,
+                    ),
+                    delta=difference_left2right,
                 ),
-                delta=difference_left2right,
                 side=monthly_report_metric_right_side,
             )
 
@@ -342,54 +861,156 @@ if uploaded_file is not None:
 
         # instantiate the class
         plot_bar_chart_category = ExpensePlotMonth(
-            df_expenses, year_selection, monthly_report_choose_month, monthly_report_plot_left_side
+            df_expenses,
+            year_selection,
+            monthly_report_choose_month,
+            monthly_report_plot_left_side,
+            backend=backend,
+            periods=periods,
         )
 
         with monthly_report_plot_left_side:
             # set up the plots
             # display the plot the stacked bar chart - plot 1
-            plot_bar_chart_category.monthly_report_plot(
-                df_expenses,
-                year_selection,
-                monthly_report_choose_month,
-                monthly_report_plot_left_side,
+            monthly_report_left = display_plot(
+                plot_bar_chart_category.monthly_report_plot(
+                    df_expenses,
+                    year_selection,
+                    monthly_report_choose_month,
+                ),
+                side=monthly_report_plot_left_side,
+                key="monthly_report_plot_left",
+                on_select="rerun",
+                selection_mode="points",
             )
 
         with monthly_report_plot_right_side:
             # display the plot the stacked bar chart - plot 2
-            plot_bar_chart_category.monthly_report_plot(
-                df_expenses,
+            monthly_report_right = display_plot(
+                plot_bar_chart_category.monthly_report_plot(
+                    df_expenses,
+                    year_selection2,
+                    monthly_report_choose_month1,
+                ),
+                side=monthly_report_plot_right_side,
+                key="monthly_report_plot_right",
+                on_select="rerun",
+                selection_mode="points",
+            )
+
+        # click on a bar to list the transactions of its category in the month
+        for event, year, month, column, side in (
+            (
+                monthly_report_left,
+                year_selection,
+                monthly_report_choose_month,
+                monthly_report_plot_left_side,
+                "left",
+            ),
+            (
+                monthly_report_right,
                 year_selection2,
                 monthly_report_choose_month1,
                 monthly_report_plot_right_side,
-            )
+                "right",
+            ),
+        ):
+            clicked_category = selected_category(event, "y")
+            if clicked_category is not None:
+                show_transactions(
+                    transaction_index,
+                    transaction_index.positions_in_month(clicked_category, year, month),
+                    title=f"{clicked_category.title()} - {month:02d}/{year}",
+                    key=f"monthly_report_page_{side}_{clicked_category}_{year}_{month}",
+                    side=column,
+                )
 
     with monthly_breakdown_tab4:
         selector_year3, selector_month3 = st.columns((1, 1))
         # define year and month to be selected
         year_selection_waterfall = selector_year3.selectbox(
-            "Monthly Report - Year", df_expenses["year"].unique(), key="waterfall_year"
+            "Monthly Report - Year", periods.years, key="waterfall_year"
         )
-        # filter the df based on the selection of the user
-        df_monthly_report_choose_year_waterfall = df_expenses[
-            df_expenses["year"] == year_selection_waterfall
-        ]
-        # selection box for letting the user filter the month
+        # selection box for letting the user filter the month, among those of the year selected
         monthly_waterfall = selector_month3.selectbox(
             "Monthly Report - Month",
-            df_monthly_report_choose_year_waterfall["month"].unique(),
+            periods.months_of(year_selection_waterfall),
             key="waterfall_month",
         )
 
         # instantiate the class
-        plot_waterfall = ExpensePlotMonth(df_expenses, year_selection_waterfall, monthly_waterfall)
+        plot_waterfall = ExpensePlotMonth(
+            df_expenses,
+            year_selection_waterfall,
+            monthly_waterfall,
+            backend=backend,
+            periods=periods,
+        )
 
-        plot_waterfall.plot_waterfall_per_month(
-            df_expenses, year_selection_waterfall, monthly_waterfall
+        display_plot(
+            plot_waterfall.plot_waterfall_per_month(
+                df_expenses, year_selection_waterfall, monthly_waterfall
+            )
         )
 
+        # the budget-vs-actual of the month, from the monthly aggregates
+        if budget_targets is not None:
+            budget_report = budget_targets.report(
+                aggregates.monthly, year_selection_waterfall, monthly_waterfall, as_of=today
+            )
+            display_plot(plot_waterfall.plot_budget_vs_actual(budget_report))
+            st.dataframe(budget_report.frame, hide_index=True, width="stretch")
+
+    ############################
+    # --- Spending heatmaps --- #
+    ############################
+
+    with heatmaps_tab5:
+        # the expenses are binned per weekday, week and day of the month while ingesting:
+        # the heatmaps of any year are read from the bins of the aggregates
+        year_selection_heatmap = st.selectbox("Heatmaps - Year", periods.years, key="heatmap_year")
+        plot_heatmaps = ExpensePlotHeatmap(aggregates.bins)
+        display_plot(plot_heatmaps.plot_heatmap_weekday_week(year_selection_heatmap))
+        display_plot(plot_heatmaps.plot_heatmap_category_day(year_selection_heatmap))
+
+    #################
+    # --- Cities --- #
+    #################
+
+    with cities_tab6:
+        selector_year4, selector_month4 = st.columns((1, 1))
+        # the same selectors as the other monthly tabs
+        year_selection_city = selector_year4.selectbox(
+            "Cities - Year", periods.years, key="city_year"
+        )
+        month_selection_city = selector_month4.selectbox(
+            "Cities - Month", periods.months_of(year_selection_city), key="city_month"
+        )
+
+        # the expenses per city come from the city rollup of the aggregates
+        plot_cities = ExpensePlotCity(aggregates.cities, year_selection_city, month_selection_city)
+        bar_plot_city_per_month, donut_chart_city = st.columns((2, 1))
+        with bar_plot_city_per_month:
+            display_plot(plot_cities.plot_bar_chart_city_per_month(year_selection_city))
+        with donut_chart_city:
+            display_plot(
+                plot_cities.plot_donut_chart_city_total(year_selection_city, month_selection_city)
+            )
+
+        travel_periods = aggregates.cities.travel_periods(year_selection_city)
+        st.markdown(f"**{travel_periods.title}**")
+        st.dataframe(travel_periods.frame, hide_index=True, width="stretch")
+
     # --- CSS hacks --- #
     st.markdown(f"<style>{css}</style>", unsafe_allow_html=True)
 
+elif st.session_state.get("ingestion_cancelled", False):
+    st.warning("The upload has been cancelled. Please, upload the file again.", icon="⚠️")
 else:
     st.text("To start the dashboard, please, upload a file using the button on the sidebar.")
+
+# --- Profiling --- #
+# write the breakdown of this rerun to the structured log and, if requested, to the sidebar
+profiler.log_summary()
+if st.session_state.get("show_profiling", False):
+    display_profiling_panel(profiler, side=st.sidebar)
@@ -0,0 +1,223 @@
+"""
+This script contains the aggregates of the ledger: the sum of the values per day and per category,
+the monthly cube, the category totals and the prefix sums over the days.
+
+They are built chunk by chunk while the file is being ingested, so that partial totals can be
+shown before the whole file has been parsed, and they are updated with only the new rows when a
+ledger is uploaded again with some rows appended. They are much smaller than the ledger itself.
+The unusual days and transactions are detected along the way, from the same chunks, the
+expenses are binned per weekday and week, and per category and day of the month, for the heatmaps,
+and rolled up per day and city.
+"""
+
+# --- Import packages --- #
+import datetime
+import pandas as pd
+from dataclasses import dataclass, field
+from .anomalies import SpendingAnomalies
+from .cities import CityRollup
+from .global_vars import NON_EXPENSE_CATEGORIES
+from .heatmaps import SpendingBins
+from .profiling import profiled
+
+
+@dataclass
+class ExpenseAggregates:
+    """
+    A class to hold the per-day and per-category sums of the ledger.
+
+    Attributes:
+        daily (pd.DataFrame): One row per day (the index, as datetime) and one column per expense_category,
+            with the sum of the values. Days without data are not present.
+        monthly (pd.DataFrame): One row per (year, month) and one column per expense_category.
+        totals (pd.Series): The sum of the values per expense_category over the whole ledger.
+        prefix (pd.DataFrame): The cumulative sum of `daily` over the days: the total of any range
+            of days is the difference between two rows.
+        rows (int): Number of rows of the ledger aggregated so far.
+        anomalies (SpendingAnomalies): The unusual days and transactions of the ledger so far.
+        bins (SpendingBins): The expenses per weekday and week, and per category and day of the month.
+        cities (CityRollup): The expenses per day and city.
+
+    Methods:
+        update(df):
+            Adds a chunk of the ledger to the aggregates.
+        category_totals():
+            Returns the sum of the expenses per category.
+        window_totals(past_date, today_date):
+            Returns the sum of the values per category between two dates, from the prefix sums.
+        window_has_data(past_date, today_date, category):
+            Returns whether a category has data between two dates.
+        window_category_totals(past_date, today_date):
+            Returns the sum of the expenses per category between two dates, for the categories with data.
+    """
+
+    daily: pd.DataFrame = field(default_factory=pd.DataFrame)
+    monthly: pd.DataFrame = field(default_factory=pd.DataFrame)
+    totals: pd.Series = field(default_factory=lambda: pd.Series(dtype="float64"))
+    prefix: pd.DataFrame = field(default_factory=pd.DataFrame)
+    rows: int = 0
+    anomalies: SpendingAnomalies = field(default_factory=SpendingAnomalies)
+    bins: SpendingBins = field(default_factory=SpendingBins)
+    cities: CityRollup = field(default_factory=CityRollup)
+
+    def update(self, df: pd.DataFrame) -> None:
+        """
+        Adds a chunk of the ledger to the aggregates.
+
+        When the chunk only contains days after the last day already aggregated (the common case
+        of a ledger growing over time), the prefix sums are extended instead of being recomputed.
+
+        Parameters
+        ----------
+        df : pd.DataFrame
+            A chunk of the ledger. Must have the 'date', 'expense_category' and 'value' columns.
+        """
+        if df.empty:
+            return
+
+        daily_chunk = (
+            df.groupby([df["date"].dt.normalize(), "expense_category"])["value"]
+            .sum()
+            .unstack("expense_category", fill_value=0.0)
+            .sort_index()
+        )
+        daily_chunk.index.name = "date"
+        daily_chunk.columns.name = None
+        if daily_chunk.empty:
+            # only rows without a date (or a value): counted, but in none of the sums
+            self.rows += len(df)
+            return
+
+        monthly_chunk = daily_chunk.groupby(
+            [daily_chunk.index.year.rename("year"), daily_chunk.index.month.rename("month")]
+        ).sum()
+
+        if self.daily.empty:
+            self.daily = daily_chunk
+            self.monthly = monthly_chunk
+            self.totals = daily_chunk.sum()
+            self.prefix = daily_chunk.cumsum()
+            self.rows += len(df)
+            self.anomalies.update(df)
+            self.bins.update(df)
+            self.cities.update(df)
+            return
+
+        columns = self.daily.columns.union(daily_chunk.columns, sort=False)
+        daily_chunk = daily_chunk.reindex(columns=columns, fill_value=0.0)
+        appended = daily_chunk.index[0] > self.daily.index[-1]
+
+        if appended:
+            # the new days come after the last one: extend the prefix sums from their last row
+            self.daily = pd.concat([self.daily, daily_chunk]).fillna(0.0)
+            last_prefix = self.prefix.iloc[-1].reindex(columns, fill_value=0.0)
+            self.prefix = pd.concat([self.prefix, daily_chunk.cumsum() + last_prefix]).fillna(0.0)
+        else:
+            self.daily = self.daily.add(daily_chunk, fill_value=0.0).fillna(0.0).sort_index()
+            self.prefix = self.daily.cumsum()
+
+        self.monthly = self.monthly.add(monthly_chunk, fill_value=0.0).fillna(0.0).sort_index()
+        self.totals = self.totals.add(daily_chunk.sum(), fill_value=0.0)
+        self.rows += len(df)
+        self.anomalies.update(df)
+        self.bins.update(df)
+        self.cities.update(df)
+
+    def category_totals(self) -> pd.Series:
+        """
+        Sum of the expenses per category, excluding "income", "investment" and "savings".
+
+        Returns
+        -------
+        pd.Series
+            The total per category, from the highest to the lowest.
+        """
+        totals = self.totals[~self.totals.index.isin(NON_EXPENSE_CATEGORIES)]
+        return totals.sort_values(ascending=False)
+
+    @profiled()
+    def window_totals(self, past_date: datetime.date, today_date: datetime.date) -> pd.Series:
+        """
+        Sum of the values per category between two dates, both included, from the prefix sums.
+
+        Parameters
+        ----------
+        past_date : datetime.date
+            The start date of the window (the "From" date).
+        today_date : datetime.date
+            The end date of the window (the "To" date).
+
+        Returns
+        -------
+        pd.Series
+            The total per category in the window (0 for the categories without data in it).
+        """
+        if self.prefix.empty:
+            return pd.Series(dtype="float64")
+
+        days = self.prefix.index
+        # position of the last day before the window, and of the last day inside it
+        before = days.searchsorted(pd.Timestamp(past_date), side="left") - 1
+        last = days.searchsorted(pd.Timestamp(today_date), side="right") - 1
+
+        zeros = pd.Series(0.0, index=self.prefix.columns)
+        end_totals = self.prefix.iloc[last] if last >= 0 else zeros
+        start_totals = self.prefix.iloc[before] if before >= 0 else zeros
+        if last <= before:
+            return zeros
+        return end_totals - start_totals
+
+    def window_has_data(
+        self, past_date: datetime.date, today_date: datetime.date, category: str
+    ) -> bool:
+        """
+        Whether a category has data between two dates, both included.
+
+        The days of the window are sliced from `daily` with a binary search. A day counts if the
+        sum of the values of the category is not 0 (the days without rows of the category are
+        filled with 0).
+
+        Parameters
+        ----------
+        past_date : datetime.date
+            The start date of the window (the "From" date).
+        today_date : datetime.date
+            The end date of the window (the "To" date).
+        category : str
+            The expense category.
+
+        Returns
+        -------
+        bool
+            True if the category has a day with data in the window.
+        """
+        if category not in self.daily.columns:
+            return False
+        days = self.daily.index
+        start = days.searchsorted(pd.Timestamp(past_date), side="left")
+        stop = days.searchsorted(pd.Timestamp(today_date), side="right")
+        return bool((self.daily[category].to_numpy()[start:stop] != 0).any())
+
+    @profiled()
+    def window_category_totals(
+        self, past_date: datetime.date, today_date: datetime.date
+    ) -> pd.Series:
+        """
+        Sum of the expenses per category between two dates, both included, excluding "income",
+        "investment" and "savings" and the categories without expenses in the window.
+
+        Parameters
+        ----------
+        past_date : datetime.date
+            The start date of the window (the "From" date).
+        today_date : datetime.date
+            The end date of the window (the "To" date).
+
+        Returns
+        -------
+        pd.Series
+            The total per category rounded to two decimal places, from the highest to the lowest.
+        """
+        totals = self.window_totals(past_date, today_date).round(2)
+        totals = totals[~totals.index.isin(NON_EXPENSE_CATEGORIES) & (totals != 0)]
+        return totals.sort_values(ascending=False)
@@ -0,0 +1,319 @@
+"""
+This script contains the detection of the unusual spending: the days with much higher expenses than
+usual, and the transactions much higher than the usual ones of their category and store.
+
+The usual level is an exponentially weighted moving average (EWMA) of the values and of their
+squares, from which the z-score of every new day (transaction) is computed before it is added to
+the average. Only the state of the averages is kept, not the history: when new rows are ingested,
+the state is carried on with them, so an update costs O(new rows) and not O(ledger). The rows are
+scored in the order of their dates, so a file sorted from the newest row gives the same result.
+"""
+
+# --- Import packages --- #
+import datetime
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass, field
+from typing import Optional
+from .global_vars import NON_EXPENSE_CATEGORIES
+from .profiling import profiled
+
+# columns of the state of the moving averages, one row per series
+STATE_COLUMNS = ["mean", "mean_sq", "count"]
+
+
+def ewma_scores(
+    keys: np.ndarray, values: np.ndarray, state: pd.DataFrame, alpha: float
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Scores new values against the moving averages of their series, then adds them to the averages.
+
+    The state of each series is put in front of its new values as a first observation: the moving
+    average (adjust=False) starts from it, as if the previous values were still there. All the
+    series are computed at once by pandas.
+
+    Parameters
+    ----------
+    keys : np.ndarray
+        The series of each value, in the order the values arrive.
+    values : np.ndarray
+        The new values.
+    state : pd.DataFrame
+        The state of the series seen so far, indexed by key, with the STATE_COLUMNS.
+    alpha : float
+        Weight of a new value in the moving averages.
+
+    Returns
+    -------
+    tuple[pd.DataFrame, pd.DataFrame]
+        For each value, in the same order, the "expected" value (the average before it), its "std"
+        and the number of values before it ("history"); and the new state of the series.
+    """
+    # one integer per series; the series already seen have a state to start from
+    codes, uniques = pd.factorize(keys)
+    seeded = np.flatnonzero(pd.Index(uniques).isin(state.index))
+    seeds = state.loc[uniques[seeded]]
+
+    frame = pd.DataFrame(
+        {
+            "code": np.concatenate([seeded, codes]),
+            "value": np.concatenate([seeds["mean"].to_numpy(), values]),
+            "value_sq": np.concatenate([seeds["mean_sq"].to_numpy(), values**2]),
+            "count": np.concatenate([seeds["count"].to_numpy(), np.ones(len(values))]),
+        }
+    )
+    # the seed of a series comes before its values, which keep their order
+    order = np.argsort(frame["code"].to_numpy(), kind="stable")
+    frame = frame.iloc[order].reset_index(drop=True)
+    grouped = frame.groupby("code", sort=False)
+
+    averages = (
+        grouped[["value", "value_sq"]]
+        .ewm(alpha=alpha, adjust=False)
+        .mean()
+        .reset_index(level=0, drop=True)
+        .sort_index()
+    )
+    history = grouped["count"].cumsum()
+    before = averages.groupby(frame["code"], sort=False).shift(1)
+
+    # back to the order of the values, leaving the seeds out
+    positions = np.empty(len(order), dtype=np.int64)
+    positions[order] = np.arange(len(order))
+    rows = positions[len(seeded) :]
+    variance = (before["value_sq"] - before["value"] ** 2).clip(lower=0.0).to_numpy()
+    scores = pd.DataFrame(
+        {
+            "expected": before["value"].to_numpy()[rows],
+            "std": np.sqrt(variance[rows]),
+            "history": (history - frame["count"]).to_numpy()[rows],
+        }
+    )
+
+    # the last row of each series is its new state
+    last = np.flatnonzero(
+        np.r_[frame["code"].to_numpy()[1:] != frame["code"].to_numpy()[:-1], True]
+    )
+    updated = pd.DataFrame(
+        {
+            "mean": averages["value"].to_numpy()[last],
+            "mean_sq": averages["value_sq"].to_numpy()[last],
+            "count": history.to_numpy()[last],
+        },
+        index=pd.Index(uniques[frame["code"].to_numpy()[last]]),
+    )
+    new_state = pd.concat([state.loc[~state.index.isin(updated.index)], updated])
+    return scores, new_state
+
+
+def _empty_state() -> pd.DataFrame:
+    return pd.DataFrame(columns=STATE_COLUMNS, dtype="float64")
+
+
+def _append(frame: pd.DataFrame, rows: pd.DataFrame) -> pd.DataFrame:
+    if rows.empty:
+        return frame
+    if frame.empty:
+        return rows.reset_index(drop=True)
+    return pd.concat([frame, rows], ignore_index=True)
+
+
+# columns of the rows waiting to be scored
+PENDING_COLUMNS = ["date", "expense_category", "store", "value", "key"]
+
+
+@dataclass
+class SpendingAnomalies:
+    """
+    A class to flag the unusual spending days and transactions, updated chunk by chunk.
+
+    The days and transactions are scored in the order of their dates, whatever the order of the
+    rows in the file. The rows of a chunk are held until their days are finished: a new chunk
+    starting on or after the last day held finishes the days before it (the common case of a file
+    sorted by date, oldest first), otherwise the rows are held until the results are read, or
+    until flush() is called. The averages are never computed again from the start: the rows of a
+    day already scored (such as those of an older export merged later) are scored as
+    transactions, but their day is not scored again.
+
+    Attributes:
+        alpha (float): Weight of a new day (transaction) in the moving averages. Default is 0.1.
+        threshold (float): Smallest z-score of an unusual day or transaction. Default is 3.
+        min_history (int): Fewest days (transactions) needed before flagging anything. Default is 7.
+        days (pd.DataFrame): The unusual days scored so far, with the columns "date", "total",
+            "expected" and "z".
+        transactions (pd.DataFrame): The unusual transactions scored so far, with the columns
+            "date", "expense_category", "store", "value", "expected" and "z".
+
+    Methods:
+        update(df):
+            Holds the new rows of the ledger, and scores the ones of the days finished by them.
+        flush():
+            Scores all the rows held, but the most recent day.
+        days_between(past_date, today_date), transactions_between(past_date, today_date):
+            Returns the unusual days (transactions) between two dates.
+    """
+
+    alpha: float = 0.1
+    threshold: float = 3.0
+    min_history: int = 7
+    days: pd.DataFrame = field(
+        default_factory=lambda: pd.DataFrame(columns=["date", "total", "expected", "z"])
+    )
+    transactions: pd.DataFrame = field(
+        default_factory=lambda: pd.DataFrame(
+            columns=["date", "expense_category", "store", "value", "expected", "z"]
+        )
+    )
+    _day_state: pd.DataFrame = field(default_factory=_empty_state)
+    _transaction_state: pd.DataFrame = field(default_factory=_empty_state)
+    # the last day added to the moving average of the days: the most recent day is not added
+    # until a later day arrives, as the next chunk may still have rows of it
+    _last_scored_day: Optional[pd.Timestamp] = None
+    _pending_day: Optional[pd.Series] = None
+    # the rows not scored yet, and their last day
+    _pending_rows: list[pd.DataFrame] = field(default_factory=list)
+    _pending_last_day: Optional[pd.Timestamp] = None
+
+    def _unusual(self, scores: pd.DataFrame, values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        z = (values - scores["expected"].to_numpy()) / scores["std"].replace(0.0, np.nan).to_numpy()
+        unusual = (scores["history"].to_numpy() >= self.min_history) & (z >= self.threshold)
+        return unusual, z
+
+    @profiled()
+    def update(self, df: pd.DataFrame) -> None:
+        """
+        Holds the new rows of the ledger, and scores the ones of the days finished by them.
+
+        Parameters
+        ----------
+        df : pd.DataFrame
+            A chunk of the ledger. Must have the 'date', 'expense_category' and 'value' columns;
+            the transactions are compared per category and 'store', if there is one.
+        """
+        expenses = df.loc[~df["expense_category"].isin(NON_EXPENSE_CATEGORIES)].dropna(
+            subset=["date", "value"]
+        )
+        if expenses.empty:
+            return
+        keys = expenses["expense_category"].astype(str)
+        if "store" in expenses.columns:
+            keys = keys + " | " + expenses["store"].astype(str)
+        rows = expenses.reindex(columns=PENDING_COLUMNS[:-1]).assign(key=keys.to_numpy())
+
+        first_day = rows["date"].min().normalize()
+        if self._pending_last_day is not None and first_day >= self._pending_last_day:
+            # the file goes on in the order of the dates: the days before this chunk are finished
+            self._flush(before=first_day)
+        self._pending_rows.append(rows)
+        last_day = rows["date"].max().normalize()
+        if self._pending_last_day is None or last_day > self._pending_last_day:
+            self._pending_last_day = last_day
+
+    def flush(self) -> None:
+        """
+        Scores all the rows held, in the order of their dates.
+
+        The most recent day is still not added to the moving average of the days, as the next
+        rows may be of the same day: it is scored on its own when the unusual days are read.
+        """
+        self._flush(before=None)
+
+    def _flush(self, before: Optional[pd.Timestamp]) -> None:
+        if not self._pending_rows:
+            return
+        rows = pd.concat(self._pending_rows, ignore_index=True)
+        rows = rows.iloc[np.argsort(rows["date"].to_numpy(), kind="stable")]
+        days = rows["date"].dt.normalize()
+        if before is not None:
+            # the rows of the days not finished yet are held
+            held = (days >= before).to_numpy()
+            self._pending_rows = [rows.loc[held]] if held.any() else []
+            rows, days = rows.loc[~held], days.loc[~held]
+        else:
+            self._pending_rows = []
+        if not self._pending_rows:
+            self._pending_last_day = None
+        if rows.empty:
+            return
+
+        self._score_transactions(rows)
+        totals = rows.groupby(days)["value"].sum()
+        if self._pending_day is not None and (
+            before is None or self._pending_day.index[0] < before
+        ):
+            # the most recent day of the previous rows, with the rows of it held since
+            totals = totals.add(self._pending_day, fill_value=0.0).sort_index()
+            self._pending_day = None
+        if self._last_scored_day is not None:
+            # the rows of a day already scored: the day is not scored again
+            totals = totals.loc[totals.index > self._last_scored_day]
+        if before is None and not totals.empty:
+            # the most recent day may still get rows from the next chunk: keep it aside
+            self._pending_day, totals = totals.iloc[-1:], totals.iloc[:-1]
+        self._score_days(totals)
+
+    def _score_transactions(self, rows: pd.DataFrame) -> None:
+        values = rows["value"].to_numpy(dtype=np.float64)
+        scores, self._transaction_state = ewma_scores(
+            rows["key"].to_numpy(), values, self._transaction_state, self.alpha
+        )
+        unusual, z = self._unusual(scores, values)
+        if unusual.any():
+            flagged = (
+                rows[PENDING_COLUMNS[:-1]]
+                .loc[unusual]
+                .assign(
+                    expected=scores["expected"].to_numpy()[unusual].round(2), z=z[unusual].round(1)
+                )
+            )
+            self.transactions = _append(self.transactions, flagged)
+
+    def _score_days(self, totals: pd.Series) -> None:
+        if totals.empty:
+            return
+        values = totals.to_numpy(dtype=np.float64)
+        scores, self._day_state = ewma_scores(
+            np.zeros(len(values), dtype=np.int64), values, self._day_state, self.alpha
+        )
+        self._last_scored_day = totals.index[-1]
+        self.days = _append(self.days, self._flag_days(totals, scores))
+
+    def _flag_days(self, totals: pd.Series, scores: pd.DataFrame) -> pd.DataFrame:
+        values = totals.to_numpy(dtype=np.float64)
+        unusual, z = self._unusual(scores, values)
+        return pd.DataFrame(
+            {
+                "date": totals.index[unusual],
+                "total": values[unusual].round(2),
+                "expected": scores["expected"].to_numpy()[unusual].round(2),
+                "z": z[unusual].round(1),
+            }
+        )
+
+    def _all_days(self) -> pd.DataFrame:
+        self.flush()
+        # the most recent day is scored against the averages, without being added to them
+        if self._pending_day is None or self._pending_day.empty:
+            return self.days
+        values = self._pending_day.to_numpy(dtype=np.float64)
+        scores, _ = ewma_scores(np.zeros(1, dtype=np.int64), values, self._day_state, self.alpha)
+        return _append(self.days, self._flag_days(self._pending_day, scores))
+
+    def days_between(self, past_date: datetime.date, today_date: datetime.date) -> pd.DataFrame:
+        """The unusual days between two dates, both included, the most unusual first."""
+        days = self._all_days()
+        in_window = (days["date"] >= pd.Timestamp(past_date)) & (
+            days["date"] <= pd.Timestamp(today_date)
+        )
+        return days.loc[in_window].sort_values(by="z", ascending=False, ignore_index=True)
+
+    def transactions_between(
+        self, past_date: datetime.date, today_date: datetime.date
+    ) -> pd.DataFrame:
+        """The unusual transactions between two dates, both included, the most unusual first."""
+        self.flush()
+        transactions = self.transactions
+        in_window = (transactions["date"] >= pd.Timestamp(past_date)) & (
+            transactions["date"] < pd.Timestamp(today_date) + pd.Timedelta(days=1)
+        )
+        return transactions.loc[in_window].sort_values(by="z", ascending=False, ignore_index=True)
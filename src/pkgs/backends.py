@@ -0,0 +1,58 @@
+"""
+This script contains the query engines the dashboard can compute the metrics and plots with.
+
+ExpenseMetric, ExpensePlot and ExpensePlotMonth compute their totals with pandas by default. When
+they are given a query backend, the totals are computed by it instead: every backend exposes the
+same methods (total_expenses, category_totals, year_category_totals, ...) returning the same
+numbers, so the engine can be changed without changing the metrics and plots.
+"""
+
+# --- Import packages --- #
+import pandas as pd
+from typing import Optional, Union
+from .polars_backend import PolarsBackend, pl
+from .sql_backend import SQLBackend
+
+# a backend computing the aggregations of the dashboard
+QueryBackend = Union[SQLBackend, PolarsBackend]
+
+# the engines shown in the dashboard; "pandas" computes the totals on the DataFrame itself
+ENGINES = ["pandas", "SQL", "Polars"]
+
+
+def available_engines() -> list[str]:
+    """
+    The query engines that can be used with the installed packages.
+
+    Returns
+    -------
+    list[str]
+        The names of the engines, pandas first. Polars is only listed when it is installed,
+        SQL is always available (SQLite is part of the standard library).
+    """
+    return [engine for engine in ENGINES if engine != "Polars" or pl is not None]
+
+
+def build_backend(engine: str, df: pd.DataFrame) -> Optional[QueryBackend]:
+    """
+    Loads the ledger into the query backend of the engine.
+
+    Parameters
+    ----------
+    engine : str
+        One of the names in ENGINES.
+    df : pd.DataFrame
+        The expenses, with the 'date' column parsed as datetime and the calendar columns.
+
+    Returns
+    -------
+    Optional[QueryBackend]
+        The backend, or None for the pandas engine.
+    """
+    if engine == "pandas":
+        return None
+    if engine == "SQL":
+        return SQLBackend.from_dataframe(df)
+    if engine == "Polars":
+        return PolarsBackend.from_dataframe(df)
+    raise ValueError(f"Unknown query engine: {engine}. Choose one of {ENGINES}.")
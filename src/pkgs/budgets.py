@@ -0,0 +1,165 @@
+"""
+This script contains the budget targets of the dashboard.
+
+The budgets are loaded from a file, with one target per expense category, for every month or for a
+specific month. They are compared with the monthly cube of the aggregates (one row per month, one
+column per category), so the budget-vs-actual of every category is computed at once, with a few
+vectorized operations, without going through the transactions again.
+"""
+
+# --- Import packages --- #
+import calendar
+import datetime
+import io
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass
+from .profiling import profiled
+from .results_dataclasses import AggregateResult
+
+# columns of the budgets file; "year" and "month" are optional: an empty value
+# means that the target holds for every year (month)
+BUDGET_COLUMNS = ["expense_category", "budget"]
+BUDGET_PERIOD_COLUMNS = ["year", "month"]
+
+
+def read_budgets(data: bytes, file_extension: str) -> pd.DataFrame:
+    """
+    Reads the budgets file.
+
+    Parameters
+    ----------
+    data : bytes
+        The content of the uploaded file, with the columns "expense_category" and "budget",
+        and optionally "year" and "month".
+    file_extension : str
+        Either "csv" or "xlsx".
+
+    Returns
+    -------
+    pd.DataFrame
+        The budgets, with the columns "expense_category", "budget", "year" and "month".
+
+    Raises
+    ------
+    ValueError
+        If one of the BUDGET_COLUMNS is not in the file.
+    """
+    if file_extension == "csv":
+        budgets = pd.read_csv(io.BytesIO(data), sep=";")
+    else:
+        budgets = pd.read_excel(io.BytesIO(data))
+
+    missing = [column for column in BUDGET_COLUMNS if column not in budgets.columns]
+    if missing:
+        raise ValueError(f"The budgets file has no {', '.join(missing)} column.")
+
+    for column in BUDGET_PERIOD_COLUMNS:
+        if column not in budgets.columns:
+            budgets[column] = np.nan
+    budgets = budgets[BUDGET_COLUMNS + BUDGET_PERIOD_COLUMNS].dropna(subset=BUDGET_COLUMNS)
+    return budgets.astype({"budget": np.float64, "year": np.float64, "month": np.float64})
+
+
+@dataclass
+class BudgetTargets:
+    """
+    A class to compare the budget targets with the expenses of a month.
+
+    Attributes:
+        budgets (pd.DataFrame): The budgets, as returned by read_budgets.
+
+    Methods:
+        targets(year, month):
+            Returns the budget of each category for a month.
+        report(monthly, year, month, as_of):
+            Returns the budget-vs-actual, burn rate and projected overspend of each category.
+    """
+
+    budgets: pd.DataFrame
+
+    def targets(self, year: int, month: int) -> pd.Series:
+        """
+        Budget of each category for a month: the target of that month if there is one,
+        otherwise the target of that month for every year, otherwise the target for every month.
+
+        Parameters
+        ----------
+        year : int
+            The year selected by the user.
+        month : int
+            The month selected by the user.
+
+        Returns
+        -------
+        pd.Series
+            The budget per category.
+        """
+        budgets = self.budgets
+        matching = budgets.loc[
+            (budgets["year"].isna() | (budgets["year"] == int(year)))
+            & (budgets["month"].isna() | (budgets["month"] == int(month)))
+        ]
+        # the most specific target wins: a year and a month, then a month, then none
+        specificity = matching["year"].notna() * 2 + matching["month"].notna()
+        return (
+            matching.assign(specificity=specificity)
+            .sort_values(by="specificity", kind="stable")
+            .groupby("expense_category")["budget"]
+            .last()
+        )
+
+    @profiled()
+    def report(
+        self, monthly: pd.DataFrame, year: int, month: int, as_of: datetime.date
+    ) -> AggregateResult:
+        """
+        Budget-vs-actual of every category with a budget in a month.
+
+        The expenses of the month in progress are projected to the end of the month at the
+        pace (burn rate) of the days elapsed so far.
+
+        Parameters
+        ----------
+        monthly : pd.DataFrame
+            The monthly cube of the aggregates: one row per (year, month), one column per category.
+        year : int
+            The year selected by the user.
+        month : int
+            The month selected by the user.
+        as_of : datetime.date
+            The current date, to know how much of the month has elapsed.
+
+        Returns
+        -------
+        AggregateResult
+            One row per category, with the columns "expense_category", "budget", "actual", "variance"
+            (actual minus budget), "burn_rate" (share of the budget spent), "projected" (expenses
+            projected to the end of the month) and "projected_overspend".
+        """
+        budget = self.targets(year, month)
+        key = (int(year), int(month))
+        actual = monthly.loc[key] if key in monthly.index else pd.Series(dtype="float64")
+        actual = actual.reindex(budget.index, fill_value=0.0)
+
+        # share of the month elapsed: 0 for a future month, 1 for a past month
+        days_in_month = calendar.monthrange(*key)[1]
+        elapsed_days = (as_of - datetime.date(*key, 1)).days + 1
+        elapsed = min(max(elapsed_days, 0), days_in_month) / days_in_month
+        projected = actual / elapsed if 0 < elapsed < 1 else actual
+
+        frame = pd.DataFrame(
+            {
+                "budget": budget,
+                "actual": actual,
+                "variance": actual - budget,
+                "burn_rate": actual / budget.where(budget > 0),
+                "projected": projected,
+                "projected_overspend": (projected - budget).clip(lower=0.0),
+            }
+        )
+        frame.index.name = "expense_category"
+        return AggregateResult(
+            frame=frame.round(2).reset_index(),
+            title=f"Budget vs. actual - {calendar.month_abbr[key[1]]} {key[0]}",
+        )
@@ -0,0 +1,207 @@
+"""
+This script contains the auto-categorization of the raw bank exports: the rows without an
+expense_category (or expense_type) get one from the name of their store, with a set of rules.
+
+The rules are of three kinds: the exact name of a store, a text contained in it, or a regular
+expression. The exact names are a dictionary lookup; the other rules are compiled into a single
+regular expression, with one named group per rule, so a store is matched against all of them in
+one pass (the few regular expressions with their own groups or global flags are matched apart).
+A ledger has few distinct stores for many rows: each distinct store is categorized once (and
+remembered for the next chunks and uploads), then the result is spread back over the rows.
+"""
+
+# --- Import packages --- #
+import io
+import re
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass, field
+from typing import Optional
+from .profiling import profiled
+
+# columns of the rules file: "match" is one of RULE_KINDS, "pattern" is compared with the store
+RULE_COLUMNS = ["match", "pattern", "expense_category", "expense_type"]
+RULE_KINDS = ["exact", "contains", "regex"]
+# category and type of the rows that no rule matches
+UNCATEGORIZED = ("other", "other")
+
+
+def _normalize(text: str) -> str:
+    # the stores of the bank exports come in any case, with extra spaces
+    return " ".join(str(text).split()).casefold()
+
+
+def read_rules(data: bytes, file_extension: str) -> pd.DataFrame:
+    """
+    Reads the categorization rules file.
+
+    Parameters
+    ----------
+    data : bytes
+        The content of the uploaded file, with the columns "match", "pattern", "expense_category"
+        and "expense_type".
+    file_extension : str
+        Either "csv" or "xlsx".
+
+    Returns
+    -------
+    pd.DataFrame
+        The rules, in the order of the file.
+
+    Raises
+    ------
+    ValueError
+        If one of the RULE_COLUMNS is not in the file, if a "match" is not one of RULE_KINDS,
+        or if a regular expression is not valid.
+    """
+    if file_extension == "csv":
+        rules = pd.read_csv(io.BytesIO(data), sep=";", dtype=str)
+    else:
+        rules = pd.read_excel(io.BytesIO(data), dtype=str)
+
+    missing = [column for column in RULE_COLUMNS if column not in rules.columns]
+    if missing:
+        raise ValueError(f"The rules file has no {', '.join(missing)} column.")
+
+    rules = rules[RULE_COLUMNS].dropna(subset=["match", "pattern", "expense_category"])
+    rules["match"] = rules["match"].str.strip().str.lower()
+    unknown = sorted(set(rules["match"]) - set(RULE_KINDS))
+    if unknown:
+        raise ValueError(f"Unknown match {', '.join(unknown)}: use one of {', '.join(RULE_KINDS)}.")
+    for pattern in rules.loc[rules["match"] == "regex", "pattern"]:
+        try:
+            re.compile(pattern)
+        except re.error as error:
+            raise ValueError(f"Invalid regular expression {pattern!r}: {error}") from error
+    return rules.fillna({"expense_type": UNCATEGORIZED[1]}).reset_index(drop=True)
+
+
+def _joinable(pattern: str) -> bool:
+    # a regular expression with its own groups (and backreferences to them) or with global
+    # flags, such as "(?i)", cannot be an alternative of the single regular expression
+    try:
+        return re.compile(f"(?:{pattern})").groups == 0
+    except re.error:
+        return False
+
+
+@dataclass
+class CategoryRules:
+    """
+    A class to categorize the rows of a ledger from the name of their store.
+
+    The exact names win over the other rules; among the "contains" and "regex" rules, the first
+    one in the file that matches wins.
+
+    Attributes:
+        rules (pd.DataFrame): The rules, as returned by read_rules.
+
+    Methods:
+        categorize_store(store):
+            Returns the category and type of a store.
+        categorize(df):
+            Fills the missing categories and types of a chunk of the ledger.
+    """
+
+    rules: pd.DataFrame
+    _exact: dict[str, tuple[str, str]] = field(default_factory=dict)
+    _pattern: Optional[re.Pattern] = None
+    # the regular expressions that cannot be joined to the others, with the index of their rule
+    _separate: list[tuple[int, re.Pattern]] = field(default_factory=list)
+    _labels: list[tuple[str, str]] = field(default_factory=list)
+    # the category and type of every store seen so far
+    _memo: dict[str, tuple[str, str]] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        labels = list(zip(self.rules["expense_category"], self.rules["expense_type"]))
+        groups = []
+        for index, (kind, pattern) in enumerate(zip(self.rules["match"], self.rules["pattern"])):
+            if kind == "exact":
+                # the first exact rule of a store wins, as for the other rules
+                self._exact.setdefault(_normalize(pattern), labels[index])
+                continue
+            regex = re.escape(_normalize(pattern)) if kind == "contains" else pattern
+            if kind == "regex" and not _joinable(regex):
+                self._separate.append((len(self._labels), re.compile(regex, flags=re.IGNORECASE)))
+            else:
+                groups.append(f"(?P<r{len(self._labels)}>{regex})")
+            self._labels.append(labels[index])
+        if groups:
+            # the stores are normalized to lower case, the regular expressions may not be
+            self._pattern = re.compile("|".join(groups), flags=re.IGNORECASE)
+
+    def categorize_store(self, store: str) -> tuple[str, str]:
+        """
+        Category and type of a store, remembered for the next calls.
+
+        Parameters
+        ----------
+        store : str
+            The name of the store.
+
+        Returns
+        -------
+        tuple[str, str]
+            The expense_category and expense_type of the first rule matching the store,
+            UNCATEGORIZED if none does.
+        """
+        if store in self._memo:
+            return self._memo[store]
+
+        name = _normalize(store)
+        label = self._exact.get(name)
+        if label is None and self._labels:
+            rule = len(self._labels)
+            match = self._pattern.search(name) if self._pattern is not None else None
+            if match is not None:
+                # the group of the first alternative that matched: its rule
+                rule = int(match.lastgroup[1:])
+            # a rule matched on its own wins if it comes first in the file
+            for separate_rule, pattern in self._separate:
+                if separate_rule >= rule:
+                    break
+                if pattern.search(name) is not None:
+                    rule = separate_rule
+                    break
+            if rule < len(self._labels):
+                label = self._labels[rule]
+        self._memo[store] = label if label is not None else UNCATEGORIZED
+        return self._memo[store]
+
+    @profiled()
+    def categorize(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Fills the missing expense_category and expense_type of a chunk of the ledger from its stores.
+
+        The rows that already have a category keep it; the columns are added if the file has none.
+
+        Parameters
+        ----------
+        df : pd.DataFrame
+            A chunk of the ledger, with the 'store' column.
+
+        Returns
+        -------
+        pd.DataFrame
+            The same chunk, with the categories and types filled in.
+        """
+        for column in ["expense_category", "expense_type"]:
+            if column not in df.columns:
+                df[column] = pd.Series(np.nan, index=df.index, dtype="object")
+        missing = df["expense_category"].isna().to_numpy()
+        if not missing.any():
+            return df
+
+        # one lookup per distinct store, spread back over the rows with the codes
+        codes, stores = pd.factorize(df["store"].to_numpy()[missing])
+        labels = [self.categorize_store(store) for store in stores]
+        labels.append(UNCATEGORIZED)  # the code -1: no store
+        categories = np.array([label[0] for label in labels], dtype=object)
+        types = np.array([label[1] for label in labels], dtype=object)
+
+        df.loc[missing, "expense_category"] = categories[codes]
+        # the type found by the rule, unless the row already has one
+        df.loc[missing, "expense_type"] = df.loc[missing, "expense_type"].fillna(
+            pd.Series(types[codes], index=df.index[missing])
+        )
+        return df
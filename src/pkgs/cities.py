@@ -0,0 +1,235 @@
+"""
+This script contains the city rollup of the ledger: the expenses per day and city, kept up to
+date chunk by chunk with the other aggregates while the file is ingested.
+
+The rollup has one row per day with expenses and one column per city, so it is much smaller than
+the ledger: the expenses per city of a year or of a month, the home city and the travel periods
+(the days spent away from it) are all computed from it, without scanning the rows of the ledger.
+"""
+
+# --- Import packages --- #
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass, field
+from typing import Optional
+from .global_vars import MONTHS_TEXT, NON_EXPENSE_CATEGORIES
+from .profiling import profiled
+from .results_dataclasses import AggregateResult
+
+# days without expenses that do not end a trip (such as a day spent walking around)
+TRAVEL_GAP_DAYS = 1
+TRAVEL_COLUMNS = ["city", "start", "end", "days", "expenses"]
+
+
+@dataclass
+class CityRollup:
+    """
+    A class to hold the expenses per day and city of the ledger.
+
+    Attributes:
+        daily (pd.DataFrame): One row per day with expenses in a city (the index, as datetime)
+            and one column per city, with the sum of the expenses (income, investment and savings
+            excluded). The rows without a city are not counted.
+
+    Methods:
+        update(df):
+            Adds the expenses of a chunk of the ledger to the rollup.
+        home_city():
+            Returns the city with the most days with expenses.
+        city_totals(year, month):
+            Returns the expenses per city of a year, or of a month.
+        year_city_totals(year):
+            Returns the expenses per month and city of a year.
+        travel_periods(year):
+            Returns the periods spent away from the home city, starting in a year.
+    """
+
+    daily: pd.DataFrame = field(default_factory=pd.DataFrame)
+    _monthly: Optional[pd.DataFrame] = None
+    _travel: Optional[pd.DataFrame] = None
+
+    def update(self, df: pd.DataFrame) -> None:
+        """
+        Adds the expenses of a chunk of the ledger to the rollup.
+
+        Parameters
+        ----------
+        df : pd.DataFrame
+            A chunk of the ledger. Must have the 'date', 'expense_category' and 'value' columns;
+            without a 'city' column, the chunk is not counted.
+        """
+        if "city" not in df.columns:
+            return
+        values = df["value"].to_numpy(dtype=np.float64)
+        dates = df["date"].to_numpy(dtype="datetime64[D]")
+        city_codes, cities = pd.factorize(df["city"])
+        keep = (
+            ~df["expense_category"].isin(NON_EXPENSE_CATEGORIES).to_numpy()
+            & (city_codes >= 0)
+            & ~np.isnat(dates)
+            & ~np.isnan(values)
+        )
+        if not keep.any():
+            return
+
+        # one integer per (day, city): the chunk is summed with a single bincount
+        days = dates[keep].astype(np.int64)
+        first_day = days.min()
+        day_codes = days - first_day
+        sums = np.bincount(
+            day_codes * len(cities) + city_codes[keep],
+            weights=values[keep],
+            minlength=(int(day_codes.max()) + 1) * len(cities),
+        ).reshape(-1, len(cities))
+        with_expenses = np.flatnonzero(np.bincount(day_codes, minlength=len(sums)))
+        chunk = pd.DataFrame(
+            sums[with_expenses],
+            index=pd.DatetimeIndex(
+                (with_expenses + first_day).astype("datetime64[D]"), name="date"
+            ).as_unit("ns"),
+            columns=pd.Index(cities, name="city"),
+        )
+
+        if self.daily.empty:
+            self.daily = chunk
+        elif chunk.index[0] > self.daily.index[-1]:
+            # the new days come after the last one
+            self.daily = pd.concat([self.daily, chunk]).fillna(0.0)
+        else:
+            self.daily = self.daily.add(chunk, fill_value=0.0).fillna(0.0).sort_index()
+        self._monthly = self._travel = None
+
+    @property
+    def monthly(self) -> pd.DataFrame:
+        """One row per (year, month) and one column per city, with the sum of the expenses."""
+        if self._monthly is None and self.daily.empty:
+            index = pd.MultiIndex.from_arrays([[], []], names=["year", "month"])
+            self._monthly = pd.DataFrame(index=index, dtype="float64")
+        if self._monthly is None:
+            index = self.daily.index
+            self._monthly = self.daily.groupby(
+                [index.year.rename("year"), index.month.rename("month")]
+            ).sum()
+        return self._monthly
+
+    def home_city(self) -> Optional[str]:
+        """The city with the most days with expenses (then, the most expenses), None if none."""
+        if self.daily.empty:
+            return None
+        ranking = pd.DataFrame({"days": (self.daily > 0).sum(), "expenses": self.daily.sum()})
+        return ranking.sort_values(by=["days", "expenses"], ascending=False).index[0]
+
+    @profiled()
+    def city_totals(self, year: int, month: Optional[int] = None) -> AggregateResult:
+        """
+        Sum of the expenses per city in the year, or in the month, selected.
+
+        Parameters
+        ----------
+        year : int
+            Year selected by the user.
+        month : Optional[int], optional
+            Month selected by the user. Defaults to None (the whole year).
+
+        Returns
+        -------
+        AggregateResult
+            One row per city with expenses, with the columns "city" and "value", from the highest.
+        """
+        monthly = self.monthly
+        if month is None:
+            rows = monthly.loc[monthly.index.get_level_values("year") == int(year)]
+            title = f"Expenses per city - {int(year)}"
+        else:
+            rows = monthly.loc[monthly.index.isin([(int(year), int(month))])]
+            title = f"Expenses per city - {MONTHS_TEXT[int(month) - 1]} {int(year)}"
+        totals = rows.sum().round(2)
+        totals = totals[totals != 0].sort_values(ascending=False)
+        return AggregateResult(
+            frame=totals.rename("value").rename_axis("city").reset_index(), title=title
+        )
+
+    @profiled()
+    def year_city_totals(self, year: int) -> AggregateResult:
+        """
+        Sum of the expenses per month and city in the year selected.
+
+        Parameters
+        ----------
+        year : int
+            Year selected by the user.
+
+        Returns
+        -------
+        AggregateResult
+            One row per month and city with expenses, with the columns "months_text", "city" and "value".
+        """
+        monthly = self.monthly
+        if monthly.empty:
+            frame = pd.DataFrame(columns=["months_text", "city", "value"])
+        else:
+            rows = monthly.loc[monthly.index.get_level_values("year") == int(year)]
+            frame = rows.droplevel("year").rename_axis(columns="city").stack().rename("value")
+            frame = frame[frame != 0].round(2).reset_index()
+            frame["months_text"] = [MONTHS_TEXT[month - 1] for month in frame.pop("month")]
+            frame = frame[["months_text", "city", "value"]]
+        return AggregateResult(frame=frame, title=f"Expenses per city and month - {int(year)}")
+
+    def _travel_periods(self) -> pd.DataFrame:
+        home = self.home_city()
+        away = self.daily.drop(columns=[home]) if home is not None else self.daily
+        is_away = (away.sum(axis=1) > 0).to_numpy()
+        if not is_away.any():
+            return pd.DataFrame(columns=TRAVEL_COLUMNS)
+
+        # a trip starts on a day away after a day at home, or after more than TRAVEL_GAP_DAYS
+        # days without expenses
+        days = self.daily.index.to_numpy(dtype="datetime64[D]").astype(np.int64)
+        gaps = np.diff(days, prepend=days[0])
+        after_home = np.concatenate([[True], ~is_away[:-1]])
+        starts = is_away & (after_home | (gaps > TRAVEL_GAP_DAYS + 1))
+        trips = np.cumsum(starts)[is_away]
+        away = away.loc[is_away]
+        per_trip = away.groupby(trips)
+        dates = away.index.to_series(index=trips).groupby(level=0)
+        totals = per_trip.sum()
+        start, end = dates.min(), dates.max()
+        return pd.DataFrame(
+            {
+                # the city where most of the money of the trip was spent
+                "city": totals.idxmax(axis=1),
+                "start": start.dt.date,
+                "end": end.dt.date,
+                "days": (end - start).dt.days + 1,
+                "expenses": totals.sum(axis=1).round(2),
+            }
+        ).reset_index(drop=True)
+
+    @profiled()
+    def travel_periods(self, year: int) -> AggregateResult:
+        """
+        The periods spent away from the home city, starting in the year selected.
+
+        A trip is a run of days with expenses in another city than the home one (the city with
+        the most days with expenses), allowing TRAVEL_GAP_DAYS days without expenses in between:
+        it ends on a day with expenses only in the home city.
+
+        Parameters
+        ----------
+        year : int
+            Year selected by the user.
+
+        Returns
+        -------
+        AggregateResult
+            One row per trip, with the columns "city", "start", "end", "days" and "expenses"
+            (spent away from the home city).
+        """
+        if self._travel is None:
+            self._travel = self._travel_periods()
+        trips = self._travel
+        starts = pd.to_datetime(trips["start"])
+        return AggregateResult(
+            frame=trips.loc[starts.dt.year == int(year)].reset_index(drop=True),
+            title=f"Travel periods - {int(year)} (home: {self.home_city()})",
+        )
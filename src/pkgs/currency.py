@@ -0,0 +1,186 @@
+"""
+This script contains the conversion of a multi-currency ledger into a single base currency.
+
+The ledger has a 'currency' column, and the FX rates are loaded from a file with one rate per day
+and currency. Every row is converted with the last rate known on its date, with a vectorized as-of
+join (pd.merge_asof) instead of a lookup per row. The converted ledger, and its aggregates, are
+kept per base currency: switching back and forth between currencies does not convert the rows again.
+"""
+
+# --- Import packages --- #
+import io
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass, field
+from .aggregates import ExpenseAggregates
+from .ingestion import parse_dates, sort_by_date
+from .profiling import profiled
+
+# columns of the FX rates file: the rate is the value of one unit of the currency in a common
+# reference currency, whatever it is (the rate of the reference currency itself is 1)
+FX_COLUMNS = ["date", "currency", "rate"]
+
+
+def read_fx_rates(data: bytes, file_extension: str) -> pd.DataFrame:
+    """
+    Reads the FX rates file.
+
+    Parameters
+    ----------
+    data : bytes
+        The content of the uploaded file, with the columns "date", "currency" and "rate".
+    file_extension : str
+        Either "csv" or "xlsx".
+
+    Returns
+    -------
+    pd.DataFrame
+        The rates, sorted by date, without the rows missing a value.
+
+    Raises
+    ------
+    ValueError
+        If one of the FX_COLUMNS is not in the file.
+    """
+    if file_extension == "csv":
+        rates = pd.read_csv(io.BytesIO(data), sep=";", dtype={"rate": np.float64})
+    else:
+        rates = pd.read_excel(io.BytesIO(data))
+
+    missing = [column for column in FX_COLUMNS if column not in rates.columns]
+    if missing:
+        raise ValueError(f"The FX rates file has no {', '.join(missing)} column.")
+
+    rates = rates[FX_COLUMNS].copy()
+    rates["date"] = parse_dates(rates["date"].astype(str))
+    rates["rate"] = rates["rate"].astype(np.float64)
+    return rates.dropna().sort_values(by=["date"], kind="stable", ignore_index=True)
+
+
+@dataclass
+class ConvertedLedger:
+    """
+    A ledger converted into a base currency.
+
+    Attributes:
+        base (str): The base currency.
+        df (pd.DataFrame): The expenses, with the 'value' column in the base currency.
+        aggregates (ExpenseAggregates): The aggregates of the converted expenses.
+        missing_rates (int): Number of rows that could not be converted, as there is no rate for
+            their currency on or before their date. Their value is missing (NaN).
+    """
+
+    base: str
+    df: pd.DataFrame
+    aggregates: ExpenseAggregates
+    missing_rates: int = 0
+
+
+@dataclass
+class CurrencyConverter:
+    """
+    A class to convert a multi-currency ledger into a base currency, keeping each conversion.
+
+    Attributes:
+        df (pd.DataFrame): The expenses, with the 'currency' column. The rows without a currency are
+            taken as being in the base currency.
+        rates (pd.DataFrame): The FX rates, as returned by read_fx_rates.
+
+    Methods:
+        currencies():
+            Returns the currencies the ledger can be converted into.
+        default_base():
+            Returns the currency of most of the rows of the ledger, among currencies().
+        cross_rates(base):
+            Returns the value of one unit of every currency in the base currency, per day.
+        convert(base):
+            Returns the ledger converted into the base currency.
+    """
+
+    df: pd.DataFrame
+    rates: pd.DataFrame
+    _converted: dict[str, ConvertedLedger] = field(default_factory=dict)
+
+    def currencies(self) -> list[str]:
+        """The currencies with FX rates, in alphabetical order."""
+        return sorted(self.rates["currency"].unique().tolist())
+
+    def default_base(self) -> str:
+        """The currency of most of the rows of the ledger, among currencies()."""
+        currencies = self.currencies()
+        counts = self.df["currency"].value_counts()
+        counts = counts[counts.index.isin(currencies)]
+        return counts.index[0] if not counts.empty else currencies[0]
+
+    def cross_rates(self, base: str) -> pd.DataFrame:
+        """
+        Value of one unit of every currency in the base currency, on each day with a rate.
+
+        Parameters
+        ----------
+        base : str
+            The base currency, one of currencies().
+
+        Returns
+        -------
+        pd.DataFrame
+            One row per day and currency, sorted by date, with the columns "date", "currency" and "rate".
+        """
+        # one column per currency, carrying forward the last rate known on the days without one
+        per_day = self.rates.pivot_table(
+            index="date", columns="currency", values="rate", aggfunc="last"
+        ).ffill()
+        cross = per_day.div(per_day[base], axis=0)
+        cross.columns.name = "currency"
+        return (
+            cross.melt(ignore_index=False, value_name="rate")
+            .dropna()
+            .reset_index()
+            .sort_values(by=["date"], kind="stable", ignore_index=True)
+        )
+
+    @profiled()
+    def convert(self, base: str) -> ConvertedLedger:
+        """
+        The ledger converted into the base currency, with the last rate known on the date of each row.
+
+        Parameters
+        ----------
+        base : str
+            The base currency, one of currencies().
+
+        Returns
+        -------
+        ConvertedLedger
+            The converted expenses and their aggregates, computed once per base currency.
+        """
+        if base in self._converted:
+            return self._converted[base]
+
+        df = sort_by_date(self.df)
+        # the rows without a date are sorted last: they cannot be converted nor shown
+        dated = int(df["date"].notna().sum())
+        currency = df["currency"].fillna(base).astype(str)
+
+        rows = pd.DataFrame({"date": df["date"].iloc[:dated], "currency": currency.iloc[:dated]})
+        factors = pd.merge_asof(
+            rows, self.cross_rates(base), on="date", by="currency", direction="backward"
+        )["rate"].to_numpy()
+        factors = np.append(factors, np.full(len(df) - dated, np.nan))
+        # no rounding error on the rows that are already in the base currency
+        factors[(currency == base).to_numpy()] = 1.0
+
+        converted = df.copy()
+        converted["value"] = df["value"].to_numpy() * factors
+        aggregates = ExpenseAggregates()
+        aggregates.update(converted)
+        # the transactions are scored now, as when a ledger is parsed, not at the first read
+        aggregates.anomalies.flush()
+
+        self._converted[base] = ConvertedLedger(
+            base=base,
+            df=converted,
+            aggregates=aggregates,
+            missing_rates=int(np.isnan(factors[:dated]).sum()),
+        )
+        return self._converted[base]
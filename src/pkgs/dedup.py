@@ -0,0 +1,132 @@
+"""
+This script contains the removal of the duplicate transactions, when overlapping exports of the
+same account are uploaded one after the other.
+
+Each row is fingerprinted by hashing its (date, value, store, expense_type), vectorized. The
+fingerprints of the ledger are kept in a hash index with the number of rows sharing each of them.
+A row of a new upload is a duplicate when the ledger already has as many rows with its
+fingerprint as the upload has up to that row: two identical coffees of the same day in a file
+are kept, but not again when the file is uploaded once more. Everything runs in O(rows).
+"""
+
+# --- Import packages --- #
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass, field
+from .profiling import profiled
+
+# the columns identifying a transaction
+FINGERPRINT_COLUMNS = ["date", "value", "store", "expense_type"]
+
+
+def fingerprint(df: pd.DataFrame) -> np.ndarray:
+    """
+    Hashes the FINGERPRINT_COLUMNS of every row, vectorized.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The expenses. A missing column hashes as a missing value.
+
+    Returns
+    -------
+    np.ndarray
+        One 64-bit hash per row.
+    """
+    # the categoricals are hashed by value, so a categorical and an object column agree
+    columns = df.reindex(columns=FINGERPRINT_COLUMNS).astype(
+        {"store": "object", "expense_type": "object"}
+    )
+    return pd.util.hash_pandas_object(columns, index=False).to_numpy()
+
+
+def _count(hashes: np.ndarray) -> pd.Series:
+    return pd.Series(hashes).value_counts(sort=False)
+
+
+@dataclass
+class FingerprintIndex:
+    """
+    A class to hold the fingerprints of a ledger, and how many rows share each of them.
+
+    Attributes:
+        counts (pd.Series): The number of rows per fingerprint, indexed by fingerprint.
+
+    Methods:
+        from_dataframe(df):
+            Builds the index of a ledger.
+        merge(other):
+            Returns the index of a ledger with the rows of both indexes, without the duplicates.
+    """
+
+    counts: pd.Series = field(default_factory=lambda: pd.Series(dtype="int64"))
+
+    @classmethod
+    @profiled()
+    def from_dataframe(cls, df: pd.DataFrame) -> "FingerprintIndex":
+        """Builds the index of a ledger, with a single pass over its rows."""
+        return cls(counts=_count(fingerprint(df)))
+
+    def merge(self, other: "FingerprintIndex") -> "FingerprintIndex":
+        """The index of the rows of both ledgers, the duplicates being counted once."""
+        counts = pd.concat([self.counts, other.counts])
+        return FingerprintIndex(counts=counts.groupby(level=0, sort=False).max())
+
+
+@dataclass
+class Deduplicator:
+    """
+    A class to drop, chunk by chunk, the rows of a new upload that are already in the ledger.
+
+    Attributes:
+        ledger (FingerprintIndex): The fingerprints of the ledger the upload is added to.
+        dropped (int): Number of rows dropped so far.
+
+    Methods:
+        filter(df):
+            Returns the rows of a chunk of the upload that are not in the ledger.
+        index():
+            Returns the fingerprints of the ledger with the upload added.
+    """
+
+    ledger: FingerprintIndex
+    dropped: int = 0
+    # the fingerprints of the upload seen so far, in the previous chunks
+    _upload: FingerprintIndex = field(default_factory=FingerprintIndex)
+
+    @profiled()
+    def filter(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Rows of a chunk of the upload that are not in the ledger.
+
+        Parameters
+        ----------
+        df : pd.DataFrame
+            The next chunk of the upload.
+
+        Returns
+        -------
+        pd.DataFrame
+            The chunk without its duplicates.
+        """
+        if df.empty:
+            return df
+        hashes = fingerprint(df)
+        # the rank of each row among the rows of the upload with the same fingerprint (1 for the first)
+        occurrence = (
+            pd.Series(hashes).groupby(hashes, sort=False).cumcount().to_numpy()
+            + self._upload.counts.reindex(hashes, fill_value=0).to_numpy()
+            + 1
+        )
+        in_ledger = self.ledger.counts.reindex(hashes, fill_value=0).to_numpy()
+        duplicate = occurrence <= in_ledger
+
+        self._upload = FingerprintIndex(
+            counts=self._upload.counts.add(_count(hashes), fill_value=0).astype("int64")
+        )
+        self.dropped += int(duplicate.sum())
+        return df.loc[~duplicate]
+
+    def index(self) -> FingerprintIndex:
+        """The fingerprints of the ledger with the rows of the upload that were kept."""
+        return self.ledger.merge(self._upload)
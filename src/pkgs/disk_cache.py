@@ -0,0 +1,196 @@
+"""
+This script contains the cache of the parsed ledgers on disk, surviving the restarts of the server.
+
+The ledgers shared by the sessions (see ledgers.py) only live in memory: after a restart, the first
+session opening a ledger parses it again. With the disk cache, the expenses of a parsed ledger and
+its aggregates (the daily sums, the monthly cube, the category totals, the prefix sums and the
+rollups built along them) are written to a file named after the version of the ledger, and read
+back, in a fraction of the parsing time, by the next session opening the same version.
+
+The dashboard does not store any data by default: the cache is only enabled when the
+EXPENSE_TRACKER_CACHE_DIR environment variable names a directory, which must only be writable by
+the server, as the files are unpickled. Each file starts with the schema version of the cache
+and a checksum of its content: a file of another schema version, truncated, altered, or whose
+ledger does not match its aggregates is ignored and deleted, and the ledger is parsed again.
+"""
+
+# --- Import packages --- #
+import dataclasses
+import hashlib
+import logging
+import os
+import pickle
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+import pandas as pd
+from .aggregates import ExpenseAggregates
+from .ingestion import IngestionJob
+from .validation import ValidationReport
+
+logger = logging.getLogger(__name__)
+
+# the environment variable enabling the cache, with its directory
+CACHE_DIR_VARIABLE = "EXPENSE_TRACKER_CACHE_DIR"
+# to be increased whenever the parsed ledger or the aggregates change: the older files are ignored
+SCHEMA_VERSION = 1
+# most disk space of the cache: the files read least recently are deleted first
+MAX_DISK_BYTES = 2**30
+MAGIC = b"EXPENSE-TRACKER-LEDGER"
+CHECKSUM_SIZE = 32
+SUFFIX = ".ledger"
+
+
+def _checksum(payload: bytes) -> bytes:
+    return hashlib.blake2b(payload, digest_size=CHECKSUM_SIZE).digest()
+
+
+def _header() -> bytes:
+    return MAGIC + SCHEMA_VERSION.to_bytes(4, "big")
+
+
+@dataclass
+class DiskLedgerCache:
+    """
+    A class to keep the parsed ledgers and their aggregates on disk, one file per version.
+
+    Attributes:
+        directory (Path): The directory of the files, created if missing.
+        max_bytes (int): Most disk space of the files, in bytes. Default is MAX_DISK_BYTES.
+
+    Methods:
+        load(version, data, file_extension):
+            Returns the job of a ledger already parsed, read from its file.
+        store(version, job):
+            Writes the expenses and the aggregates of a parsed ledger to its file.
+    """
+
+    directory: Path
+    max_bytes: int = MAX_DISK_BYTES
+
+    def __post_init__(self) -> None:
+        self.directory = Path(self.directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, version: str) -> Path:
+        return self.directory / f"{version}{SUFFIX}"
+
+    def _read(self, path: Path, version: str) -> Optional[tuple]:
+        content = path.read_bytes()
+        header = _header()
+        if not content.startswith(header):
+            return None
+        checksum = content[len(header) : len(header) + CHECKSUM_SIZE]
+        payload = content[len(header) + CHECKSUM_SIZE :]
+        if _checksum(payload) != checksum:
+            return None
+        stored = pickle.loads(payload)
+        if not isinstance(stored, dict) or stored.get("version") != version:
+            return None
+        df, aggregates, report = stored.get("df"), stored.get("aggregates"), stored.get("report")
+        # the objects must have all the fields of their classes, and match each other
+        if (
+            not isinstance(df, pd.DataFrame)
+            or not isinstance(aggregates, ExpenseAggregates)
+            or not isinstance(report, ValidationReport)
+            or any(
+                not hasattr(aggregates, attribute.name)
+                for attribute in dataclasses.fields(ExpenseAggregates)
+            )
+            or len(df) != aggregates.rows
+        ):
+            return None
+        return df, aggregates, report
+
+    def load(self, version: str, data: bytes, file_extension: str) -> Optional[IngestionJob]:
+        """
+        Returns the job of a ledger already parsed, read from its file.
+
+        Parameters
+        ----------
+        version : str
+            Version of the ledger, see ledgers.ledger_version.
+        data : bytes
+            The content of the uploaded file, to ingest its next version incrementally.
+        file_extension : str
+            Either "csv" or "xlsx".
+
+        Returns
+        -------
+        Optional[IngestionJob]
+            A job already done, with the expenses and aggregates of the file, or None if there is
+            no valid file for the version (an invalid file is deleted).
+        """
+        path = self._path(version)
+        if not path.exists():
+            return None
+        try:
+            stored = self._read(path, version)
+        except Exception as error:  # a file that cannot be read is parsed again
+            logger.warning("The cached ledger %s could not be read: %s", path.name, error)
+            stored = None
+        if stored is None:
+            path.unlink(missing_ok=True)
+            return None
+        # the files read least recently are deleted first
+        os.utime(path)
+        return IngestionJob.completed(data, file_extension, *stored)
+
+    def store(self, version: str, job: IngestionJob) -> None:
+        """
+        Writes the expenses and the aggregates of a parsed ledger to its file.
+
+        The file is written next to its final path, then renamed: a session never reads a file
+        being written. The files read least recently are deleted beyond max_bytes.
+
+        Parameters
+        ----------
+        version : str
+            Version of the ledger, see ledgers.ledger_version.
+        job : IngestionJob
+            The job parsing the ledger: only a job done, neither failed nor cancelled, is written.
+        """
+        if not job.done or job.cancelled or job.error is not None:
+            return
+        payload = pickle.dumps(
+            {
+                "version": version,
+                "df": job.result(),
+                "aggregates": job.aggregates,
+                "report": job.report,
+            },
+            protocol=pickle.HIGHEST_PROTOCOL,
+        )
+        temporary_path = self.directory / f"{version}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            temporary_path.write_bytes(_header() + _checksum(payload) + payload)
+            os.replace(temporary_path, self._path(version))
+            self._evict()
+        except OSError as error:  # such as a full disk: the ledger is just not cached
+            logger.warning("The ledger %s could not be cached: %s", version, error)
+            temporary_path.unlink(missing_ok=True)
+
+    def _evict(self) -> None:
+        # the file just written is kept, even when it is larger than max_bytes
+        files = [(path, path.stat()) for path in self.directory.glob(f"*{SUFFIX}")]
+        files.sort(key=lambda file: file[1].st_mtime)
+        used = sum(stat.st_size for _, stat in files)
+        for path, stat in files[:-1]:
+            if used <= self.max_bytes:
+                break
+            used -= stat.st_size
+            path.unlink(missing_ok=True)
+
+
+def disk_ledger_cache() -> Optional[DiskLedgerCache]:
+    """
+    Returns the disk cache of the ledgers, if enabled by the EXPENSE_TRACKER_CACHE_DIR variable.
+
+    Returns
+    -------
+    Optional[DiskLedgerCache]
+        The cache in the directory named by the variable, or None if it is not set.
+    """
+    directory = os.environ.get(CACHE_DIR_VARIABLE)
+    return DiskLedgerCache(Path(directory)) if directory else None
@@ -0,0 +1,247 @@
+"""
+This script contains the drill-down from the bars of the charts to the transactions behind them.
+
+The rows of the (date-sorted) ledger are indexed once per upload by (category, period, store),
+where the period is the month: the rows of a category in a range of months, or in a month, or of
+a store in a month, are then a contiguous slice of the index, found with a binary search, instead
+of a filter over the whole ledger. Only the page of transactions shown is taken from the ledger.
+"""
+
+# --- Import packages --- #
+import datetime
+import math
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass
+from typing import Optional
+from .profiling import profiled
+from .results_dataclasses import TransactionPage
+
+# number of transactions shown per page
+PAGE_SIZE = 50
+# columns of the transactions shown
+TRANSACTION_COLUMNS = ["date", "expense_category", "expense_type", "value", "store", "city"]
+
+
+def _period(date: datetime.date) -> int:
+    # one number per month: the months of the index are consecutive numbers
+    return date.year * 12 + date.month - 1
+
+
+@dataclass
+class TransactionIndex:
+    """
+    A class to find the transactions of a category, in a timeframe or a month, without scanning the ledger.
+
+    Attributes:
+        df (pd.DataFrame): The ledger, sorted by date.
+        order (np.ndarray): The positions of the rows with a date and a category in the ledger,
+            sorted by (category, month, store); within a key, in date order.
+        keys (np.ndarray): The key of each position of `order`, in the same (ascending) order.
+        categories (pd.Index): The categories of the ledger: the code of a category is its position.
+        stores (pd.Index): The stores of the ledger, the rows without a store having the last code.
+        first_period (int): The first month of the ledger, as year * 12 + month - 1.
+        periods (int): Number of months between the first and the last month of the ledger, plus one.
+
+    Methods:
+        from_dataframe(df):
+            Builds the index of a ledger sorted by date.
+        positions(category, past_date, today_date, store):
+            Returns the rows of a category (and store) between two dates.
+        positions_in_month(category, year, month, store):
+            Returns the rows of a category (and store) in a month.
+        page(positions, page, page_size, title):
+            Returns a page of the transactions at the positions.
+    """
+
+    df: pd.DataFrame
+    order: np.ndarray
+    keys: np.ndarray
+    categories: pd.Index
+    stores: pd.Index
+    first_period: int = 0
+    periods: int = 0
+
+    @classmethod
+    @profiled()
+    def from_dataframe(cls, df: pd.DataFrame) -> "TransactionIndex":
+        """
+        Builds the index of a ledger sorted by date, with a single sort of the keys.
+
+        Parameters
+        ----------
+        df : pd.DataFrame
+            The expenses, sorted by the 'date' column.
+
+        Returns
+        -------
+        TransactionIndex
+            The index of the rows of the ledger.
+        """
+        category_codes, categories = pd.factorize(df["expense_category"])
+        store_codes, stores = pd.factorize(df["store"])
+        # the rows without a store get a code of their own, after the stores
+        store_codes = np.where(store_codes < 0, len(stores), store_codes)
+
+        dates = df["date"]
+        indexed = (category_codes >= 0) & dates.notna().to_numpy()
+        periods = dates.dt.year.to_numpy(dtype="float64") * 12 + dates.dt.month.to_numpy() - 1
+        positions = np.flatnonzero(indexed)
+        if positions.size == 0:
+            empty = np.array([], dtype=np.int64)
+            return cls(df=df, order=empty, keys=empty, categories=categories, stores=stores)
+
+        period_codes = periods[positions].astype(np.int64)
+        first_period = int(period_codes.min())
+        index = cls(
+            df=df,
+            order=positions,
+            keys=positions,
+            categories=categories,
+            stores=stores,
+            first_period=first_period,
+            periods=int(period_codes.max()) - first_period + 1,
+        )
+        keys = index._key(category_codes[positions], period_codes, store_codes[positions])
+        # stable: the rows of the same key stay in date order
+        sort = np.argsort(keys, kind="stable")
+        index.order, index.keys = positions[sort], keys[sort]
+        return index
+
+    def _key(self, category: np.ndarray, period: np.ndarray, store: np.ndarray) -> np.ndarray:
+        # (category, month, store) as a single integer, in the same lexicographic order
+        return (category * (self.periods + 1) + (period - self.first_period)) * (
+            len(self.stores) + 1
+        ) + store
+
+    def _slice(
+        self, category: str, first_period: int, last_period: int, store: Optional[str]
+    ) -> np.ndarray:
+        if category not in self.categories or self.order.size == 0:
+            return np.array([], dtype=np.int64)
+        code = self.categories.get_loc(category)
+        # the months outside the ledger have no rows
+        first = max(first_period, self.first_period)
+        last = min(last_period, self.first_period + self.periods - 1)
+        if first > last:
+            return np.array([], dtype=np.int64)
+
+        if store is None:
+            low = self._key(code, first, 0)
+            high = self._key(code, last + 1, 0)
+            return self.order[np.searchsorted(self.keys, low) : np.searchsorted(self.keys, high)]
+
+        if store not in self.stores:
+            return np.array([], dtype=np.int64)
+        # one slice per month of the store
+        months = np.arange(first, last + 1)
+        keys = self._key(code, months, self.stores.get_loc(store))
+        starts = np.searchsorted(self.keys, keys, side="left")
+        stops = np.searchsorted(self.keys, keys, side="right")
+        return np.concatenate(
+            [self.order[start:stop] for start, stop in zip(starts, stops)]
+            + [np.array([], dtype=np.int64)]
+        )
+
+    @profiled()
+    def positions(
+        self,
+        category: str,
+        past_date: datetime.date,
+        today_date: datetime.date,
+        store: Optional[str] = None,
+    ) -> np.ndarray:
+        """
+        Rows of a category, and optionally of a store, between two dates, both included.
+
+        Parameters
+        ----------
+        category : str
+            The expense category.
+        past_date : datetime.date
+            The start date of the timeframe (the "From" date).
+        today_date : datetime.date
+            The end date of the timeframe (the "To" date).
+        store : Optional[str], optional
+            The store. Defaults to None (every store).
+
+        Returns
+        -------
+        np.ndarray
+            The positions of the rows in the ledger, in date order.
+        """
+        block = self._slice(category, _period(past_date), _period(today_date), store)
+        # the first and last months may be partly outside the timeframe
+        dates = self.df["date"].to_numpy()[block]
+        inside = (dates >= np.datetime64(past_date)) & (
+            dates < np.datetime64(today_date + datetime.timedelta(days=1))
+        )
+        return np.sort(block[inside])
+
+    @profiled()
+    def positions_in_month(
+        self, category: str, year: int, month: int, store: Optional[str] = None
+    ) -> np.ndarray:
+        """
+        Rows of a category, and optionally of a store, in a month.
+
+        Parameters
+        ----------
+        category : str
+            The expense category.
+        year : int
+            The year selected by the user.
+        month : int
+            The month selected by the user.
+        store : Optional[str], optional
+            The store. Defaults to None (every store).
+
+        Returns
+        -------
+        np.ndarray
+            The positions of the rows in the ledger, in date order.
+        """
+        period = int(year) * 12 + int(month) - 1
+        return np.sort(self._slice(category, period, period, store))
+
+    @staticmethod
+    def page_count(positions: np.ndarray, page_size: int = PAGE_SIZE) -> int:
+        """Number of pages of the transactions at the positions, at least 1."""
+        return max(math.ceil(len(positions) / page_size), 1)
+
+    @profiled()
+    def page(
+        self, positions: np.ndarray, page: int, page_size: int = PAGE_SIZE, title: str = ""
+    ) -> TransactionPage:
+        """
+        A page of the transactions at the positions: only its rows are taken from the ledger.
+
+        Parameters
+        ----------
+        positions : np.ndarray
+            The positions of the rows, as returned by positions or positions_in_month.
+        page : int
+            The page, from 1 to page_count(positions).
+        page_size : int, optional
+            Number of transactions per page. Defaults to PAGE_SIZE.
+        title : str, optional
+            Title of the transactions. Defaults to "".
+
+        Returns
+        -------
+        TransactionPage
+            The transactions of the page, with the total number of transactions and their sum.
+        """
+        pages = self.page_count(positions, page_size)
+        page = min(max(int(page), 1), pages)
+        rows = positions[(page - 1) * page_size : page * page_size]
+        columns = [column for column in TRANSACTION_COLUMNS if column in self.df.columns]
+        return TransactionPage(
+            frame=self.df.iloc[rows][columns].reset_index(drop=True),
+            page=page,
+            pages=pages,
+            first_row=(page - 1) * page_size + 1 if len(rows) else 0,
+            total_rows=len(positions),
+            total_value=round(float(np.nansum(self.df["value"].to_numpy()[positions])), 2),
+            title=title,
+        )
@@ -0,0 +1,193 @@
+"""
+This script contains the forecast of the expenses: where the month in progress will end up, and how
+much will be spent next month, per category.
+
+The model is a seasonal exponential smoothing of the monthly cube of the aggregates (one row per
+month, one column per category): a level, the weighted average of the recent months, times the
+seasonal index of the calendar month, the usual share of that month in a year. It is fitted once
+per version of the ledger, for every category at once, so a forecast is then just a lookup.
+"""
+
+# --- Import packages --- #
+import calendar
+import datetime
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass, field
+from .aggregates import ExpenseAggregates
+from .global_vars import NON_EXPENSE_CATEGORIES
+from .profiling import profiled
+from .results_dataclasses import AggregateResult
+
+# fewest complete months needed to estimate the seasonal indexes: two full years
+MIN_SEASONAL_MONTHS = 24
+
+
+@dataclass
+class SpendForecast:
+    """
+    A class to forecast the monthly expenses per category, fitted once per ledger.
+
+    Attributes:
+        level (pd.Series): The deseasonalized monthly expenses per category, at the last complete month.
+        seasonal (pd.DataFrame): One row per calendar month (1-12), one column per category, with the
+            seasonal index of the month (1 for an average month).
+        monthly (pd.DataFrame): The monthly cube of the expenses, to read the actual expenses of a month.
+        months (int): Number of complete months the model has been fitted on.
+
+    Methods:
+        fit(aggregates, alpha):
+            Fits the model on the monthly cube of the aggregates.
+        predict(year, month):
+            Returns the expenses per category expected in a month.
+        report(year, month, as_of):
+            Returns the actual, month-end and next-month expenses per category.
+    """
+
+    level: pd.Series = field(default_factory=lambda: pd.Series(dtype="float64"))
+    seasonal: pd.DataFrame = field(default_factory=pd.DataFrame)
+    monthly: pd.DataFrame = field(default_factory=pd.DataFrame)
+    months: int = 0
+    _reports: dict[tuple, AggregateResult] = field(default_factory=dict)
+
+    @classmethod
+    @profiled()
+    def fit(cls, aggregates: ExpenseAggregates, alpha: float = 0.3) -> "SpendForecast":
+        """
+        Fits the model on the complete months of the monthly cube of the aggregates.
+
+        Parameters
+        ----------
+        aggregates : ExpenseAggregates
+            The aggregates of the ledger.
+        alpha : float, optional
+            Weight of the most recent month in the level. Defaults to 0.3.
+
+        Returns
+        -------
+        SpendForecast
+            The fitted model.
+        """
+        monthly = aggregates.monthly.loc[
+            :, ~aggregates.monthly.columns.isin(NON_EXPENSE_CATEGORIES)
+        ]
+        if monthly.empty:
+            return cls(monthly=monthly)
+
+        periods = pd.PeriodIndex.from_fields(
+            year=monthly.index.get_level_values("year").to_numpy(),
+            month=monthly.index.get_level_values("month").to_numpy(),
+            freq="M",
+        )
+        # the month of the last day is still in progress, unless the day is the end of the month
+        last_day = aggregates.daily.index[-1]
+        last_complete = last_day.to_period("M") - (0 if last_day.is_month_end else 1)
+        history = monthly.set_axis(periods).loc[periods <= last_complete]
+        if history.empty:
+            return cls(
+                level=monthly.iloc[0] * 0.0, seasonal=_flat(monthly.columns), monthly=monthly
+            )
+        # the months without expenses are not in the cube: they count as 0
+        history = history.reindex(
+            pd.period_range(history.index[0], last_complete, freq="M"), fill_value=0.0
+        )
+
+        seasonal = _flat(history.columns)
+        if len(history) >= MIN_SEASONAL_MONTHS:
+            # share of each month in its year, for the full years only
+            years = history.index.year
+            full_years = pd.Series(years).map(pd.Series(years).value_counts()).to_numpy() == 12
+            full = history.loc[full_years]
+            yearly_mean = full.groupby(full.index.year).transform("mean")
+            ratios = full / yearly_mean.where(yearly_mean > 0)
+            seasonal = ratios.groupby(full.index.month).mean().reindex(seasonal.index).fillna(1.0)
+            # an average month has an index of 1
+            seasonal = seasonal / seasonal.mean().where(seasonal.mean() > 0, 1.0)
+
+        indexes = seasonal.loc[history.index.month].to_numpy()
+        deseasonalized = history / np.where(indexes > 0, indexes, np.nan)
+        level = deseasonalized.ewm(alpha=alpha).mean().iloc[-1].fillna(0.0)
+        return cls(level=level, seasonal=seasonal, monthly=monthly, months=len(history))
+
+    def predict(self, year: int, month: int) -> pd.Series:
+        """
+        The expenses per category expected in a month.
+
+        Parameters
+        ----------
+        year : int
+            The year of the month.
+        month : int
+            The month (1-12).
+
+        Returns
+        -------
+        pd.Series
+            The expected expenses per category.
+        """
+        if self.level.empty:
+            return self.level
+        return self.level * self.seasonal.loc[int(month)]
+
+    @profiled()
+    def report(self, year: int, month: int, as_of: datetime.date) -> AggregateResult:
+        """
+        Actual expenses of a month per category, projected to the end of the month, and the
+        expenses expected in the next month. Each report is computed once, then looked up.
+
+        The expenses still to come in the month in progress are the forecast of the month for
+        the days left; without any complete month to learn from, the pace of the days elapsed.
+
+        Parameters
+        ----------
+        year : int
+            The year selected by the user.
+        month : int
+            The month selected by the user.
+        as_of : datetime.date
+            The current date, to know how much of the month has elapsed.
+
+        Returns
+        -------
+        AggregateResult
+            One row per category, with the columns "expense_category", "actual", "month_end" and
+            "next_month", from the highest month-end expenses to the lowest.
+        """
+        key = (int(year), int(month), as_of)
+        if key in self._reports:
+            return self._reports[key]
+
+        period = (int(year), int(month))
+        actual = (
+            self.monthly.loc[period]
+            if period in self.monthly.index
+            else pd.Series(0.0, index=self.monthly.columns)
+        )
+
+        # share of the month elapsed: 0 for a future month, 1 for a past month
+        days_in_month = calendar.monthrange(*period)[1]
+        elapsed_days = (as_of - datetime.date(*period, 1)).days + 1
+        elapsed = min(max(elapsed_days, 0), days_in_month) / days_in_month
+        if self.months > 0:
+            remaining = self.predict(*period) * (1 - elapsed)
+        else:
+            remaining = actual / elapsed * (1 - elapsed) if elapsed > 0 else actual * 0.0
+
+        next_period = pd.Period(year=period[0], month=period[1], freq="M") + 1
+        frame = pd.DataFrame(
+            {
+                "actual": actual,
+                "month_end": actual + remaining,
+                "next_month": self.predict(next_period.year, next_period.month),
+            }
+        ).fillna(0.0)
+        frame.index.name = "expense_category"
+        self._reports[key] = AggregateResult(
+            frame=frame.round(2).sort_values(by="month_end", ascending=False).reset_index(),
+            title=f"Forecast - {calendar.month_abbr[period[1]]} {period[0]}",
+        )
+        return self._reports[key]
+
+
+def _flat(categories: pd.Index) -> pd.DataFrame:
+    return pd.DataFrame(1.0, index=pd.RangeIndex(1, 13, name="month"), columns=categories)
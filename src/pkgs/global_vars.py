@@ -1,5 +1,4 @@
 import datetime
-import streamlit as st
 
 # define the start date and end date
 today = datetime.date.today()
@@ -9,3 +8,10 @@ past = today - datetime.timedelta(days=30)
 
 BACKGROUND_COLOR = "white"
 COLOR = "black"
+
+# categories that are not expenses: they are excluded from every expense total
+NON_EXPENSE_CATEGORIES = ["income", "investment", "savings"]
+
+# names of the months and of the weekdays, in calendar order (weekday_number 1 is Monday)
+MONTHS_TEXT = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+WEEKDAYS_TEXT = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
@@ -0,0 +1,169 @@
+"""
+This script contains the binned aggregates behind the spending heatmaps: the expenses per
+weekday and week of the year, and per category and day of the month, for each year.
+
+The bins are small integer grids (7 x 54 and categories x 31 per year), filled chunk by chunk
+while the file is ingested, together with the other aggregates: the cell of each row is a single
+integer, and a chunk is added to every grid of every year with one weighted bincount. A heatmap
+of any year is then a lookup of its grid, without grouping the rows of the ledger again.
+"""
+
+# --- Import packages --- #
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass, field
+from .global_vars import NON_EXPENSE_CATEGORIES, WEEKDAYS_TEXT
+from .results_dataclasses import AggregateResult
+
+# weeks of the year, Monday first: week 0 holds the days before the first Monday (as %W)
+WEEKS = 54
+DAYS_OF_MONTH = 31
+
+
+def _week_of_year(day_of_year: np.ndarray, weekday: np.ndarray) -> np.ndarray:
+    # day_of_year from 1, weekday from 0 (Monday)
+    return (day_of_year - 1 + 7 - weekday) // 7
+
+
+@dataclass
+class SpendingBins:
+    """
+    A class to hold the expenses of each year binned per weekday and week, and per category and day.
+
+    Attributes:
+        categories (list[str]): The expense categories, in order of appearance: the rows of the
+            category grids.
+        weekday_week (dict[int, np.ndarray]): Per year, the sum of the expenses of each weekday
+            (rows, Monday first) and week of the year (columns), as a 7 x WEEKS grid.
+        category_day (dict[int, np.ndarray]): Per year, the sum of the expenses of each category
+            (rows) and day of the month (columns), as a len(categories) x DAYS_OF_MONTH grid.
+
+    Methods:
+        update(df):
+            Adds the expenses of a chunk of the ledger to the grids.
+        weekday_week_totals(year):
+            Returns the expenses of a year per weekday and week.
+        category_day_totals(year):
+            Returns the expenses of a year per category and day of the month.
+    """
+
+    categories: list[str] = field(default_factory=list)
+    weekday_week: dict[int, np.ndarray] = field(default_factory=dict)
+    category_day: dict[int, np.ndarray] = field(default_factory=dict)
+
+    def update(self, df: pd.DataFrame) -> None:
+        """
+        Adds the expenses of a chunk of the ledger to the grids of their years.
+
+        Parameters
+        ----------
+        df : pd.DataFrame
+            A chunk of the ledger. Must have the 'date', 'expense_category' and 'value' columns.
+        """
+        # the categories are factorized once: the expenses are the rows of the expense categories
+        codes, uniques = pd.factorize(df["expense_category"])
+        new_categories = [
+            category
+            for category in uniques
+            if category not in NON_EXPENSE_CATEGORIES and category not in self.categories
+        ]
+        # the new categories get the next rows of the grids
+        self.categories.extend(new_categories)
+        rows = {category: row for row, category in enumerate(self.categories)}
+        category_rows = np.array([rows.get(category, -1) for category in uniques] + [-1])
+        # the code -1 (no category) takes the last entry
+        codes = category_rows[codes]
+
+        dates = df["date"]
+        values = df["value"].to_numpy(dtype=np.float64)
+        keep = (codes >= 0) & dates.notna().to_numpy() & ~np.isnan(values)
+        if not keep.any():
+            return
+
+        codes, values = codes[keep], values[keep]
+        dates = dates[keep].dt
+        years = dates.year.to_numpy(dtype=np.int64)
+        weekday = dates.dayofweek.to_numpy(dtype=np.int64)
+        week = _week_of_year(dates.dayofyear.to_numpy(dtype=np.int64), weekday)
+        day = dates.day.to_numpy(dtype=np.int64) - 1
+
+        first_year = int(years.min())
+        year_codes = years - first_year
+        count = int(year_codes.max()) + 1
+        cells = 7 * WEEKS
+        weekday_week = np.bincount(
+            year_codes * cells + weekday * WEEKS + week, weights=values, minlength=count * cells
+        ).reshape(count, 7, WEEKS)
+        cells = len(self.categories) * DAYS_OF_MONTH
+        category_day = np.bincount(
+            year_codes * cells + codes * DAYS_OF_MONTH + day,
+            weights=values,
+            minlength=count * cells,
+        ).reshape(count, len(self.categories), DAYS_OF_MONTH)
+
+        for year_code in np.unique(year_codes):
+            year = first_year + int(year_code)
+            self.weekday_week[year] = self.weekday_week.get(year, 0.0) + weekday_week[year_code]
+            previous = self.category_day.get(year)
+            if previous is not None:
+                # the grid of the year gets the rows of the new categories, if any
+                previous = np.pad(previous, ((0, len(self.categories) - len(previous)), (0, 0)))
+                category_day[year_code] += previous
+            self.category_day[year] = category_day[year_code]
+
+    def weekday_week_totals(self, year: int) -> AggregateResult:
+        """
+        Expenses of a year per weekday and week of the year.
+
+        Parameters
+        ----------
+        year : int
+            The year selected by the user.
+
+        Returns
+        -------
+        AggregateResult
+            One row per weekday (Monday first) and one column per week of the year, from 0 (the
+            days before the first Monday): the cells of the days that are not in the year are
+            missing values.
+        """
+        grid = self.weekday_week.get(int(year), np.zeros((7, WEEKS)))
+        # the cells of the first and last weeks before and after the year are not days
+        days = pd.date_range(f"{int(year)}-01-01", f"{int(year)}-12-31")
+        inside = np.zeros((7, WEEKS), dtype=bool)
+        inside[days.dayofweek, _week_of_year(days.dayofyear, days.dayofweek)] = True
+        frame = pd.DataFrame(
+            np.where(inside, grid.round(2), np.nan),
+            index=pd.Index(WEEKDAYS_TEXT, name="weekday"),
+            columns=pd.RangeIndex(WEEKS, name="week"),
+        )
+        return AggregateResult(
+            # week 0 has no day when the year starts on a Monday
+            frame=frame.dropna(axis=1, how="all"),
+            title=f"Expenses per weekday and week - {int(year)}",
+        )
+
+    def category_day_totals(self, year: int) -> AggregateResult:
+        """
+        Expenses of a year per category and day of the month.
+
+        Parameters
+        ----------
+        year : int
+            The year selected by the user.
+
+        Returns
+        -------
+        AggregateResult
+            One row per category with expenses in the year, and one column per day of the month.
+        """
+        grid = self.category_day.get(int(year), np.zeros((0, DAYS_OF_MONTH)))
+        frame = pd.DataFrame(
+            grid.round(2),
+            index=pd.Index(self.categories[: len(grid)], name="expense_category"),
+            columns=pd.RangeIndex(1, DAYS_OF_MONTH + 1, name="day"),
+        )
+        return AggregateResult(
+            frame=frame.loc[frame.sum(axis=1) != 0].sort_index(),
+            title=f"Expenses per category and day of the month - {int(year)}",
+        )
@@ -0,0 +1,136 @@
+"""
+This script contains the hierarchy of the expenses of a timeframe: category, then expense type,
+then store, for the sunburst and treemap charts.
+
+The three levels come from a single grouped aggregation of the rows of the timeframe (sliced
+from the date-sorted ledger). To keep the chart readable and its payload bounded, each node
+keeps at most MAX_CHILDREN children, the smallest ones being folded into an "other" node. Each
+hierarchy is computed once per timeframe, then looked up: exploring the chart, or coming back
+to a timeframe already seen, does not group the rows again.
+"""
+
+# --- Import packages --- #
+import datetime
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass, field
+from .global_vars import NON_EXPENSE_CATEGORIES
+from .ingestion import SORTED_BY_DATE
+from .profiling import profiled
+from .results_dataclasses import AggregateResult
+
+# levels of the hierarchy, from the root
+HIERARCHY_LEVELS = ["expense_category", "expense_type", "store"]
+# children kept per node, the other ones are folded into OTHER: at most 12 x 12 x 12 leaves
+MAX_CHILDREN = 12
+OTHER = "other"
+# name of the nodes without a type or a store
+MISSING = "(none)"
+# timeframes remembered, the oldest one being forgotten first
+MAX_CACHED_PERIODS = 32
+
+
+def _fold(leaves: pd.DataFrame, level: int, max_children: int) -> pd.DataFrame:
+    # the children of each node of the previous level, from the largest
+    parents = HIERARCHY_LEVELS[:level]
+    column = HIERARCHY_LEVELS[level]
+    totals = leaves.groupby(parents + [column], sort=False)["value"].sum()
+    siblings = totals.groupby(level=parents, sort=False) if parents else totals.groupby(lambda _: 0)
+    ranks = siblings.rank(method="first", ascending=False).to_numpy()
+    # a node with max_children children keeps them all, otherwise the last one is "other"
+    kept = (ranks < max_children) | (siblings.transform("size").to_numpy() <= max_children)
+    folded = totals.index.get_level_values(column).where(kept, OTHER)
+    names = pd.Series(folded, index=totals.index, name=column)
+    # the rows of the folded children are renamed, their own children are folded with them
+    leaves = leaves.join(names.rename("folded"), on=parents + [column])
+    is_other = leaves["folded"] == OTHER
+    leaves[column] = leaves["folded"]
+    for child in HIERARCHY_LEVELS[level + 1 :]:
+        leaves.loc[is_other, child] = OTHER
+    return (
+        leaves.drop(columns="folded")
+        .groupby(HIERARCHY_LEVELS, sort=False, as_index=False)["value"]
+        .sum()
+    )
+
+
+@dataclass
+class ExpenseHierarchy:
+    """
+    A class to build the category / type / store hierarchy of the expenses of a timeframe.
+
+    Attributes:
+        df (pd.DataFrame): The ledger.
+        max_children (int): Most children of a node, the smallest ones being folded into "other".
+            Default is MAX_CHILDREN.
+
+    Methods:
+        totals(past_date, today_date):
+            Returns the leaves of the hierarchy of the expenses between two dates.
+    """
+
+    df: pd.DataFrame
+    max_children: int = MAX_CHILDREN
+    _cache: dict[tuple, AggregateResult] = field(default_factory=dict)
+
+    def _rows(self, past_date: datetime.date, today_date: datetime.date) -> pd.DataFrame:
+        dates = self.df["date"]
+        start, stop = pd.Timestamp(past_date), pd.Timestamp(today_date) + pd.Timedelta(days=1)
+        if self.df.attrs.get(SORTED_BY_DATE, False):
+            # the ledger is sorted by date: the timeframe is a slice
+            return self.df.iloc[dates.searchsorted(start) : dates.searchsorted(stop)]
+        return self.df.loc[(dates >= start) & (dates < stop)]
+
+    @profiled()
+    def totals(self, past_date: datetime.date, today_date: datetime.date) -> AggregateResult:
+        """
+        Sum of the expenses per category, expense type and store between two dates, both included.
+
+        Parameters
+        ----------
+        past_date : datetime.date
+            The start date of the timeframe (the "From" date).
+        today_date : datetime.date
+            The end date of the timeframe (the "To" date).
+
+        Returns
+        -------
+        AggregateResult
+            One row per leaf (store) of the hierarchy, with the columns "expense_category",
+            "expense_type", "store" and "value": each node has at most max_children children.
+            The leaves without a positive total are left out, as they cannot be drawn.
+        """
+        key = (past_date, today_date)
+        if key in self._cache:
+            return self._cache[key]
+
+        rows = self._rows(past_date, today_date)
+        rows = rows.loc[
+            ~rows["expense_category"].isin(NON_EXPENSE_CATEGORIES)
+            & rows["expense_category"].notna()
+        ]
+        # the one grouping of the rows: the folds below only regroup its (few) leaves
+        leaves = (
+            rows.groupby(HIERARCHY_LEVELS, sort=False, dropna=False, observed=True)["value"]
+            .sum()
+            .reset_index()
+        )
+        for column in HIERARCHY_LEVELS[1:]:
+            leaves[column] = leaves[column].astype("object").fillna(MISSING)
+        leaves["expense_category"] = leaves["expense_category"].astype("object")
+        for level in range(len(HIERARCHY_LEVELS)):
+            if leaves.empty:
+                break
+            leaves = _fold(leaves, level, self.max_children)
+
+        leaves["value"] = leaves["value"].round(2)
+        leaves = leaves.loc[np.isfinite(leaves["value"]) & (leaves["value"] > 0)]
+        result = AggregateResult(
+            frame=leaves.sort_values(by=HIERARCHY_LEVELS, ignore_index=True),
+            title="Expenses per category, type and store",
+        )
+        if len(self._cache) >= MAX_CACHED_PERIODS:
+            # forget the oldest timeframe
+            self._cache.pop(next(iter(self._cache)))
+        self._cache[key] = result
+        return result
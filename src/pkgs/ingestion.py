@@ -0,0 +1,564 @@
+"""
+This script contains the ingestion of the uploaded expenses file.
+
+The file is parsed by a background worker, chunk by chunk, so that the Streamlit script never
+blocks inside pd.read_csv/pd.read_excel: the dashboard polls the IngestionJob to show the
+progress and the partial aggregates, and can cancel it at any time.
+
+When a .csv ledger is uploaded again with only new rows appended at the end, the job recognizes
+the previously ingested file as a prefix of the new one (by hashing the bytes), parses only the
+new tail and updates the aggregates of the previous version with it. With `deduplicate`, a new upload
+is merged into the previous version instead of replacing it, without the transactions that are
+already there (see dedup.py): overlapping exports of the same account are not counted twice.
+
+Only the base columns of the ledger are read (see BASE_COLUMNS): the calendar columns (month, year,
+weekday_number, weekday_text, months_text) are derived from the date, as small integers and
+categoricals, so the files and the parsed data are smaller.
+
+Raw bank exports may come without categories: with a set of CategoryRules, the rows without an
+expense_category get one from their store, chunk by chunk, before being aggregated.
+
+The header and the first rows are checked before the full parse, and the types are coerced in bulk
+while parsing (see validation.py): the malformed values are reported with their line.
+
+The parsed ledger is sorted by date once, when the job is done, and flagged as such in its
+`attrs` (see SORTED_BY_DATE): the date ranges can then be sliced with a binary search.
+"""
+
+# --- Import packages --- #
+import copy
+import hashlib
+import io
+import threading
+import time
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass, field
+from typing import Iterator, Optional
+from .aggregates import ExpenseAggregates
+from .categorize import CategoryRules
+from .dedup import Deduplicator, FingerprintIndex
+from .global_vars import MONTHS_TEXT, WEEKDAYS_TEXT
+from .validation import (
+    SAMPLE_ROWS,
+    ValidationReport,
+    check_csv_sample,
+    check_sample,
+    coerce_chunk,
+    malformed_dates,
+)
+
+# number of rows parsed at once from a .csv file: small enough to report the progress
+# often, large enough to keep the overhead of the chunks negligible
+CHUNKSIZE = 50_000
+
+# columns of the ledger that cannot be derived from the other ones
+BASE_COLUMNS = ["date", "expense_category", "expense_type", "value", "store", "city"]
+# columns of the ledger that are read when they are in the file
+OPTIONAL_COLUMNS = ["currency"]
+# columns of the ledger derived from the date
+CALENDAR_COLUMNS = ["month", "year", "weekday_number", "weekday_text", "months_text"]
+# key of DataFrame.attrs set on a ledger sorted by date (the rows without a date last)
+SORTED_BY_DATE = "sorted_by_date"
+
+
+def _as_integer(values: pd.Series, dtype: str) -> pd.Series:
+    # unparsed dates (NaT) give missing values, that only the nullable integers can hold
+    return values.astype(dtype.capitalize() if values.isna().any() else dtype)
+
+
+def parse_dates(values: pd.Series) -> pd.Series:
+    """
+    Parses the dates of the ledger (dd/mm/yyyy), converting each distinct date only once.
+
+    A ledger has many rows per day: parsing the few distinct strings and spreading them back
+    over the rows is much faster than parsing every row.
+
+    Parameters
+    ----------
+    values : pd.Series
+        The dates, as read from the file.
+
+    Returns
+    -------
+    pd.Series
+        The dates as datetime, NaT where the date is missing or malformed.
+    """
+    codes, uniques = pd.factorize(values)
+    parsed = pd.to_datetime(
+        pd.Series(uniques, dtype="object"), dayfirst=True, errors="coerce"
+    ).to_numpy()
+    # the code -1 (missing date) takes the NaT appended at the end
+    parsed = np.append(parsed, np.datetime64("NaT", "ns"))
+    return pd.Series(parsed[codes], index=values.index, name=values.name)
+
+
+def add_calendar_columns(df: pd.DataFrame, columns: Optional[list[str]] = None) -> pd.DataFrame:
+    """
+    Derives the calendar columns from the 'date' column, vectorized, adding only those that are missing.
+
+    The numbers are stored as the smallest integers that can hold them, the names of the weekdays
+    and of the months as categoricals (one integer code per row).
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The expenses, with the 'date' column parsed as datetime.
+    columns : list[str], optional
+        The calendar columns to derive. Defaults to all the CALENDAR_COLUMNS.
+
+    Returns
+    -------
+    pd.DataFrame
+        The same dataframe, with the calendar columns added.
+    """
+    columns = CALENDAR_COLUMNS if columns is None else columns
+    missing = [column for column in columns if column not in df.columns]
+    if not missing:
+        return df
+
+    dates = df["date"].dt
+    month = dates.month
+    weekday = dates.dayofweek
+    derived = {
+        "month": lambda: _as_integer(month, "int8"),
+        "year": lambda: _as_integer(dates.year, "int16"),
+        "weekday_number": lambda: _as_integer(weekday + 1, "int8"),
+        "weekday_text": lambda: pd.Categorical.from_codes(
+            weekday.fillna(-1).astype("int8"), categories=WEEKDAYS_TEXT
+        ),
+        "months_text": lambda: pd.Categorical.from_codes(
+            (month - 1).fillna(-1).astype("int8"), categories=MONTHS_TEXT
+        ),
+    }
+    for column in missing:
+        df[column] = derived[column]()
+    return df
+
+
+def _coerce(chunk: pd.DataFrame, report: Optional[ValidationReport], compact: bool) -> pd.DataFrame:
+    # the date, read as dd/mm/yyyy and not as mm/dd/yyyy, and the value, as floats
+    raw_dates = chunk["date"]
+    chunk["date"] = parse_dates(raw_dates)
+    if report is not None:
+        report.add(
+            "date", raw_dates, malformed_dates(raw_dates, chunk["date"]), "not a date (dd/mm/yyyy)"
+        )
+    # the base columns that are not required are added, empty, if the file has none
+    optional = [column for column in BASE_COLUMNS if column not in chunk.columns]
+    chunk = coerce_chunk(chunk, report, optional if compact else [])
+    return add_calendar_columns(chunk)
+
+
+def read_expenses_chunks(
+    buffer: io.BytesIO,
+    file_extension: str,
+    chunksize: int = CHUNKSIZE,
+    compact: bool = True,
+    report: Optional[ValidationReport] = None,
+    categorized: bool = False,
+) -> Iterator[pd.DataFrame]:
+    """
+    Reads the expenses file, yielding it in chunks of rows with the calendar columns.
+
+    The header and the first rows are checked before the full parse. The malformed dates and values
+    become missing values (NaT and NaN), and are recorded in the report, if given.
+
+    Parameters
+    ----------
+    buffer : io.BytesIO
+        The content of the uploaded file.
+    file_extension : str
+        Either "csv" or "xlsx". Excel files cannot be read in chunks, they are yielded as a single chunk.
+    chunksize : int, optional
+        Number of rows of each chunk of a .csv file. Defaults to CHUNKSIZE.
+    compact : bool, optional
+        Read only the BASE_COLUMNS (and the OPTIONAL_COLUMNS in the file) and derive the calendar
+        columns from the date, even if they are in the file. Otherwise, read every column and derive only the missing calendar columns.
+        Defaults to True.
+    report : Optional[ValidationReport], optional
+        Where to record the malformed values. Defaults to None.
+    categorized : bool, optional
+        True if the file may have no expense_category and expense_type columns, as they are filled in
+        by categorization rules. Defaults to False.
+
+    Yields
+    ------
+    pd.DataFrame
+        The next chunk of the expenses.
+
+    Raises
+    ------
+    SchemaError
+        If the header or the first rows are not those of a ledger (see validation.check_sample).
+    """
+    # skip the columns that are not needed without even parsing them
+    usecols = (lambda column: column in BASE_COLUMNS + OPTIONAL_COLUMNS) if compact else None
+
+    if file_extension == "csv":
+        # fail before parsing the whole file if it is not a ledger
+        check_csv_sample(buffer, categorized)
+        with pd.read_csv(buffer, usecols=usecols, sep=";", chunksize=chunksize) as reader:
+            for chunk in reader:
+                yield _coerce(chunk, report, compact)
+    else:
+        df = pd.read_excel(buffer, usecols=usecols)
+        check_sample(df.head(SAMPLE_ROWS).astype("string"), categorized)
+        yield _coerce(df, report, compact)
+
+
+def content_digest(data: bytes) -> bytes:
+    """
+    Hash of the content of a file, used to recognize a previously ingested file.
+
+    Parameters
+    ----------
+    data : bytes
+        The content of the file (or a memoryview on a part of it).
+
+    Returns
+    -------
+    bytes
+        The BLAKE2b digest of the content.
+    """
+    return hashlib.blake2b(data, digest_size=32).digest()
+
+
+def sort_by_date(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Sorts the ledger by date, and flags it as sorted.
+
+    A ledger already flagged is returned as it is, and a ledger already in date order (the
+    common case of a ledger filled day after day) is only checked, in linear time.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The expenses, with the 'date' column parsed as datetime.
+
+    Returns
+    -------
+    pd.DataFrame
+        The expenses sorted by date, with a fresh index, and SORTED_BY_DATE set in their attrs.
+    """
+    if df.attrs.get(SORTED_BY_DATE, False):
+        return df
+    if not df["date"].is_monotonic_increasing:
+        # stable: the rows of the same day keep the order of the file
+        df = df.sort_values(by=["date"], kind="stable", ignore_index=True)
+    df.attrs[SORTED_BY_DATE] = True
+    return df
+
+
+def read_expenses(data: bytes, file_extension: str) -> pd.DataFrame:
+    """
+    Reads the whole expenses file in the calling thread.
+
+    Parameters
+    ----------
+    data : bytes
+        The content of the uploaded file.
+    file_extension : str
+        Either "csv" or "xlsx".
+
+    Returns
+    -------
+    pd.DataFrame
+        The expenses.
+    """
+    return pd.concat(
+        list(read_expenses_chunks(io.BytesIO(data), file_extension)), ignore_index=True
+    )
+
+
+@dataclass
+class IngestedFile:
+    """
+    A class to keep what is needed of an ingested file to ingest a newer version of it incrementally.
+
+    Attributes:
+        size (int): Size of the file, in bytes.
+        digest (bytes): Hash of the content of the file.
+        header (bytes): The first line of the file, with the names of the columns.
+        df (pd.DataFrame): The parsed expenses.
+        aggregates (ExpenseAggregates): The aggregates of the expenses.
+        fingerprints (Optional[FingerprintIndex]): The fingerprints of the expenses, built the first
+            time they are needed. Default is None.
+
+    Methods:
+        is_prefix_of(data):
+            Checks if a new file starts with the content of this file.
+        fingerprint_index():
+            Returns the fingerprints of the expenses.
+    """
+
+    size: int
+    digest: bytes
+    header: bytes
+    df: pd.DataFrame
+    aggregates: ExpenseAggregates
+    fingerprints: Optional[FingerprintIndex] = None
+
+    def fingerprint_index(self) -> FingerprintIndex:
+        """The fingerprints of the expenses, built once, only when a new upload is deduplicated."""
+        if self.fingerprints is None:
+            self.fingerprints = FingerprintIndex.from_dataframe(self.df)
+        return self.fingerprints
+
+    def is_prefix_of(self, data: bytes) -> bool:
+        """
+        Checks if a new file starts with the content of this file, that is, if it only has new rows appended.
+
+        The content of this file must end with a new line: otherwise, the new file may extend its
+        last row, which would be parsed again as a row of its own.
+
+        Parameters
+        ----------
+        data : bytes
+            The content of the new file.
+
+        Returns
+        -------
+        bool
+            True if the first bytes of the new file hash to the digest of this file, and end a line
+            (or are the whole new file).
+        """
+        return (
+            len(data) >= self.size
+            and (len(data) == self.size or data[self.size - 1 : self.size] == b"\n")
+            and content_digest(memoryview(data)[: self.size]) == self.digest
+        )
+
+
+@dataclass
+class IngestionJob:
+    """
+    A class to parse an uploaded file in a background thread, reporting the progress chunk by chunk.
+
+    Attributes:
+        data (bytes): The content of the uploaded file.
+        file_extension (str): Either "csv" or "xlsx".
+        chunksize (int): Number of rows of each chunk of a .csv file. Default is CHUNKSIZE.
+        base (Optional[IngestedFile]): A previously ingested version of the file. If the new file only
+            appends rows to it, just the new rows are parsed. Default is None.
+        rules (Optional[CategoryRules]): The rules filling the missing categories of the rows. Default
+            is None: the file must have the categories.
+        deduplicate (bool): Add the new rows to `base` without the transactions it already has, even
+            when the file is not `base` with rows appended. Default is False: such a file replaces `base`.
+        incremental (bool): True if only the rows appended to `base` are parsed.
+        merged (bool): True if the whole file is parsed and added to `base`, without the duplicates.
+        duplicates (int): Number of rows dropped as they were already in `base`.
+        report (ValidationReport): The malformed dates and values found while parsing the file.
+        progress (float): Share of the file parsed so far, between 0 and 1.
+        aggregates (ExpenseAggregates): The aggregates of the rows parsed so far.
+        error (Optional[Exception]): The error raised while parsing the file, if any.
+        seconds (float): Time spent parsing the file.
+
+    Methods:
+        completed(data, file_extension, df, aggregates, report):
+            Returns a job already done, with the result of a previous parsing of the file.
+        start():
+            Starts parsing the file in a background thread.
+        cancel():
+            Asks the background thread to stop after the current chunk.
+        result():
+            Returns the parsed expenses, once the job is done.
+        ingested():
+            Returns what is needed to ingest a newer version of the file incrementally.
+    """
+
+    data: bytes
+    file_extension: str
+    chunksize: int = CHUNKSIZE
+    base: Optional[IngestedFile] = None
+    rules: Optional[CategoryRules] = None
+    deduplicate: bool = False
+    incremental: bool = False
+    merged: bool = False
+    duplicates: int = 0
+    report: ValidationReport = field(default_factory=ValidationReport)
+    progress: float = 0.0
+    aggregates: ExpenseAggregates = field(default_factory=ExpenseAggregates)
+    error: Optional[Exception] = None
+    seconds: float = 0.0
+    _chunks: list[pd.DataFrame] = field(default_factory=list)
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+    _cancel: threading.Event = field(default_factory=threading.Event)
+    _done: threading.Event = field(default_factory=threading.Event)
+    _thread: Optional[threading.Thread] = None
+    _digest: bytes = b""
+    _deduplicator: Optional[Deduplicator] = None
+
+    @property
+    def done(self) -> bool:
+        """True when the file has been parsed completely, or the job failed or was cancelled."""
+        return self._done.is_set()
+
+    @property
+    def cancelled(self) -> bool:
+        """True when the job has been cancelled."""
+        return self._cancel.is_set()
+
+    @classmethod
+    def completed(
+        cls,
+        data: bytes,
+        file_extension: str,
+        df: pd.DataFrame,
+        aggregates: ExpenseAggregates,
+        report: ValidationReport,
+    ) -> "IngestionJob":
+        """
+        Returns a job already done, with the result of a previous parsing of the file.
+
+        Parameters
+        ----------
+        data : bytes
+            The content of the file.
+        file_extension : str
+            Either "csv" or "xlsx".
+        df : pd.DataFrame
+            The expenses parsed from the file.
+        aggregates : ExpenseAggregates
+            The aggregates of the expenses.
+        report : ValidationReport
+            The malformed dates and values found while parsing the file.
+
+        Returns
+        -------
+        IngestionJob
+            The job, done, without a background thread.
+        """
+        job = cls(data, file_extension, report=report, aggregates=aggregates, progress=1.0)
+        job._chunks = [df]
+        job._digest = content_digest(data)
+        job._done.set()
+        return job
+
+    def start(self) -> "IngestionJob":
+        """Starts parsing the file in a background (daemon) thread."""
+        self._thread = threading.Thread(target=self._run, name="expense-ingestion", daemon=True)
+        self._thread.start()
+        return self
+
+    def cancel(self) -> None:
+        """Asks the background thread to stop after the current chunk."""
+        self._cancel.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Waits for the job to be done. Returns True if it is done."""
+        return self._done.wait(timeout)
+
+    def _detect_incremental(self) -> None:
+        # only .csv files can be split into the previous content and the new rows
+        self.incremental = (
+            self.base is not None
+            and self.file_extension == "csv"
+            and self.base.is_prefix_of(self.data)
+        )
+        self.merged = self.base is not None and self.deduplicate and not self.incremental
+        if self.base is not None and self.deduplicate:
+            self._deduplicator = Deduplicator(self.base.fingerprint_index())
+        if self.incremental or self.merged:
+            # start from a copy of the previous aggregates: a cancelled job must not alter them
+            with self._lock:
+                self.aggregates = copy.deepcopy(self.base.aggregates)
+                self._chunks = [self.base.df]
+
+    def _run(self) -> None:
+        start = time.perf_counter()
+        self._detect_incremental()
+        if self.incremental:
+            # parse only the new rows, under the header of the file
+            buffer = io.BytesIO(self.base.header + self.data[self.base.size :])
+            # the lines of the new rows come after those of the previous version
+            self.report.line_offset = self.data.count(b"\n", 0, self.base.size) - 1
+        else:
+            buffer = io.BytesIO(self.data)
+        buffer_size = max(len(buffer.getbuffer()), 1)
+        try:
+            for chunk in read_expenses_chunks(
+                buffer,
+                self.file_extension,
+                self.chunksize,
+                report=self.report,
+                categorized=self.rules is not None,
+            ):
+                if self._cancel.is_set():
+                    break
+                if self.rules is not None:
+                    chunk = self.rules.categorize(chunk)
+                if self._deduplicator is not None:
+                    chunk = self._deduplicator.filter(chunk)
+                with self._lock:
+                    self.duplicates = (
+                        self._deduplicator.dropped if self._deduplicator is not None else 0
+                    )
+                    # an empty chunk would turn the dates of the previous rows into objects
+                    if not ((self.incremental or self.merged) and chunk.empty):
+                        self._chunks.append(chunk)
+                    self.aggregates.update(chunk)
+                    # the reader buffers the file, so the position is an approximation
+                    self.progress = min(buffer.tell() / buffer_size, 1.0)
+            else:
+                # score the rows still held by the anomalies here, and not in the first rerun
+                with self._lock:
+                    self.aggregates.anomalies.flush()
+                self.progress = 1.0
+                self._digest = content_digest(self.data)
+        except Exception as error:  # reported to the user by the dashboard
+            self.error = error
+        finally:
+            self.seconds = time.perf_counter() - start
+            self._done.set()
+
+    def partial_category_totals(self) -> pd.Series:
+        """
+        Sum of the expenses per category of the rows parsed so far.
+
+        Returns
+        -------
+        pd.Series
+            The total per category, from the highest to the lowest.
+        """
+        with self._lock:
+            return self.aggregates.category_totals()
+
+    def result(self) -> pd.DataFrame:
+        """
+        Returns the parsed expenses, sorted by date.
+
+        Returns
+        -------
+        pd.DataFrame
+            All the chunks parsed, as a single dataframe sorted by date.
+        """
+        with self._lock:
+            if not self._chunks:
+                return pd.DataFrame()
+            # concatenate and sort the chunks only once: the result is read again at every rerun
+            if len(self._chunks) > 1:
+                ledger = pd.concat(self._chunks, ignore_index=True)
+                # the new rows may come before the ones of a previous version of the ledger
+                ledger.attrs.pop(SORTED_BY_DATE, None)
+                self._chunks = [ledger]
+            self._chunks[0] = sort_by_date(self._chunks[0])
+            return self._chunks[0]
+
+    def ingested(self) -> IngestedFile:
+        """
+        Returns what is needed to ingest a newer version of the file incrementally.
+
+        Returns
+        -------
+        IngestedFile
+            The size, hash, header, parsed expenses and aggregates of the file.
+        """
+        return IngestedFile(
+            size=len(self.data),
+            digest=self._digest,
+            header=self.data.split(b"\n", 1)[0] + b"\n",
+            df=self.result(),
+            aggregates=self.aggregates,
+            fingerprints=self._deduplicator.index() if self._deduplicator is not None else None,
+        )
@@ -0,0 +1,358 @@
+"""
+This script contains the ledgers shared by the sessions of a deployment.
+
+All the sessions of the dashboard run in the same process: when several people of a team open the
+same ledger (the same file, parsed with the same categorization rules), the file is parsed once
+and its expenses and aggregates are shared, instead of being parsed again by every session. A
+session joining a ledger still being parsed waits for the same background job.
+
+A ledger is identified by its version, a hash of its content and of what changes its parsing, and
+belongs to a tenant (a user, or a team workspace): a session only finds the ledgers of its own
+tenant, and only by uploading the same content, so no ledger is shown to someone who does not
+have the file. The workspaces are typed by the users, so they are only enabled by the
+EXPENSE_TRACKER_WORKSPACES environment variable: otherwise, each session without a login is a
+tenant of its own. Each tenant has a memory quota, and the whole cache a memory budget: beyond them,
+the parsed ledgers used least recently are evicted first, while the ledgers still being parsed
+are kept until their parsing ends or is cancelled. An evicted ledger is still shown by the
+sessions already showing it, and is parsed again by the next session opening it.
+"""
+
+# --- Import packages --- #
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional
+from .ingestion import IngestionJob
+
+# the environment variable enabling the workspaces, shared by the sessions without a login
+WORKSPACES_VARIABLE = "EXPENSE_TRACKER_WORKSPACES"
+# workspace of the sessions without a login, when the workspaces are enabled
+DEFAULT_TENANT = "default"
+# memory of the ledgers of a tenant, and of all the ledgers of the process
+TENANT_QUOTA_BYTES = 512 * 2**20
+MAX_CACHE_BYTES = 2 * 2**30
+# rows whose memory is measured to estimate that of the whole ledger
+SIZE_SAMPLE_ROWS = 10_000
+
+
+def ledger_version(
+    data: bytes, file_extension: str, rules_version: str = "", base_version: str = ""
+) -> str:
+    """
+    Version of a ledger: the hash of its content and of what changes its parsing.
+
+    Parameters
+    ----------
+    data : bytes
+        The content of the uploaded file.
+    file_extension : str
+        Either "csv" or "xlsx".
+    rules_version : str, optional
+        Hash of the categorization rules the file is parsed with. Defaults to "" (no rules).
+    base_version : str, optional
+        Version of the ledger the file is merged into, without the duplicates. Defaults to ""
+        (the file is not merged).
+
+    Returns
+    -------
+    str
+        The hexadecimal BLAKE2b digest of the ledger.
+    """
+    digest = hashlib.blake2b(digest_size=32)
+    for part in (file_extension.encode(), rules_version.encode(), base_version.encode()):
+        digest.update(part + b"\0")
+    digest.update(data)
+    return digest.hexdigest()
+
+
+def ledger_bytes(job: IngestionJob) -> int:
+    """
+    Memory held by a ledger: the content of its file and, once parsed, its expenses.
+
+    The memory of the expenses is measured on a sample of SIZE_SAMPLE_ROWS rows, as measuring the
+    text columns of a large ledger row by row takes a while. The aggregates, much smaller than
+    the expenses, are not counted.
+
+    Parameters
+    ----------
+    job : IngestionJob
+        The job parsing the ledger.
+
+    Returns
+    -------
+    int
+        The estimated size of the ledger, in bytes.
+    """
+    size = len(job.data)
+    if not job.done or job.cancelled or job.error is not None:
+        return size
+    df = job.result()
+    if len(df) <= SIZE_SAMPLE_ROWS:
+        return size + int(df.memory_usage(deep=True).sum())
+    sample = df.sample(SIZE_SAMPLE_ROWS, random_state=0)
+    return size + int(sample.memory_usage(deep=True).sum() * len(df) / SIZE_SAMPLE_ROWS)
+
+
+@dataclass
+class LedgerEntry:
+    """
+    A ledger of the cache.
+
+    Attributes:
+        tenant (str): The user, or the workspace, owning the ledger.
+        name (str): Name of the ledger, the name of the file first uploaded.
+        version (str): Version of the ledger, see ledger_version.
+        job (IngestionJob): The job parsing the ledger, shared by the sessions showing it.
+        nbytes (int): Estimated memory of the ledger, measured again once it is parsed.
+        holders (set[str]): The sessions waiting for the ledger to be parsed.
+    """
+
+    tenant: str
+    name: str
+    version: str
+    job: IngestionJob
+    nbytes: int = 0
+    holders: set[str] = field(default_factory=set)
+    _measured: bool = False
+
+
+@dataclass
+class LedgerCache:
+    """
+    A class to share the parsed ledgers between the sessions, within memory quotas.
+
+    Attributes:
+        tenant_quota (int): Most memory of the ledgers of a tenant, in bytes. Default is
+            TENANT_QUOTA_BYTES.
+        max_bytes (int): Most memory of all the ledgers, in bytes. Default is MAX_CACHE_BYTES.
+
+    Methods:
+        get(tenant, version, holder):
+            Returns a ledger of the tenant, if it is in the cache.
+        put(tenant, name, version, job, holder):
+            Adds a ledger to the cache, evicting the ledgers used least recently.
+        release(tenant, version, holder):
+            Stops waiting for a ledger, cancelling its parsing if no other session waits for it.
+        latest(tenant, versions, holder):
+            Returns the ledger opened last by a session among those still in the cache.
+        ledgers(tenant):
+            Returns the ledgers of a tenant, from the one used most recently.
+        usage(tenant):
+            Returns the memory of the ledgers of a tenant, or of all the ledgers.
+    """
+
+    tenant_quota: int = TENANT_QUOTA_BYTES
+    max_bytes: int = MAX_CACHE_BYTES
+    _entries: OrderedDict[tuple[str, str], LedgerEntry] = field(default_factory=OrderedDict)
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def _measure(self) -> None:
+        # the ledgers parsed since the last measure: their size is estimated outside of the lock,
+        # not to hold the other sessions
+        with self._lock:
+            parsed = [
+                entry for entry in self._entries.values() if entry.job.done and not entry._measured
+            ]
+        if not parsed:
+            return
+        sizes = [ledger_bytes(entry.job) for entry in parsed]
+        with self._lock:
+            for entry, nbytes in zip(parsed, sizes):
+                entry.nbytes, entry._measured = nbytes, True
+            self._evict()
+
+    def _evict(self) -> None:
+        # the failed and cancelled ledgers first, then the least recently used ones of each
+        # tenant over its quota, then the least recently used ones over the whole budget. The
+        # ledgers still being parsed are counted, but not evicted: their sessions wait for them,
+        # and their parsing would go on outside of the quotas
+        for key, entry in list(self._entries.items()):
+            if entry.job.done and (entry.job.cancelled or entry.job.error is not None):
+                del self._entries[key]
+        for tenant in {entry.tenant for entry in self._entries.values()}:
+            tenant_keys = [key for key in self._entries if key[0] == tenant]
+            used = sum(self._entries[key].nbytes for key in tenant_keys)
+            used = self._evict_keys(tenant_keys, used, self.tenant_quota)
+        used = sum(entry.nbytes for entry in self._entries.values())
+        self._evict_keys(list(self._entries), used, self.max_bytes)
+
+    def _evict_keys(self, keys: list[tuple[str, str]], used: int, limit: int) -> int:
+        # the parsed ledgers among the keys, from the least recently used, until under the limit
+        for key in keys:
+            if used <= limit:
+                break
+            if self._entries[key].job.done:
+                used -= self._entries.pop(key).nbytes
+        return used
+
+    def get(self, tenant: str, version: str, holder: str = "") -> Optional[LedgerEntry]:
+        """
+        Returns a ledger of the tenant, if it is in the cache, as the one used most recently.
+
+        Parameters
+        ----------
+        tenant : str
+            The user, or the workspace, of the session.
+        version : str
+            Version of the ledger, see ledger_version.
+        holder : str, optional
+            Id of the session, waiting for the ledger if it is still being parsed. Defaults to "".
+
+        Returns
+        -------
+        Optional[LedgerEntry]
+            The ledger, or None if it is not in the cache (or its parsing failed).
+        """
+        self._measure()
+        with self._lock:
+            entry = self._entries.get((tenant, version))
+            if entry is None or entry.job.cancelled or entry.job.error is not None:
+                return None
+            self._entries.move_to_end((tenant, version))
+            if holder and not entry.job.done:
+                entry.holders.add(holder)
+            return entry
+
+    def put(
+        self, tenant: str, name: str, version: str, job: IngestionJob, holder: str = ""
+    ) -> LedgerEntry:
+        """
+        Adds a ledger to the cache, evicting the ledgers used least recently beyond the quotas.
+
+        Parameters
+        ----------
+        tenant : str
+            The user, or the workspace, of the session.
+        name : str
+            Name of the ledger.
+        version : str
+            Version of the ledger, see ledger_version.
+        job : IngestionJob
+            The (started) job parsing the ledger.
+        holder : str, optional
+            Id of the session waiting for the ledger. Defaults to "".
+
+        Returns
+        -------
+        LedgerEntry
+            The ledger added. A ledger larger than the quota of its tenant is not kept in the
+            cache once parsed, but it is still returned to the session.
+        """
+        entry = LedgerEntry(tenant, name, version, job, nbytes=ledger_bytes(job))
+        if holder:
+            entry.holders.add(holder)
+        with self._lock:
+            self._entries[(tenant, version)] = entry
+            self._entries.move_to_end((tenant, version))
+            self._evict()
+        return entry
+
+    def release(self, tenant: str, version: str, holder: str) -> bool:
+        """
+        Stops waiting for a ledger: its parsing is cancelled if no other session waits for it.
+
+        Parameters
+        ----------
+        tenant : str
+            The user, or the workspace, of the session.
+        version : str
+            Version of the ledger, see ledger_version.
+        holder : str
+            Id of the session.
+
+        Returns
+        -------
+        bool
+            True if the parsing of the ledger has been cancelled.
+        """
+        with self._lock:
+            entry = self._entries.get((tenant, version))
+            if entry is None:
+                return False
+            entry.holders.discard(holder)
+            if entry.holders or entry.job.done:
+                return False
+            entry.job.cancel()
+            del self._entries[(tenant, version)]
+            return True
+
+    def latest(
+        self, tenant: str, versions: dict[str, str], holder: str = ""
+    ) -> Optional[tuple[str, LedgerEntry]]:
+        """
+        Returns the ledger opened last by a session among those still in the cache.
+
+        The ledgers no longer in the cache (evicted, failed or cancelled) are removed from the
+        ledgers of the session.
+
+        Parameters
+        ----------
+        tenant : str
+            The user, or the workspace, of the session.
+        versions : dict[str, str]
+            The versions of the ledgers opened by the session, by name, in the order opened.
+        holder : str, optional
+            Id of the session, waiting for the ledger if it is still being parsed. Defaults to "".
+
+        Returns
+        -------
+        Optional[tuple[str, LedgerEntry]]
+            The name and the ledger, or None if none of the ledgers is still in the cache.
+        """
+        for name in reversed(list(versions)):
+            entry = self.get(tenant, versions[name], holder=holder)
+            if entry is not None:
+                return name, entry
+            del versions[name]
+        return None
+
+    def ledgers(self, tenant: str) -> list[LedgerEntry]:
+        """The ledgers of the tenant, from the one used most recently."""
+        self._measure()
+        with self._lock:
+            return [entry for key, entry in reversed(self._entries.items()) if key[0] == tenant]
+
+    def usage(self, tenant: Optional[str] = None) -> int:
+        """The memory of the ledgers of the tenant, or of all the ledgers if None, in bytes."""
+        self._measure()
+        with self._lock:
+            return sum(
+                entry.nbytes
+                for entry in self._entries.values()
+                if tenant is None or entry.tenant == tenant
+            )
+
+
+def workspaces_enabled() -> bool:
+    """
+    Returns whether the sessions without a login can share a workspace.
+
+    Returns
+    -------
+    bool
+        True if the EXPENSE_TRACKER_WORKSPACES variable is set to "1", "true" or "yes".
+    """
+    return os.environ.get(WORKSPACES_VARIABLE, "").strip().lower() in ("1", "true", "yes")
+
+
+# the cache of the process, shared by all the sessions
+_shared: Optional[LedgerCache] = None
+_shared_lock = threading.Lock()
+
+
+def shared_ledger_cache() -> LedgerCache:
+    """
+    Returns the ledger cache of the process, shared by all the sessions of the deployment.
+
+    Returns
+    -------
+    LedgerCache
+        The cache, created with the default quotas the first time it is needed.
+    """
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = LedgerCache()
+        return _shared
@@ -5,10 +5,17 @@ from functional programming style to OOP.
 
 # --- Import packages --- #
 import datetime
+import numpy as np
 import pandas as pd
-import streamlit as st
 from dataclasses import dataclass, field
 from typing import Optional
+from .global_vars import NON_EXPENSE_CATEGORIES
+from .ingestion import SORTED_BY_DATE
+from .profiling import profiled
+from .results_dataclasses import AggregateResult, MetricResult
+from .aggregates import ExpenseAggregates
+from .anomalies import SpendingAnomalies
+from .backends import QueryBackend
 
 
 @dataclass
@@ -24,10 +31,18 @@ class ExpenseMetric:
         delta_color (str): Color indicator for the delta value, usually for visualization purposes. Default is 'inverse'.
         help_text (str): Additional text to describe the metric. Default is 'vs. previous 30 days'.
         label_text (str): Label for the metric, used for display purposes. Default is 'Expenses in the timeframe'.
+        backend (Optional[QueryBackend]): Query backend (SQL or Polars) computing the totals instead of
+            filtering the DataFrame. Default is None (the totals are computed with pandas).
+        aggregates (Optional[ExpenseAggregates]): Per-day and per-category sums of the ledger, built at
+            ingestion. When given (and there is no backend), the totals are looked up in them instead of
+            filtering the DataFrame. Default is None.
 
     Methods:
         calculate_delta():
             Calculates and updates the delta attribute based on the expense data in the DataFrame.
+
+    The compute_* methods do not draw anything: they return a MetricResult that is
+    displayed by the rendering layer (render.display_metric).
     """
 
     df: pd.DataFrame
@@ -37,7 +52,10 @@ class ExpenseMetric:
     delta_color: str = "inverse"  # optional paramater
     help_text: str = "vs. previous 30 days"  # optional paramater
     label_text: str = "Expenses in the timeframe"
+    backend: Optional[QueryBackend] = None
+    aggregates: Optional[ExpenseAggregates] = None
 
+    @profiled()
     def filter_data(self, df: pd.DataFrame, past_date: str, today_date: str) -> pd.DataFrame:
         """
         Filters the DataFrame to include only the rows within the specified date range.
@@ -56,10 +74,43 @@ class ExpenseMetric:
         pd.DataFrame
             A DataFrame containing only the rows where the 'date' is between `past_date` and `today_date`, inclusive.
         """
+        if self.df.attrs.get(SORTED_BY_DATE, False):
+            # the ledger is sorted by date: find the first and last rows with a binary search
+            dates = self.df["date"]
+            start = dates.searchsorted(pd.Timestamp(past_date), side="left")
+            stop = dates.searchsorted(pd.Timestamp(today_date) + pd.Timedelta(days=1), side="left")
+            return self.df.iloc[start:stop].reset_index(drop=True)
+
         return self.df.loc[
             (self.df["date"].dt.date >= past_date) & (self.df["date"].dt.date <= today_date)
         ].reset_index(drop=True)
 
+    def window_mask(self, past_date: str, today_date: str) -> np.ndarray:
+        """
+        Marks the rows of the DataFrame within the specified date range, as filter_data keeps them.
+
+        Parameters
+        ----------
+        past_date : str
+            The start date for the filter in 'YYYY-MM-DD' format.
+        today_date : str
+            The end date for the filter in 'YYYY-MM-DD' format.
+
+        Returns
+        -------
+        np.ndarray
+            One boolean per row of the DataFrame, True where the 'date' is between `past_date` and `today_date`, inclusive.
+        """
+        dates = self.df["date"]
+        start, stop = pd.Timestamp(past_date), pd.Timestamp(today_date) + pd.Timedelta(days=1)
+        if not self.df.attrs.get(SORTED_BY_DATE, False):
+            return ((dates >= start) & (dates < stop)).to_numpy()
+
+        mask = np.zeros(len(dates), dtype=bool)
+        mask[dates.searchsorted(start, side="left") : dates.searchsorted(stop, side="left")] = True
+        return mask
+
+    @profiled()
     def calculate_total_expenses(self, df: pd.DataFrame) -> float:
         """
         Calculates the total expenses from the filtered DataFrame, excluding specified categories.
@@ -75,13 +126,14 @@ class ExpenseMetric:
             The total expenses rounded to two decimal places, excluding 'income', 'investment', and 'savings' categories.
         """
         return round(
-            df.loc[~df["expense_category"].isin(["income", "investment", "savings"])][
-                "value"
-            ].sum(),
+            df.loc[~df["expense_category"].isin(NON_EXPENSE_CATEGORIES)]["value"].sum(),
             2,
         )
 
-    def calculate_total_expenses_per_category(self, df: pd.DataFrame, category: str) -> float:
+    @profiled()
+    def calculate_total_expenses_per_category(
+        self, df: pd.DataFrame, category: str
+    ) -> Optional[float]:
         """
         Calculates the total expenses for a specific category from the filtered DataFrame.
 
@@ -94,18 +146,17 @@ class ExpenseMetric:
 
         Returns
         -------
-        float
-            The total expenses for the specified category, rounded to two decimal places.
+        Optional[float]
+            The total expenses for the specified category, rounded to two decimal places,
+            None if the category has no expenses in the DataFrame.
         """
-        try:
-            return round(
-                df[df["expense_category"] == category].groupby(["expense_category"])["value"].sum(),
-                2,
-            ).iloc[0]
-
-        except IndexError:
-            pass
+        # the values are floats, coerced at ingestion: the sum cannot fail
+        values = df.loc[df["expense_category"] == category, "value"]
+        if values.empty:
+            return None
+        return round(values.sum(), 2)
 
+    @profiled()
     def calculate_total_income(self, df: pd.DataFrame) -> float:
         """
         Calculates the total income from the filtered DataFrame.
@@ -120,11 +171,9 @@ class ExpenseMetric:
         float
             The total income calculated from the DataFrame.
         """
-        try:
-            return df.loc[df["expense_category"] == "income"]["value"].sum()
-        except TypeError:
-            pass
+        return df.loc[df["expense_category"] == "income", "value"].sum()
 
+    @profiled()
     def calculate_diff_expenses(self, current_total: float, previous_total: float) -> float:
         """
         Calculates the difference between current and previous total expenses.
@@ -146,9 +195,10 @@ class ExpenseMetric:
         except TypeError:
             pass
 
-    def display_metric(self, label: str, current_total: float, diff_total: float) -> None:
+    @profiled()
+    def metric_result(self, label: str, current_total: float, diff_total: float) -> MetricResult:
         """
-        Displays a metric using Streamlit, showing the current total and the difference from a previous total.
+        Builds the metric showing the current total and the difference from a previous total.
 
         Parameters
         ----------
@@ -161,25 +211,106 @@ class ExpenseMetric:
 
         Returns
         -------
-        None
-            This method does not return any value. It displays the metric using Streamlit.
+        MetricResult
+            The metric to be displayed by the rendering layer.
         """
         label_value = label if self.label_text is not None else self.label_text
         delta_value = diff_total if self.delta is None else self.delta
-        return st.metric(
+        return MetricResult(
             label=label_value,
             value=current_total,
             delta=delta_value,
             delta_color=self.delta_color,
-            help=self.help_text,
+            help_text=self.help_text,
         )
 
-    def compute_metrics(self):
+    @profiled()
+    def total_expenses_between(self, past_date: str, today_date: str) -> float:
+        """
+        Calculates the total expenses between two dates, both included, with the query backend or the aggregates, if given.
+
+        Parameters
+        ----------
+        past_date : str
+            The start date in 'YYYY-MM-DD' format.
+        today_date : str
+            The end date in 'YYYY-MM-DD' format.
+
+        Returns
+        -------
+        float
+            The total expenses rounded to two decimal places.
+        """
+        if self.backend is not None:
+            return round(self.backend.total_expenses(past_date, today_date), 2)
+        if self.aggregates is not None:
+            totals = self.aggregates.window_totals(past_date, today_date)
+            return round(totals[~totals.index.isin(NON_EXPENSE_CATEGORIES)].sum(), 2)
+        return self.calculate_total_expenses(self.filter_data(self.df, past_date, today_date))
+
+    @profiled()
+    def total_expenses_per_category_between(
+        self, past_date: str, today_date: str, category: str
+    ) -> Optional[float]:
+        """
+        Calculates the total expenses of a category between two dates, both included, with the query backend or the aggregates, if given.
+
+        Parameters
+        ----------
+        past_date : str
+            The start date in 'YYYY-MM-DD' format.
+        today_date : str
+            The end date in 'YYYY-MM-DD' format.
+        category : str
+            The expense category for which to calculate the total expenses.
+
+        Returns
+        -------
+        Optional[float]
+            The total expenses rounded to two decimal places, None if the category has no data.
+        """
+        if self.backend is not None:
+            total = self.backend.total_expenses_per_category(past_date, today_date, category)
+            return None if total is None else round(total, 2)
+        if self.aggregates is not None:
+            # as for the dataframe: None, and not 0, for a category without rows in the window
+            if not self.aggregates.window_has_data(past_date, today_date, category):
+                return None
+            return round(self.aggregates.window_totals(past_date, today_date)[category], 2)
+        return self.calculate_total_expenses_per_category(
+            self.filter_data(self.df, past_date, today_date), category
+        )
+
+    @profiled()
+    def total_income_between(self, past_date: str, today_date: str) -> float:
+        """
+        Calculates the total income between two dates, both included, with the query backend or the aggregates, if given.
+
+        Parameters
+        ----------
+        past_date : str
+            The start date in 'YYYY-MM-DD' format.
+        today_date : str
+            The end date in 'YYYY-MM-DD' format.
+
+        Returns
+        -------
+        float
+            The total income.
+        """
+        if self.backend is not None:
+            return self.backend.total_income(past_date, today_date)
+        if self.aggregates is not None:
+            return self.aggregates.window_totals(past_date, today_date).get("income", 0.0)
+        return self.calculate_total_income(self.filter_data(self.df, past_date, today_date))
+
+    @profiled()
+    def compute_metrics(self) -> MetricResult:
         """
-        Computes and displays expense metrics for the current timeframe compared to the previous 30 days.
+        Computes expense metrics for the current timeframe compared to the previous 30 days.
 
         This method filters the expense data for the current and previous timeframes,
-        calculates total expenses for each period, computes the difference, and displays the metric.
+        calculates total expenses for each period and computes the difference.
 
         Parameters
         ----------
@@ -187,38 +318,38 @@ class ExpenseMetric:
 
         Returns
         -------
-        None
-            This method does not return any value. It computes and displays the metrics using Streamlit.
+        MetricResult
+            The total expenses in the timeframe and the difference with the previous 30 days.
         """
-        # Filter the data based on the current timeframe selection
-        df_current_filtered = self.filter_data(self.df, self.past_date, self.today_date)
-        current_total_expenses = self.calculate_total_expenses(df_current_filtered)
+        # total expenses in the current timeframe selection
+        current_total_expenses = self.total_expenses_between(self.past_date, self.today_date)
 
         # calculate previous 30 days data
         # from the past date (start date), go back another month
         previous_30_days = self.past_date - datetime.timedelta(days=30)
-        df_previous_filtered = self.filter_data(self.df, previous_30_days, self.past_date)
-        total_expenses_previous_30_days = self.calculate_total_expenses(df_previous_filtered)
+        total_expenses_previous_30_days = self.total_expenses_between(
+            previous_30_days, self.past_date
+        )
 
         # calculate the difference
         diff_total_expenses = self.calculate_diff_expenses(
             current_total_expenses, total_expenses_previous_30_days
         )
 
-        # display the metric
-        self.display_metric(
+        return self.metric_result(
             current_total=current_total_expenses,
             diff_total=diff_total_expenses,
             label=self.label_text,
         )
 
-    def compute_total_income(self):
+    @profiled()
+    def compute_total_income(self) -> MetricResult:
         """
-        Computes and displays the available income by calculating the difference between total income and total expenses
+        Computes the available income by calculating the difference between total income and total expenses
         for the current timeframe.
 
         This method filters the expense data for the current timeframe, calculates the total income and total expenses,
-        computes the difference between them, and displays the result as "Available income".
+        and computes the difference between them, labelled as "Available income".
 
         Parameters
         ----------
@@ -226,26 +357,25 @@ class ExpenseMetric:
 
         Returns
         -------
-        None
-            This method does not return any value. It computes and displays the available income using Streamlit.
+        MetricResult
+            The available income in the timeframe.
         """
-        # Filter the data based on the current timeframe selection
-        df_current_filtered = self.filter_data(self.df, self.past_date, self.today_date)
-        current_total_income = self.calculate_total_income(df_current_filtered)
+        # total income in the current timeframe selection
+        current_total_income = self.total_income_between(self.past_date, self.today_date)
 
         # compute totale expenses
-        current_total_expenses = self.calculate_total_expenses(df_current_filtered)
+        current_total_expenses = self.total_expenses_between(self.past_date, self.today_date)
 
         # calculate the difference
         diff_total_income = round(current_total_income - current_total_expenses, 2)
 
-        # display the metric
-        self.display_metric(
+        return self.metric_result(
             label="Available income",
             current_total=diff_total_income,
             diff_total=None,
         )
 
+    @profiled()
     def total_expenses_timeframe(self, df: pd.DataFrame, year: str, month: str) -> float:
         """
         Function to calculate the total amount spent in a specific timeframe.
@@ -268,16 +398,25 @@ class ExpenseMetric:
         None
             Return the metrics computed for the metric to be displayed.
         """
+        if self.backend is not None:
+            return round(self.backend.total_expenses_month(year, month), 2)
+        if self.aggregates is not None:
+            if (year, month) not in self.aggregates.monthly.index:
+                return 0.0
+            totals = self.aggregates.monthly.loc[(year, month)]
+            return round(totals[~totals.index.isin(NON_EXPENSE_CATEGORIES)].sum(), 2)
+
         df_expenses_filtered = df.loc[(df["year"] == year) & (df["month"] == month)]
         df_expenses_filtered = df_expenses_filtered.loc[
-            ~df_expenses_filtered["expense_category"].isin(["income", "investment", "savings"])
+            ~df_expenses_filtered["expense_category"].isin(NON_EXPENSE_CATEGORIES)
         ]
 
         # calculate total amount spent in the current timeframe selected
         current_total_expenses = round(df_expenses_filtered["value"].sum(), 2)
         return current_total_expenses
 
-    def compute_metrics_by_category(self, category: str) -> None:
+    @profiled()
+    def compute_metrics_by_category(self, category: str) -> MetricResult:
         """
         --- Overall Overview function ---
         Function to calculate all the category metric in the Overall Overview.
@@ -295,22 +434,19 @@ class ExpenseMetric:
 
         Returns
         -------
-        None
-            Return the metrics computed for each element.
+        MetricResult
+            The total expenses of the category and the difference with the previous 30 days.
         """
-        # filter the dataframe
-        df_expenses_filtered = self.filter_data(self.df, self.past_date, self.today_date)
         # calculate total amount ONLY for the category selected (for the selected timeframe)
-        total_expenses_category = self.calculate_total_expenses_per_category(
-            df_expenses_filtered, category
+        total_expenses_category = self.total_expenses_per_category_between(
+            self.past_date, self.today_date, category
         )
 
         previous_30_days = self.past_date - datetime.timedelta(days=30)
-        df_previous_filtered = self.filter_data(self.df, previous_30_days, self.past_date)
 
         try:
-            total_expenses_previous_30_days_category = self.calculate_total_expenses_per_category(
-                df_previous_filtered, category
+            total_expenses_previous_30_days_category = self.total_expenses_per_category_between(
+                previous_30_days, self.past_date, category
             )
         except IndexError:
             total_expenses_previous_30_days_category = 0
@@ -320,39 +456,197 @@ class ExpenseMetric:
             total_expenses_category, total_expenses_previous_30_days_category
         )
 
-        # display the metric
-        self.display_metric(
+        return self.metric_result(
             current_total=total_expenses_category,
             diff_total=diff_total_expenses,
             # delta_color=self.delta_color,
             label=f"Expenses for {category}",
         )
 
-        return
-
+    @profiled()
     def metric_total_expenses_timeframe_class(
-        self, total_amount_spent: callable, delta: float, side: str
-    ) -> None:
+        self, total_amount_spent: float, delta: float
+    ) -> MetricResult:
         """
-        Function to display the metric based on the total amount spent in a specific timeframe.
+        Function to build the metric based on the total amount spent in a specific timeframe.
 
         Parameters
         ----------
-        total_amount_spent : Callable
-            Call the function "total_expenses_timeframe" to calculate the amount spent in a specific timeframe
+        total_amount_spent : float
+            The amount spent in a specific timeframe, as returned by "total_expenses_timeframe"
         delta : float
             Delta value corresponding to the difference with the adjacent metric.
-        side : DeltaGenerator
-            The place where the metric should be inserted (for instance, left, center, right)
 
         Returns
         -------
-        None
-            Return the metrics computed for the metric to be displayed.
+        MetricResult
+            The metric to be displayed by the rendering layer.
         """
-        return side.metric(
+        return MetricResult(
             value=total_amount_spent,
             delta=delta,
             label="Total amount spent",
             delta_color="inverse",
         )
+
+    @profiled()
+    def metric_budget_by_category(
+        self, budget_report: AggregateResult, category: str
+    ) -> Optional[MetricResult]:
+        """
+        Function to build the metric with the budget left for a category in a month.
+
+        Parameters
+        ----------
+        budget_report : AggregateResult
+            The budget-vs-actual of the month, as returned by BudgetTargets.report.
+        category : str
+            Category selected by the user.
+
+        Returns
+        -------
+        Optional[MetricResult]
+            The budget left, with the margin projected to the end of the month as the delta
+            (negative when the budget is projected to be overspent). None if the category has no budget.
+        """
+        report = budget_report.frame.set_index("expense_category")
+        if category not in report.index:
+            return None
+
+        row = report.loc[category]
+        # the burn rate is missing for a budget of 0
+        spent = f"{row['burn_rate']:.0%}" if pd.notna(row["burn_rate"]) else "all"
+        return MetricResult(
+            label=f"Budget left for {category}",
+            value=round(row["budget"] - row["actual"], 2),
+            delta=round(row["budget"] - row["projected"], 2),
+            delta_color="normal",
+            help_text=f"{budget_report.title}: {spent} of the budget spent. "
+            "The delta is the margin projected at the end of the month.",
+        )
+
+    @profiled()
+    def metric_month_end_forecast(self, forecast_report: AggregateResult) -> MetricResult:
+        """
+        Function to build the metric with the expenses projected at the end of a month.
+
+        Parameters
+        ----------
+        forecast_report : AggregateResult
+            The forecast of the month, as returned by SpendForecast.report.
+
+        Returns
+        -------
+        MetricResult
+            The expenses projected at the end of the month, with the expenses still to come
+            as the delta, and the expenses expected next month in the help text.
+        """
+        report = forecast_report.frame
+        month_end = round(float(report["month_end"].sum()), 2)
+        actual = round(float(report["actual"].sum()), 2)
+        return MetricResult(
+            label="Projected month-end expenses",
+            value=month_end,
+            delta=round(month_end - actual, 2),
+            delta_color="off",
+            help_text=f"{forecast_report.title}: {actual} spent so far, the delta is still to come. "
+            f"Expected next month: {round(float(report['next_month'].sum()), 2)}.",
+        )
+
+    @profiled()
+    def compute_recurring_split(self, recurring_rows: np.ndarray) -> list[MetricResult]:
+        """
+        --- Overall Overview function ---
+        Function to split the expenses of the timeframe into recurring and one-off expenses.
+
+        Parameters
+        ----------
+        recurring_rows : np.ndarray
+            One boolean per row of the DataFrame, True for the charges of a recurring series,
+            as found by RecurringDetector.detect.
+
+        Returns
+        -------
+        list[MetricResult]
+            The recurring expenses and the one-off expenses of the timeframe.
+        """
+        expenses = (
+            self.window_mask(self.past_date, self.today_date)
+            & ~self.df["expense_category"].isin(NON_EXPENSE_CATEGORIES).to_numpy()
+        )
+        values = self.df["value"].to_numpy()
+
+        recurring_total = round(float(np.nansum(values[expenses & recurring_rows])), 2)
+        one_off_total = round(float(np.nansum(values[expenses & ~recurring_rows])), 2)
+        total = recurring_total + one_off_total
+        share = recurring_total / total if total else 0.0
+
+        return [
+            MetricResult(
+                label="Recurring expenses",
+                value=recurring_total,
+                help_text=f"Rent, subscriptions, utilities...: {share:.0%} of the expenses in the timeframe.",
+            ),
+            MetricResult(
+                label="One-off expenses",
+                value=one_off_total,
+                help_text=f"{1 - share:.0%} of the expenses in the timeframe.",
+            ),
+        ]
+
+    @profiled()
+    def compute_anomalies(self, anomalies: SpendingAnomalies) -> list[MetricResult]:
+        """
+        --- Overall Overview function ---
+        Function to count the unusual spending days and transactions of the timeframe.
+
+        Parameters
+        ----------
+        anomalies : SpendingAnomalies
+            The unusual days and transactions of the ledger, kept up to date by the aggregates.
+
+        Returns
+        -------
+        list[MetricResult]
+            The number of unusual days and of unusual transactions in the timeframe.
+        """
+        days = anomalies.days_between(self.past_date, self.today_date)
+        transactions = anomalies.transactions_between(self.past_date, self.today_date)
+        threshold = f"{anomalies.threshold:g} standard deviations"
+
+        return [
+            MetricResult(
+                label="Unusual days",
+                value=len(days),
+                help_text=f"Days spending more than {threshold} above the moving average of the days.",
+            ),
+            MetricResult(
+                label="Unusual transactions",
+                value=len(transactions),
+                help_text=f"Expenses more than {threshold} above the usual ones of their category and store.",
+            ),
+        ]
+
+    @profiled()
+    def compute_search_metrics(self) -> list[MetricResult]:
+        """
+        --- Overall Overview function ---
+        Function to total the transactions matching a search: the DataFrame of the class holds
+        only the matching rows, as found by SearchIndex.search.
+
+        Returns
+        -------
+        list[MetricResult]
+            The expenses of the timeframe matching the search, compared to the previous 30 days,
+            and the expenses matching the search over the whole ledger.
+        """
+        matching_total = self.calculate_total_expenses(self.df)
+
+        return [
+            self.compute_metrics(),
+            MetricResult(
+                label="All the expenses matching the search",
+                value=matching_total,
+                help_text=f"{len(self.df)} transactions match the search, in any timeframe.",
+            ),
+        ]
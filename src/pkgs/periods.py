@@ -0,0 +1,117 @@
+"""
+This script contains the period catalog of the ledger: the years and months with data, and the
+rows of the (date-sorted) ledger belonging to each of them.
+
+The catalog is built once per upload, so the year and month selectors of the dashboard are filled
+without scanning the ledger, and the rows of a period are a slice instead of a boolean filter.
+"""
+
+# --- Import packages --- #
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass, field
+from typing import Optional
+from .profiling import profiled
+
+
+@dataclass
+class PeriodCatalog:
+    """
+    A class to hold the years and months with data in the ledger.
+
+    Attributes:
+        years (list[int]): The years with data, from the oldest to the most recent.
+        months (dict[int, list[int]]): The months with data (1-12) of each year, in calendar order.
+        ranges (dict[tuple[int, int], tuple[int, int]]): The (start, stop) positions of the rows of
+            each (year, month) in the ledger, which must be sorted by date.
+
+    Methods:
+        from_dataframe(df):
+            Builds the catalog of a ledger sorted by date.
+        months_of(year):
+            Returns the months with data of a year.
+        rows(df, year, month):
+            Returns the rows of the ledger in a year, or in a month of a year.
+    """
+
+    years: list[int] = field(default_factory=list)
+    months: dict[int, list[int]] = field(default_factory=dict)
+    ranges: dict[tuple[int, int], tuple[int, int]] = field(default_factory=dict)
+
+    @classmethod
+    @profiled()
+    def from_dataframe(cls, df: pd.DataFrame) -> "PeriodCatalog":
+        """
+        Builds the catalog of a ledger sorted by date, with a single pass over the 'date' column.
+
+        Parameters
+        ----------
+        df : pd.DataFrame
+            The expenses, sorted by the 'date' column.
+
+        Returns
+        -------
+        PeriodCatalog
+            The years, months and row ranges of the ledger.
+        """
+        catalog = cls()
+        # the rows without a date are sorted last, and do not belong to any period
+        dates = df["date"].iloc[: int(df["date"].notna().sum())]
+        if dates.empty:
+            return catalog
+
+        # one number per month: as the ledger is sorted, a new month starts where the number changes
+        periods = dates.dt.year.to_numpy(dtype="int64") * 12 + dates.dt.month.to_numpy() - 1
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(periods)) + 1))
+        stops = np.append(starts[1:], len(periods))
+
+        for start, stop in zip(starts.tolist(), stops.tolist()):
+            year, month = divmod(int(periods[start]), 12)
+            if year not in catalog.months:
+                catalog.years.append(year)
+                catalog.months[year] = []
+            catalog.months[year].append(month + 1)
+            catalog.ranges[(year, month + 1)] = (start, stop)
+
+        return catalog
+
+    def months_of(self, year: int) -> list[int]:
+        """
+        The months with data of a year.
+
+        Parameters
+        ----------
+        year : int
+            The year selected by the user.
+
+        Returns
+        -------
+        list[int]
+            The months (1-12) with data, in calendar order. Empty if the year has no data.
+        """
+        return self.months.get(int(year), [])
+
+    def rows(self, df: pd.DataFrame, year: int, month: Optional[int] = None) -> pd.DataFrame:
+        """
+        The rows of the ledger in a year, or in a month of a year, as a slice of the ledger.
+
+        Parameters
+        ----------
+        df : pd.DataFrame
+            The ledger the catalog has been built from.
+        year : int
+            The year selected by the user.
+        month : int, optional
+            The month selected by the user. Defaults to None (the whole year).
+
+        Returns
+        -------
+        pd.DataFrame
+            The rows of the period, empty if the period has no data.
+        """
+        months = self.months_of(year) if month is None else [int(month)]
+        periods = [self.ranges[(int(year), m)] for m in months if (int(year), m) in self.ranges]
+        if not periods:
+            return df.iloc[0:0]
+        # the months of a year are contiguous in the sorted ledger
+        return df.iloc[periods[0][0] : periods[-1][1]]
@@ -1,31 +1,169 @@
 # use streamlit
 import pandas as pd
-import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
 from dataclasses import dataclass
 from typing import Optional
-from pkgs.metrics_dataclasses import ExpenseMetric
+from .cities import CityRollup
+from .global_vars import MONTHS_TEXT, NON_EXPENSE_CATEGORIES
+from .heatmaps import SpendingBins
+from .hierarchy import HIERARCHY_LEVELS
+from .metrics_dataclasses import ExpenseMetric
+from .periods import PeriodCatalog
+from .profiling import profiled
+from .results_dataclasses import AggregateResult, WaterfallResult
+from .backends import QueryBackend
+
+# bars of the waterfall breakdown: label shown in the plot -> expense_category in the data
+WATERFALL_CATEGORIES = {
+    "Income": "income",
+    "Household & Personal Care": "household & personal care",
+    "Apparel": "Apparel",
+    "Entertainment & Leisure": "entertainment & leisure",
+    "Food": "food",
+    "Restaurant": "restaurant",
+    "Home & Living": "home & living",
+    "Transportation": "transportation",
+    "Education & Learning": "education & learning",
+    "Others": "others",
+}
 
 
 @dataclass
 class ExpensePlot:
+    """
+    A class to build the plots of the Overall Overview tab.
+
+    Each plot is split in two steps: a pure aggregation returning an AggregateResult,
+    and the construction of the Plotly figure from it. Drawing the figure is left to
+    the rendering layer (render.display_plot).
+
+    When a query backend is given, the aggregations are computed by it instead of pandas.
+    """
+
     df: pd.DataFrame
     past_date: str
     today_date: str
+    backend: Optional[QueryBackend] = None
 
-    def plot_bar_chart_category_total(
+    @profiled()
+    def expenses_in_date_range(
         self, df: pd.DataFrame, today_date: str, past_date: str
-    ) -> None:
+    ) -> pd.DataFrame:
+        """
+        Filter the data between two dates, "From" and "To" date, keeping only the expenses.
+
+        Parameters
+        ----------
+        df : pd.DataFrame
+            Original dataframe of the expenses.
+        today_date : str
+            The current date (the "To" date)
+        past_date : str
+            The previous date (the "From" date)
+
+        Returns
+        -------
+        pd.DataFrame
+            The expenses in the timeframe, without "income", "investment" and "savings".
+        """
         df_filtered = ExpenseMetric.filter_data(self, df, past_date, today_date)
 
-        df_expenses_within_date_range = df_filtered.loc[
-            ~df_filtered["expense_category"].isin(["income", "investment", "savings"])
-        ]
+        return df_filtered.loc[~df_filtered["expense_category"].isin(NON_EXPENSE_CATEGORIES)]
+
+    @profiled()
+    def category_totals(self, df: pd.DataFrame, today_date: str, past_date: str) -> AggregateResult:
+        """
+        Sum of the expenses for each category in the timeframe selected.
+
+        Parameters
+        ----------
+        df : pd.DataFrame
+            Original dataframe of the expenses.
+        today_date : str
+            The current date (the "To" date)
+        past_date : str
+            The previous date (the "From" date)
+
+        Returns
+        -------
+        AggregateResult
+            One row per category with the columns "expense_category" and "value".
+        """
+        if self.backend is not None:
+            return AggregateResult(
+                frame=self.backend.category_totals(past_date, today_date),
+                title="Expenses per category",
+            )
+
+        df_expenses_within_date_range = self.expenses_in_date_range(df, today_date, past_date)
+
+        return AggregateResult(
+            frame=df_expenses_within_date_range.groupby("expense_category")["value"]
+            .sum()
+            .reset_index(),
+            title="Expenses per category",
+        )
+
+    @profiled()
+    def store_totals(self, df: pd.DataFrame, today_date: str, past_date: str) -> AggregateResult:
+        """
+        Sum of the expenses for each store in the timeframe selected.
+
+        Parameters
+        ----------
+        df : pd.DataFrame
+            Original dataframe of the expenses.
+        today_date : str
+            The current date (the "To" date)
+        past_date : str
+            The previous date (the "From" date)
+
+        Returns
+        -------
+        AggregateResult
+            One row per store with the columns "store" and "value".
+        """
+        if self.backend is not None:
+            return AggregateResult(
+                frame=self.backend.store_totals(past_date, today_date),
+                title="Expenses per store",
+            )
+
+        df_expenses_within_date_range = self.expenses_in_date_range(df, today_date, past_date)
+
+        return AggregateResult(
+            frame=df_expenses_within_date_range.groupby("store")["value"].sum().reset_index(),
+            title="Expenses per store",
+        )
+
+    @profiled()
+    def plot_bar_chart_category_total(
+        self, df: pd.DataFrame, today_date: str, past_date: str
+    ) -> go.Figure:
+        """
+            Plot a bar chart with the expenses for each category
+            in the timeframe selected.
+
+        Parameters
+        ----------
+        df : pd.DataFrame
+            Original dataframe of the expenses.
+        today_date : str
+            The current date (the "To" date)
+        past_date : str
+            The previous date (the "From" date)
+
+        Returns
+        -------
+        go.Figure
+            The bar chart to be displayed.
+        """
+        category_totals = self.category_totals(df, today_date, past_date)
 
         # instantiate the bar chart with the expense categories
         fig_bar_chart = px.bar(
-            df_expenses_within_date_range.groupby("expense_category")["value"].sum().reset_index(),
+            category_totals.frame,
             x="expense_category",
             y="value",
             color="expense_category",
@@ -33,22 +171,17 @@ class ExpensePlot:
         fig_bar_chart.update_layout(barmode="stack", xaxis={"categoryorder": "total descending"})
         # Update layout (optional)
         fig_bar_chart.update_layout(
-            title="Expenses per category",
+            title=category_totals.title,
             xaxis_title="Category",
             yaxis_title="Expenses",
         )
 
-        # plot
-        bar_chart_category_total = st.plotly_chart(
-            fig_bar_chart,
-            use_container_width=True,
-        )
-
-        return bar_chart_category_total
+        return fig_bar_chart
 
+    @profiled()
     def plot_donut_chart_store_total(
         self, df: pd.DataFrame, today_date: str, past_date: str
-    ) -> None:
+    ) -> go.Figure:
         """
             Plot a donut chart with the percentage of expenses for each
             store in the timeframe selected.
@@ -56,27 +189,28 @@ class ExpensePlot:
         Parameters
         ----------
         df : pd.DataFrame
-            _description_
+            Original dataframe of the expenses.
         today_date : str
             The current date (the "To" date)
         past_date : str
             The previous date (the "From" date)
-        """
-
-        # Filter data between two dates, "From" and "To" date
-        df_filtered = ExpenseMetric.filter_data(self, df, past_date, today_date)
 
-        df_expenses_within_date_range = df_filtered.loc[
-            ~df_filtered["expense_category"].isin(["income", "investment", "savings"])
-        ]
+        Returns
+        -------
+        go.Figure
+            The donut chart to be displayed.
+        """
+        # the pie chart sums the values of each store anyway: aggregate before
+        # building the figure, so the figure only carries one value per store
+        store_totals = self.store_totals(df, today_date, past_date)
 
         # Donut chart
         # instantiate the donut chart with the stores
         fig_pie_plot = px.pie(
-            df_expenses_within_date_range,
+            store_totals.frame,
             values="value",
             names="store",
-            title="Expenses per store",
+            title=store_totals.title,
             hole=0.7,
         )
         # Update the pie plot to insert the label inside the slice
@@ -84,23 +218,209 @@ class ExpensePlot:
         fig_pie_plot.update_traces(textposition="inside")
         fig_pie_plot.update_layout(uniformtext_minsize=12, uniformtext_mode="hide")
 
-        # plot the pie plot for stores
-        plot2 = st.plotly_chart(
-            fig_pie_plot,
-            use_container_width=True,
+        return fig_pie_plot
+
+    @profiled()
+    def plot_hierarchy_category_type_store(
+        self, hierarchy: AggregateResult, kind: str = "sunburst"
+    ) -> go.Figure:
+        """
+            Plot the expenses of the timeframe per category, expense type and store,
+            as a sunburst or as a treemap.
+
+        Parameters
+        ----------
+        hierarchy : AggregateResult
+            The leaves of the hierarchy, as returned by ExpenseHierarchy.totals.
+        kind : str, optional
+            "sunburst" or "treemap". Defaults to "sunburst".
+
+        Returns
+        -------
+        go.Figure
+            The chart to be displayed: click on a node to zoom into it.
+        """
+        chart = px.treemap if kind == "treemap" else px.sunburst
+        fig = chart(
+            hierarchy.frame,
+            path=HIERARCHY_LEVELS,
+            values="value",
+            title=hierarchy.title,
         )
+        fig.update_traces(hovertemplate="%{label}<br>%{value:.2f}<extra></extra>")
 
-        return plot2
+        return fig
 
 
 @dataclass
 class ExpensePlotMonth:
+    """
+    A class to build the plots of the Monthly Overview, Monthly comparison and Monthly Breakdown tabs.
+
+    As for ExpensePlot, the aggregations return result objects and the plot_* methods
+    build the Plotly figures from them, without drawing anything. When a query backend
+    is given, the aggregations are computed by it instead of pandas. When a period catalog
+    is given, the rows of a year or month are sliced from the sorted ledger instead of filtered.
+    """
+
     df: pd.DataFrame
     year: str
     month: Optional[str] = None
     side: Optional[str] = None
+    backend: Optional[QueryBackend] = None
+    periods: Optional[PeriodCatalog] = None
+
+    def period_rows(self, df: pd.DataFrame, year: str, month: Optional[str] = None) -> pd.DataFrame:
+        """
+        Rows of the dataframe in the year, or in the month of the year, selected.
+
+        Parameters
+        ----------
+        df : pd.DataFrame
+            Original dataframe to be sliced.
+        year : str
+            Year selected by the user.
+        month : str, optional
+            Month selected by the user. Defaults to None (the whole year).
+
+        Returns
+        -------
+        pd.DataFrame
+            The rows of the period.
+        """
+        if self.periods is not None:
+            return self.periods.rows(df, year, month)
+        if month is None:
+            return df.loc[df["year"] == int(year)]
+        return df.loc[(df["year"] == year) & (df["month"] == month)]
+
+    @profiled()
+    def month_category_totals(self, df: pd.DataFrame, year: str, month: str) -> AggregateResult:
+        """
+        Sum of the expenses for each category in the year and month selected.
+
+        Parameters
+        ----------
+        df : pd.DataFrame
+            Original dataframe to be sliced.
+        year : str
+            Year selected by the user.
+        month : str
+            Month selected by the user.
+
+        Returns
+        -------
+        AggregateResult
+            One row per category with the columns "expense_category" and "value".
+        """
+        if self.backend is not None:
+            return AggregateResult(
+                frame=self.backend.month_category_totals(year, month),
+                title="Expenses per category",
+            )
+
+        # filter the df based on the selection of the user, and filter out the income: it's not an expense
+        df_monthly_report_choose_month = self.period_rows(df, year, month)
+        df_monthly_report_choose_month = df_monthly_report_choose_month.loc[
+            ~df_monthly_report_choose_month["expense_category"].isin(NON_EXPENSE_CATEGORIES)
+        ]
+
+        return AggregateResult(
+            frame=df_monthly_report_choose_month.groupby("expense_category")["value"]
+            .sum()
+            .reset_index(),
+            title="Expenses per category",
+        )
+
+    @profiled()
+    def year_category_totals(self, df: pd.DataFrame, year: str) -> AggregateResult:
+        """
+        Sum of the expenses for each category and month in the year selected.
+
+        Parameters
+        ----------
+        df : pd.DataFrame
+            Original dataframe of the expeses.
+        year : str
+            Year that has been selected by the user.
+
+        Returns
+        -------
+        AggregateResult
+            One row per category and month with the columns "expense_category", "months_text" and "value".
+        """
+        if self.backend is not None:
+            return AggregateResult(
+                frame=self.backend.year_category_totals(year),
+                title="Expenses per Month",
+            )
+
+        # filter data for year, and filter out the income from the plot: it's not an expense
+        df_expenses_filtered_year = self.period_rows(df, year)
+        df_expenses_filtered_year = df_expenses_filtered_year.loc[
+            ~df_expenses_filtered_year["expense_category"].isin(NON_EXPENSE_CATEGORIES)
+        ]
+
+        return AggregateResult(
+            frame=df_expenses_filtered_year.groupby(
+                ["expense_category", "months_text"], observed=True
+            )["value"]
+            .sum()
+            .reset_index(),
+            title="Expenses per Month",
+        )
+
+    @profiled()
+    def waterfall_totals(self, df: pd.DataFrame, year: str, month: str) -> WaterfallResult:
+        """
+        Income, expenses of the main categories and remaining income for the year and month selected.
+
+        Parameters
+        ----------
+        df : pd.DataFrame
+            Original dataframe to be sliced.
+        year : str
+            Year selected by the user.
+        month : str
+            Month selected by the user.
+
+        Returns
+        -------
+        WaterfallResult
+            The bars of the waterfall: the income first, then each category as a negative value.
+        """
+        if self.backend is not None:
+            totals_per_category = self.backend.month_category_totals(
+                year, month, expenses_only=False
+            ).set_index("expense_category")["value"]
+        else:
+            # filter the df based on the selection of the user
+            df_monthly_report_choose_month = self.period_rows(df, year, month)
+
+            # one groupby for all the bars, instead of filtering the month once per category
+            totals_per_category = df_monthly_report_choose_month.groupby("expense_category")[
+                "value"
+            ].sum()
+        totals_per_bar = totals_per_category.reindex(
+            list(WATERFALL_CATEGORIES.values()), fill_value=0
+        )
+
+        # create the data based on the dataframe and the main categories:
+        # the income increases, every expense decreases, and the last bar is the total
+        data = [totals_per_bar.iloc[0]] + [-total for total in totals_per_bar.iloc[1:]] + [0]
+
+        # do not consider the total, and slice the list of values excluding the last element;
+        # then just append the total given by the sum of all the elements in the list
+        annotation = data[:-1] + [round(sum(data), 2)]
 
-    def monthly_report_plot(self, df: pd.DataFrame, year: str, month: str, side: str) -> None:
+        return WaterfallResult(
+            labels=list(WATERFALL_CATEGORIES.keys()) + ["Remaining Income"],
+            values=data,
+            annotation=annotation,
+        )
+
+    @profiled()
+    def monthly_report_plot(self, df: pd.DataFrame, year: str, month: str) -> go.Figure:
         """
         ------------------------------
         --- Monthly Comparison Tab ---
@@ -115,31 +435,17 @@ class ExpensePlotMonth:
             Year selected by the user.
         month : str
             Month selected by the user.
-        side : str
-            The side in which the plot should be inserted based on the container created.
 
         Returns
         -------
-        None
+        go.Figure
             Stacked bar chart will be returned.
         """
-
-        # filter out the income, it's not an expense
-        df = df.loc[~df["expense_category"].isin(["income", "investment", "savings"])]
-
-        # TODO:
-        # You should be able to reduce this to one row by filtering both for the year and the month
-        # filter the df based on the selection of the user
-        df_monthly_report_choose_year = df[df["year"] == year]
-
-        # filter the df based on the selection of the user
-        df_monthly_report_choose_month = df_monthly_report_choose_year[
-            df_monthly_report_choose_year["month"] == month
-        ]
+        month_category_totals = self.month_category_totals(df, year, month)
 
         # create the horizontal bar plot
         fig_bar_chart_monthly_report_plot = px.bar(
-            df_monthly_report_choose_month.groupby("expense_category")["value"].sum().reset_index(),
+            month_category_totals.frame,
             y="expense_category",
             x="value",
             color="expense_category",
@@ -152,20 +458,15 @@ class ExpensePlotMonth:
         )
         # Update layout (optional)
         fig_bar_chart_monthly_report_plot.update_layout(
-            title="Expenses per category",
+            title=month_category_totals.title,
             xaxis_title="Total amount spent",
             yaxis_title="Categories",
         )
 
-        # plot
-        plot1 = st.plotly_chart(
-            fig_bar_chart_monthly_report_plot,
-            use_container_width=True,
-        )
-
-        return plot1
+        return fig_bar_chart_monthly_report_plot
 
-    def plot_bar_chart_expenses_per_month(self, df: pd.DataFrame, year: str, side: str) -> None:
+    @profiled()
+    def plot_bar_chart_expenses_per_month(self, df: pd.DataFrame, year: str) -> go.Figure:
         """
             Bar plot that shows the sum of the expenses for the year selected
             considering the total number of months in the plot.
@@ -179,28 +480,19 @@ class ExpensePlotMonth:
 
         Returns
         -------
-        None
+        go.Figure
             Return the plot to be displayed.
         """
+        year_category_totals = self.year_category_totals(df, year)
 
-        # filter out the income from the plot, it's not an expense
-        df = df.loc[~df["expense_category"].isin(["income", "investment", "savings"])]
-
-        #  Filter data for year
-        df_expenses_filtered_year = df.loc[(df["year"] == int(year))]
-        # filter the df out using the "choose_year" filter for the year
-        df_expenses_subdf_by_month_per_year = df[df["year"] == year]
-        # get only the month and the values
-        df_expenses_subdf_by_month = df_expenses_subdf_by_month_per_year[["months_text", "value"]]
-
-        # take the average daily expenses per month
-        monthly_sum_values = df_expenses_subdf_by_month.groupby(["months_text"]).sum()
+        # take the sum of the expenses per month from the already aggregated data
+        monthly_sum_values = year_category_totals.frame.groupby(["months_text"], observed=True)[
+            ["value"]
+        ].sum()
 
         # get statistics per months, using a bar plot
         fig_bar_chart_months = px.bar(
-            df_expenses_filtered_year.groupby(["expense_category", "months_text"])["value"]
-            .sum()
-            .reset_index(),
+            year_category_totals.frame,
             x="months_text",
             y="value",
             color="expense_category",
@@ -222,38 +514,18 @@ class ExpensePlotMonth:
         )
         # Update layout
         fig_bar_chart_months.update_layout(
-            title="Expenses per Month", xaxis_title="Months", yaxis_title="Sum of Expenses"
+            title=year_category_totals.title, xaxis_title="Months", yaxis_title="Sum of Expenses"
         )
 
         # reorder the months for the barplot
         fig_bar_chart_months.update_xaxes(
             categoryorder="array",
-            categoryarray=[
-                "Jan",
-                "Feb",
-                "Mar",
-                "Apr",
-                "May",
-                "Jun",
-                "Jul",
-                "Aug",
-                "Sep",
-                "Oct",
-                "Nov",
-                "Dec",
-            ],
+            categoryarray=MONTHS_TEXT,
         )
 
-        # plot the actual graph
-        plot3 = side.plotly_chart(
-            fig_bar_chart_months,
-            use_container_width=True,
-            sharing="streamlit",
-            theme="streamlit",
-        )
-
-        return plot3
+        return fig_bar_chart_months
 
+    @profiled()
     def plot_waterfall_per_month(
         self,
         df,
@@ -272,11 +544,14 @@ class ExpensePlotMonth:
         Create a waterfall chart using Plotly.
 
         Parameters:
-            labels (list):
-                A list of labels for the data points.
+            df (pd.DataFrame):
+                Original dataframe to be sliced.
 
-            data (list):
-                A list of numerical values representing the data points.
+            year (str):
+                Year selected by the user.
+
+            month (str):
+                Month selected by the user.
 
             title (str, optional):
                 The title of the chart. Defaults to an empty string.
@@ -308,112 +583,19 @@ class ExpensePlotMonth:
         # plot title
         title = "Waterfall Breakdown Monthly Expenses"
 
-        # plot the waterfall diagram with the remaining income per month
-        labels = [
-            "Income",
-            "Household & Personal Care",
-            "Apparel",
-            "Entertainment & Leisure",
-            "Food",
-            "Restaurant",
-            "Home & Living",
-            "Transportation",
-            "Education & Learning",
-            "Others",
-            "Remaining Income",
-        ]
-
-        # filter the df based on the selection of the user
-        df_monthly_report_choose_year = df[df["year"] == year]
-
-        # filter the df based on the selection of the user
-        df_monthly_report_choose_month = df_monthly_report_choose_year[
-            df_monthly_report_choose_year["month"] == month
-        ]
-
-        ###########################################
-        ##### Bar selection for each category #####
-        # filter in only the income for the first bar
-        df_income = df_monthly_report_choose_month.loc[df["expense_category"].isin(["income"])][
-            "value"
-        ].sum()
-
-        # filter in only the household & personal care for the second bar
-        df_household_personalCare = df_monthly_report_choose_month.loc[
-            df["expense_category"].isin(["household & personal care"])
-        ]["value"].sum()
-
-        # filter in only the Apparel for the third bar
-        df_apparel = df_monthly_report_choose_month.loc[df["expense_category"].isin(["Apparel"])][
-            "value"
-        ].sum()
-
-        # filter in only the entertainment & leisure for the fourth bar
-        df_entertainment_leisure = df_monthly_report_choose_month.loc[
-            df["expense_category"].isin(["entertainment & leisure"])
-        ]["value"].sum()
-
-        # filter in only the food for the fifth bar
-        df_food = df_monthly_report_choose_month.loc[df["expense_category"].isin(["food"])][
-            "value"
-        ].sum()
-
-        # filter in only the restaurant for the sixth bar
-        df_restaurant = df_monthly_report_choose_month.loc[
-            df["expense_category"].isin(["restaurant"])
-        ]["value"].sum()
-
-        # filter in only the home & living for the seventh bar
-        df_home_living = df_monthly_report_choose_month.loc[
-            df["expense_category"].isin(["home & living"])
-        ]["value"].sum()
-
-        # filter in only the transportation for the eigth bar
-        df_transportation = df_monthly_report_choose_month.loc[
-            df["expense_category"].isin(["transportation"])
-        ]["value"].sum()
-
-        # filter in only the education & learning for the ninth bar
-        df_education_learning = df_monthly_report_choose_month.loc[
-            df["expense_category"].isin(["education & learning"])
-        ]["value"].sum()
-
-        # filter in only the others for the tenth bar
-        df_others = df_monthly_report_choose_month.loc[df["expense_category"].isin(["others"])][
-            "value"
-        ].sum()
-
-        ###########################################
-
-        # create the data based on the dataframe and the main categories
-        data = [
-            df_income,
-            -df_household_personalCare,
-            -df_apparel,
-            -df_entertainment_leisure,
-            -df_food,
-            -df_restaurant,
-            -df_home_living,
-            -df_transportation,
-            -df_education_learning,
-            -df_others,
-            0,
-        ]
+        waterfall_totals = self.waterfall_totals(df, year, month)
 
         # Set default measure values if not provided
         if measure is None:
             # Docs: https://plotly.com/python/waterfall-charts/
             # Explanation: all measures are relative, except the last one that is a total meausure
-            measure = ["relative"] * (len(labels) - 1)
+            measure = ["relative"] * (len(waterfall_totals.labels) - 1)
             # Append the last measurement as total
             measure.append("total")
 
         # Set default annotation values if not provided
         if annotation is None:
-            # do not consider the total, and slice the list of values excluding the last element
-            annotation = data[:-1]
-            # just append the total given by the sum of all the elements in the list
-            annotation.append(round(sum(data), 2))
+            annotation = waterfall_totals.annotation
 
         # Create the waterfall chart figure
         fig = go.Figure(
@@ -422,8 +604,8 @@ class ExpensePlotMonth:
                 measure=measure,
                 textposition="outside",
                 text=annotation,
-                y=data,
-                x=labels,
+                y=waterfall_totals.values,
+                x=waterfall_totals.labels,
                 connector={"line": {"color": ccolor}},
                 decreasing={"marker": {"color": dcolor}},
                 increasing={"marker": {"color": icolor}},
@@ -434,10 +616,193 @@ class ExpensePlotMonth:
             height=510,
         )
 
-        # plot
-        plot_waterfall = st.plotly_chart(
-            fig,
-            use_container_width=True,
+        return fig
+
+    @profiled()
+    def plot_budget_vs_actual(self, budget_report: AggregateResult) -> go.Figure:
+        """
+        Plot a bar chart with the expenses of each category against its budget.
+
+        Parameters
+        ----------
+        budget_report : AggregateResult
+            The budget-vs-actual of the month, as returned by BudgetTargets.report.
+
+        Returns
+        -------
+        go.Figure
+            The bar chart to be displayed: the actual and projected expenses as bars,
+            the budget as a marker on top of them.
+        """
+        report = budget_report.frame
+
+        fig = go.Figure()
+        fig.add_trace(
+            go.Bar(
+                x=report["expense_category"],
+                y=report["projected"],
+                name="Projected at month-end",
+                marker_color="lightgrey",
+            )
+        )
+        fig.add_trace(
+            go.Bar(
+                x=report["expense_category"],
+                y=report["actual"],
+                name="Actual",
+                # red for the categories projected to overspend
+                marker_color=[
+                    "#ff6b7f" if overspend > 0 else "#8fcf00"
+                    for overspend in report["projected_overspend"]
+                ],
+            )
         )
+        fig.add_trace(
+            go.Scatter(
+                x=report["expense_category"],
+                y=report["budget"],
+                name="Budget",
+                mode="markers",
+                marker=dict(symbol="line-ew-open", size=40, line=dict(width=3), color="#4c5982"),
+            )
+        )
+        fig.update_layout(
+            title=budget_report.title,
+            barmode="overlay",
+            xaxis_title="Category",
+            yaxis_title="Expenses",
+        )
+
+        return fig
+
+
+@dataclass
+class ExpensePlotHeatmap:
+    """
+    A class to build the plots of the Spending Heatmaps tab.
+
+    The totals come from the bins of the aggregates, filled while the file is ingested: a
+    heatmap of any year is built from its grid, without grouping the rows of the ledger.
+    """
+
+    bins: SpendingBins
+
+    @profiled()
+    def plot_heatmap_weekday_week(self, year: int) -> go.Figure:
+        """
+        Heatmap of the expenses of a year, per weekday and week of the year.
+
+        Parameters
+        ----------
+        year : int
+            Year that has been selected by the user.
+
+        Returns
+        -------
+        go.Figure
+            The heatmap to be displayed, one cell per day of the year.
+        """
+        weekday_week_totals = self.bins.weekday_week_totals(year)
+
+        fig = px.imshow(
+            weekday_week_totals.frame,
+            aspect="auto",
+            color_continuous_scale="Reds",
+            labels=dict(x="Week of the year", y="Weekday", color="Expenses"),
+        )
+        fig.update_layout(title=weekday_week_totals.title)
+
+        return fig
+
+    @profiled()
+    def plot_heatmap_category_day(self, year: int) -> go.Figure:
+        """
+        Heatmap of the expenses of a year, per category and day of the month.
+
+        Parameters
+        ----------
+        year : int
+            Year that has been selected by the user.
+
+        Returns
+        -------
+        go.Figure
+            The heatmap to be displayed, one row per category with expenses in the year.
+        """
+        category_day_totals = self.bins.category_day_totals(year)
+
+        fig = px.imshow(
+            category_day_totals.frame,
+            aspect="auto",
+            color_continuous_scale="Reds",
+            labels=dict(x="Day of the month", y="Category", color="Expenses"),
+        )
+        fig.update_layout(title=category_day_totals.title)
+
+        return fig
+
+
+@dataclass
+class ExpensePlotCity:
+    """
+    A class to build the plots of the Cities tab.
+
+    The totals come from the city rollup of the aggregates, one row per day and city, for the
+    same year and month selectors as ExpensePlotMonth: no row of the ledger is scanned.
+    """
+
+    cities: CityRollup
+    year: int
+    month: Optional[int] = None
+
+    @profiled()
+    def plot_bar_chart_city_per_month(self, year: int) -> go.Figure:
+        """
+        Bar plot of the expenses of each month of the year selected, stacked by city.
+
+        Parameters
+        ----------
+        year : int
+            Year that has been selected by the user.
+
+        Returns
+        -------
+        go.Figure
+            The bar chart to be displayed.
+        """
+        year_city_totals = self.cities.year_city_totals(year)
+
+        fig = px.bar(year_city_totals.frame, x="months_text", y="value", color="city")
+        fig.update_layout(
+            title=year_city_totals.title, xaxis_title="Months", yaxis_title="Sum of Expenses"
+        )
+        fig.update_xaxes(categoryorder="array", categoryarray=MONTHS_TEXT)
+
+        return fig
+
+    @profiled()
+    def plot_donut_chart_city_total(self, year: int, month: Optional[int] = None) -> go.Figure:
+        """
+        Donut chart with the percentage of expenses for each city in the year, or month, selected.
+
+        Parameters
+        ----------
+        year : int
+            Year that has been selected by the user.
+        month : Optional[int], optional
+            Month that has been selected by the user. Defaults to None (the whole year).
+
+        Returns
+        -------
+        go.Figure
+            The donut chart to be displayed.
+        """
+        city_totals = self.cities.city_totals(year, month)
+
+        fig_pie_plot = px.pie(
+            city_totals.frame, values="value", names="city", title=city_totals.title, hole=0.7
+        )
+        fig_pie_plot.update_traces(textposition="inside")
+        fig_pie_plot.update_layout(uniformtext_minsize=12, uniformtext_mode="hide")
 
-        return plot_waterfall
+        return fig_pie_plot
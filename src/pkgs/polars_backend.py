@@ -0,0 +1,165 @@
+"""
+This script contains the Polars query backend of the dashboard.
+
+The ledger is converted once into a Polars DataFrame, and the aggregations behind ExpenseMetric,
+ExpensePlot and ExpensePlotMonth are run as lazy query plans: Polars pushes the filters down,
+only reads the columns a query needs and runs the group-bys on all the cores. Only the (small)
+results come back as pandas objects, so the numbers are the same as the pandas computations.
+"""
+
+# --- Import packages --- #
+import datetime
+import pandas as pd
+from dataclasses import dataclass
+from typing import Any, Optional
+from .global_vars import NON_EXPENSE_CATEGORIES
+
+try:
+    import polars as pl
+except ImportError:  # optional dependency: the Polars engine is not offered
+    pl = None
+
+# columns of the ledger converted to Polars, besides the date
+POLARS_COLUMNS = ["expense_category", "expense_type", "value", "store", "city", "year", "month"]
+
+
+@dataclass
+class PolarsBackend:
+    """
+    A class to compute the aggregations of the dashboard as lazy Polars queries.
+
+    Attributes:
+        frame (Any): The ledger as a polars.DataFrame, with the date in the "day" column.
+
+    Methods:
+        from_dataframe(df):
+            Converts the ledger into a Polars DataFrame.
+        total_expenses(past_date, today_date):
+            Sum of the expenses between two dates.
+        total_expenses_per_category(past_date, today_date, category):
+            Sum of the values of a category between two dates.
+        total_income(past_date, today_date):
+            Sum of the income between two dates.
+        total_expenses_month(year, month):
+            Sum of the expenses in a month.
+        category_totals(past_date, today_date), store_totals(past_date, today_date):
+            Sum of the expenses per category (per store) between two dates.
+        month_category_totals(year, month, expenses_only):
+            Sum of the values per category in a month.
+        year_category_totals(year):
+            Sum of the expenses per category and month in a year.
+    """
+
+    frame: Any
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame) -> "PolarsBackend":
+        """
+        Converts the ledger into a Polars DataFrame.
+
+        Parameters
+        ----------
+        df : pd.DataFrame
+            The expenses, with the 'date' column parsed as datetime and the calendar columns.
+
+        Returns
+        -------
+        PolarsBackend
+            The backend, ready to be queried.
+        """
+        if pl is None:
+            raise ImportError("The polars package is needed to use the Polars engine.")
+
+        # the rows without a date (malformed in the file) are left out of every total, as in pandas
+        df = df[df["date"].notna()]
+        table = df[POLARS_COLUMNS].astype({"year": "int64", "month": "int64"})
+        table.insert(0, "day", df["date"].dt.normalize())
+        table["months_text"] = df["months_text"].astype(str)
+        frame = pl.from_pandas(table).with_columns(pl.col("day").cast(pl.Date))
+
+        return cls(frame=frame)
+
+    def _between(self, past_date: datetime.date, today_date: datetime.date) -> Any:
+        # lazy plan of the rows between two dates, both included
+        return self.frame.lazy().filter(pl.col("day").is_between(past_date, today_date))
+
+    def _month(self, year: int, month: int) -> Any:
+        return self.frame.lazy().filter(
+            (pl.col("year") == int(year)) & (pl.col("month") == int(month))
+        )
+
+    @staticmethod
+    def _expenses_only(plan: Any) -> Any:
+        # the rows without a category are expenses, as for pandas: is_in alone drops them
+        category = pl.col("expense_category")
+        return plan.filter(~category.is_in(NON_EXPENSE_CATEGORIES) | category.is_null())
+
+    @staticmethod
+    def _sum(plan: Any) -> float:
+        return plan.select(pl.col("value").sum()).collect().item()
+
+    @staticmethod
+    def _totals_by(plan: Any, columns: list[str]) -> pd.DataFrame:
+        # as with the pandas groupby, the rows without a category (or store) are not a group
+        totals = (
+            plan.drop_nulls(columns).group_by(columns).agg(pl.col("value").sum()).sort(columns)
+        ).collect()
+        return totals.to_pandas()
+
+    def total_expenses(self, past_date: datetime.date, today_date: datetime.date) -> float:
+        """Sum of the expenses between two dates, both included, excluding the non-expense categories."""
+        return self._sum(self._expenses_only(self._between(past_date, today_date)))
+
+    def total_expenses_per_category(
+        self, past_date: datetime.date, today_date: datetime.date, category: str
+    ) -> Optional[float]:
+        """Sum of the values of a category between two dates, both included. None if the category has no data."""
+        totals = (
+            self._between(past_date, today_date)
+            .filter(pl.col("expense_category") == category)
+            .select(pl.col("value").sum(), pl.len())
+            .collect()
+        )
+        return totals.item(0, 0) if totals.item(0, 1) > 0 else None
+
+    def total_income(self, past_date: datetime.date, today_date: datetime.date) -> float:
+        """Sum of the income between two dates, both included."""
+        return self._sum(
+            self._between(past_date, today_date).filter(pl.col("expense_category") == "income")
+        )
+
+    def total_expenses_month(self, year: int, month: int) -> float:
+        """Sum of the expenses in a month, excluding the non-expense categories."""
+        return self._sum(self._expenses_only(self._month(year, month)))
+
+    def category_totals(self, past_date: datetime.date, today_date: datetime.date) -> pd.DataFrame:
+        """Sum of the expenses per category between two dates, with the columns "expense_category" and "value"."""
+        return self._totals_by(
+            self._expenses_only(self._between(past_date, today_date)), ["expense_category"]
+        )
+
+    def store_totals(self, past_date: datetime.date, today_date: datetime.date) -> pd.DataFrame:
+        """Sum of the expenses per store between two dates, with the columns "store" and "value"."""
+        return self._totals_by(self._expenses_only(self._between(past_date, today_date)), ["store"])
+
+    def month_category_totals(
+        self, year: int, month: int, expenses_only: bool = True
+    ) -> pd.DataFrame:
+        """Sum of the values per category in a month, with the columns "expense_category" and "value"."""
+        plan = self._month(year, month)
+        if expenses_only:
+            plan = self._expenses_only(plan)
+        return self._totals_by(plan, ["expense_category"])
+
+    def year_category_totals(self, year: int) -> pd.DataFrame:
+        """Sum of the expenses per category and month, with the columns "expense_category", "months_text" and "value"."""
+        plan = self._expenses_only(self.frame.lazy().filter(pl.col("year") == int(year)))
+        totals = (
+            plan.drop_nulls(["expense_category"])
+            .group_by(["expense_category", "month", "months_text"])
+            .agg(pl.col("value").sum())
+            .sort(["expense_category", "month"])
+            .drop("month")
+            .collect()
+        )
+        return totals.to_pandas()
@@ -0,0 +1,303 @@
+"""
+This script contains the profiling hooks of the dashboard.
+
+Every rerun of the Streamlit script gets its own Profiler (one per thread, as Streamlit runs each
+session in its own thread), which collects timing and, optionally, allocation counters around the
+hot paths: ingestion, every ExpenseMetric/ExpensePlot* method and the serialization of the figures.
+At the end of the rerun the breakdown is written to a structured (JSON) log and can be shown in
+the sidebar panel of the dashboard.
+"""
+
+# --- Import packages --- #
+import functools
+import json
+import logging
+import threading
+import time
+import tracemalloc
+import pandas as pd
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# one profiler per thread: each Streamlit session reruns the script in its own thread
+_local = threading.local()
+
+
+@dataclass
+class ProfileRecord:
+    """
+    Counters collected for a single hot path during a rerun.
+
+    Attributes:
+        name (str): Name of the hot path, such as 'ExpenseMetric.compute_metrics'.
+        calls (int): Number of times the hot path has been executed.
+        seconds (float): Total wall-clock time spent in the hot path.
+        peak_bytes (int): Highest memory peak allocated by the hot path (only when allocations are tracked).
+    """
+
+    name: str
+    calls: int = 0
+    seconds: float = 0.0
+    peak_bytes: int = 0
+
+
+@dataclass
+class _Frame:
+    # memory allocated when the block started, and highest peak seen inside it
+    start_bytes: int
+    peak_bytes: int = 0
+
+
+@dataclass
+class Profiler:
+    """
+    A class to collect the timing, allocation and cache counters of one rerun.
+
+    Attributes:
+        enabled (bool): When False, the hooks do not record anything. Default is True.
+        track_allocations (bool): Trace the memory allocations with tracemalloc. Default is False,
+            as tracing slows down every allocation.
+        rerun (int): Number of the rerun the counters belong to.
+        records (dict[str, ProfileRecord]): The counters of each hot path.
+        cache_hits (dict[str, int]): Number of hits for each cache.
+        cache_misses (dict[str, int]): Number of misses for each cache.
+
+    Methods:
+        timed(name):
+            Context manager measuring the block of code as the hot path called `name`.
+        add(name, seconds, peak_bytes):
+            Records one call of the hot path called `name`, measured elsewhere.
+        count_cache(name, hit):
+            Counts a hit or a miss for the cache called `name`.
+        summary():
+            Returns the per-rerun breakdown, slowest hot path first.
+        log_summary():
+            Writes the per-rerun breakdown to the structured log.
+    """
+
+    enabled: bool = True
+    track_allocations: bool = False
+    rerun: int = 0
+    records: dict[str, ProfileRecord] = field(default_factory=dict)
+    cache_hits: dict[str, int] = field(default_factory=dict)
+    cache_misses: dict[str, int] = field(default_factory=dict)
+    _started_at: float = field(default_factory=time.perf_counter)
+    _stack: list[_Frame] = field(default_factory=list)
+
+    @contextmanager
+    def timed(self, name: str) -> Iterator[None]:
+        """
+        Measures the block of code as the hot path called `name`.
+
+        Nested blocks are measured as well: the time of an inner block is also part of the time
+        of the outer block, in the same way as the cumulative time of cProfile.
+
+        Parameters
+        ----------
+        name : str
+            Name of the hot path.
+        """
+        if not self.enabled:
+            yield
+            return
+
+        tracking = self.track_allocations and tracemalloc.is_tracing()
+        if tracking:
+            self._enter_allocations()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            peak_bytes = self._exit_allocations() if tracking else 0
+            self.add(name, seconds, peak_bytes)
+
+    def add(self, name: str, seconds: float, peak_bytes: int = 0) -> None:
+        """
+        Records one call of the hot path called `name`, measured elsewhere (for instance, in a background thread).
+
+        Parameters
+        ----------
+        name : str
+            Name of the hot path.
+        seconds : float
+            Wall-clock time spent in the call.
+        peak_bytes : int, optional
+            Memory peak allocated by the call. Defaults to 0.
+        """
+        if not self.enabled:
+            return
+        record = self.records.setdefault(name, ProfileRecord(name))
+        record.calls += 1
+        record.seconds += seconds
+        record.peak_bytes = max(record.peak_bytes, peak_bytes)
+
+    def _enter_allocations(self) -> None:
+        current, peak = tracemalloc.get_traced_memory()
+        # the peak reached so far belongs to the enclosing block, before it is reset for this one
+        if self._stack:
+            parent = self._stack[-1]
+            parent.peak_bytes = max(parent.peak_bytes, peak - parent.start_bytes)
+        tracemalloc.reset_peak()
+        self._stack.append(_Frame(start_bytes=current))
+
+    def _exit_allocations(self) -> int:
+        frame = self._stack.pop()
+        _, peak = tracemalloc.get_traced_memory()
+        frame_peak = max(frame.peak_bytes, peak - frame.start_bytes)
+        # propagate the peak of this block to the enclosing one
+        if self._stack:
+            parent = self._stack[-1]
+            parent.peak_bytes = max(
+                parent.peak_bytes, frame_peak + frame.start_bytes - parent.start_bytes
+            )
+        tracemalloc.reset_peak()
+        return max(frame_peak, 0)
+
+    def count_cache(self, name: str, hit: bool) -> None:
+        """
+        Counts a hit or a miss for the cache called `name`.
+
+        Parameters
+        ----------
+        name : str
+            Name of the cache.
+        hit : bool
+            True if the value was found in the cache, False if it had to be computed.
+        """
+        if not self.enabled:
+            return
+        counter = self.cache_hits if hit else self.cache_misses
+        counter[name] = counter.get(name, 0) + 1
+
+    def cache_hit_rates(self) -> dict[str, float]:
+        """
+        Hit rate of each cache used during the rerun.
+
+        Returns
+        -------
+        dict[str, float]
+            The share of lookups served by the cache, between 0 and 1, for each cache.
+        """
+        names = sorted(set(self.cache_hits) | set(self.cache_misses))
+        return {
+            name: self.cache_hits.get(name, 0)
+            / (self.cache_hits.get(name, 0) + self.cache_misses.get(name, 0))
+            for name in names
+        }
+
+    def total_seconds(self) -> float:
+        """Wall-clock time elapsed since the start of the rerun."""
+        return time.perf_counter() - self._started_at
+
+    def summary(self) -> pd.DataFrame:
+        """
+        Per-rerun breakdown of the hot paths, slowest first.
+
+        Returns
+        -------
+        pd.DataFrame
+            One row per hot path, with the columns "name", "calls", "seconds" and "peak_kib".
+        """
+        summary = pd.DataFrame(
+            [
+                {
+                    "name": record.name,
+                    "calls": record.calls,
+                    "seconds": round(record.seconds, 4),
+                    "peak_kib": round(record.peak_bytes / 1024, 1),
+                }
+                for record in self.records.values()
+            ],
+            columns=["name", "calls", "seconds", "peak_kib"],
+        )
+        return summary.sort_values(by="seconds", ascending=False).reset_index(drop=True)
+
+    def log_summary(self) -> None:
+        """Writes the per-rerun breakdown as one JSON line to the structured log."""
+        if not self.enabled:
+            return
+        logger.info(
+            json.dumps(
+                {
+                    "event": "rerun_profile",
+                    "rerun": self.rerun,
+                    "total_seconds": round(self.total_seconds(), 4),
+                    "hot_paths": self.summary().to_dict(orient="records"),
+                    "cache_hit_rates": self.cache_hit_rates(),
+                }
+            )
+        )
+
+
+def get_profiler() -> Profiler:
+    """
+    Returns the profiler of the current thread, creating it on first use.
+
+    Returns
+    -------
+    Profiler
+        The profiler collecting the counters of the current rerun.
+    """
+    profiler = getattr(_local, "profiler", None)
+    if profiler is None:
+        profiler = _local.profiler = Profiler()
+    return profiler
+
+
+def start_rerun(track_allocations: bool = False) -> Profiler:
+    """
+    Starts a fresh profiler for the rerun that is about to run in the current thread.
+
+    Parameters
+    ----------
+    track_allocations : bool, optional
+        Trace the memory allocations of the rerun with tracemalloc. Defaults to False.
+
+    Returns
+    -------
+    Profiler
+        The profiler collecting the counters of the new rerun.
+    """
+    previous = getattr(_local, "profiler", None)
+    rerun = previous.rerun + 1 if previous is not None else 1
+
+    if track_allocations and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    elif not track_allocations and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+    _local.profiler = Profiler(track_allocations=track_allocations, rerun=rerun)
+    return _local.profiler
+
+
+def profiled(name: Optional[str] = None) -> Callable:
+    """
+    Decorator measuring every call of the decorated function with the profiler of the current thread.
+
+    Parameters
+    ----------
+    name : str, optional
+        Name of the hot path. Defaults to the qualified name of the function,
+        such as 'ExpenseMetric.compute_metrics'.
+
+    Returns
+    -------
+    Callable
+        The decorated function.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        hot_path = name if name is not None else func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with get_profiler().timed(hot_path):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
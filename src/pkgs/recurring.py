@@ -0,0 +1,172 @@
+"""
+This script contains the detection of the recurring expenses (rent, subscriptions, utilities...).
+
+The expenses are grouped into series by store and expense_type. A series is recurring when it has
+enough charges, the days between two charges are regular (periodicity) and the amounts are similar
+(stability). The statistics of every series are computed at once, on the sorted intervals between
+the charges, so the whole ledger is analysed in a single vectorized pass.
+"""
+
+# --- Import packages --- #
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass, field
+from .global_vars import NON_EXPENSE_CATEGORIES
+from .profiling import profiled
+
+# usual periods of the recurring expenses, in days
+PERIODS = {"weekly": 7.0, "monthly": 30.44, "quarterly": 91.31, "yearly": 365.25}
+
+
+def period_label(interval_days: float, tolerance: float = 0.2) -> str:
+    """
+    Name of the period closest to a number of days between two charges.
+
+    Parameters
+    ----------
+    interval_days : float
+        The typical number of days between two charges.
+    tolerance : float, optional
+        Largest relative difference with a period to be named after it. Defaults to 0.2.
+
+    Returns
+    -------
+    str
+        Such as "monthly", or "every 45 days" when no usual period is close enough.
+    """
+    name, days = min(PERIODS.items(), key=lambda period: abs(period[1] - interval_days))
+    if abs(days - interval_days) <= tolerance * days:
+        return name
+    return f"every {round(interval_days)} days"
+
+
+@dataclass
+class RecurringExpenses:
+    """
+    The recurring expenses found in a ledger.
+
+    Attributes:
+        series (pd.DataFrame): One row per recurring series, with the columns "store", "expense_type",
+            "expense_category", "period", "interval_days", "occurrences", "amount" (the average
+            charge), "last_date" and "next_date" (when the next charge is expected), by amount.
+        rows (np.ndarray): One boolean per row of the ledger, True for the charges of a recurring series.
+    """
+
+    series: pd.DataFrame
+    rows: np.ndarray
+
+
+@dataclass
+class RecurringDetector:
+    """
+    A class to find the recurring expenses of a ledger.
+
+    Attributes:
+        min_occurrences (int): Fewest charges of a recurring series. Default is 3.
+        min_interval_days (float): Shortest typical interval between two charges: more frequent
+            charges (such as the daily coffee) are habits, not recurring expenses. Default is 6.
+        max_interval_cv (float): Largest coefficient of variation of the intervals. Default is 0.25.
+        max_amount_cv (float): Largest coefficient of variation of the amounts. Default is 0.25.
+        columns (list[str]): The columns identifying a series. Default is ["store", "expense_type"].
+
+    Methods:
+        detect(df):
+            Returns the recurring series of the ledger and the rows belonging to them.
+    """
+
+    min_occurrences: int = 3
+    min_interval_days: float = 6.0
+    max_interval_cv: float = 0.25
+    max_amount_cv: float = 0.25
+    columns: list[str] = field(default_factory=lambda: ["store", "expense_type"])
+
+    @profiled()
+    def detect(self, df: pd.DataFrame) -> RecurringExpenses:
+        """
+        Finds the recurring series of the ledger.
+
+        Parameters
+        ----------
+        df : pd.DataFrame
+            The expenses, with the 'date', 'expense_category', 'expense_type', 'value' and 'store' columns.
+
+        Returns
+        -------
+        RecurringExpenses
+            The recurring series, and the rows of the ledger belonging to them.
+        """
+        rows = np.zeros(len(df), dtype=bool)
+        # one integer per (store, expense_type); -1 for the rows missing one of them
+        keys = df.groupby(self.columns, sort=False, observed=True).ngroup().to_numpy()
+        candidates = (
+            (keys >= 0)
+            & df["date"].notna().to_numpy()
+            & ~df["expense_category"].isin(NON_EXPENSE_CATEGORIES).to_numpy()
+        )
+        positions = np.flatnonzero(candidates)
+        if positions.size == 0:
+            return RecurringExpenses(series=self._empty_series(), rows=rows)
+
+        days = df["date"].to_numpy().astype("datetime64[D]").astype(np.int64)
+        # the charges of each series next to each other, by date
+        order = positions[np.lexsort((days[positions], keys[positions]))]
+        series_keys, series_days = keys[order], days[order]
+        values = df["value"].to_numpy(dtype=np.float64)[order]
+
+        # the days between two charges of the same series
+        same_series = series_keys[1:] == series_keys[:-1]
+        intervals = pd.DataFrame(
+            {
+                "key": series_keys[1:][same_series],
+                "interval": (series_days[1:] - series_days[:-1])[same_series],
+            }
+        )
+        interval_stats = intervals.groupby("key")["interval"].agg(["median", "mean", "std"])
+        amount_stats = (
+            pd.DataFrame({"key": series_keys, "value": values, "day": series_days})
+            .groupby("key")
+            .agg(
+                occurrences=("value", "size"),
+                amount=("value", "mean"),
+                amount_std=("value", "std"),
+                last_day=("day", "max"),
+            )
+        )
+        stats = amount_stats.join(interval_stats, how="inner")
+
+        interval_cv = stats["std"].fillna(0.0) / stats["mean"]
+        amount_cv = stats["amount_std"].fillna(0.0) / stats["amount"].abs()
+        recurring = stats.loc[
+            (stats["occurrences"] >= self.min_occurrences)
+            & (stats["median"] >= self.min_interval_days)
+            & (interval_cv <= self.max_interval_cv)
+            & (amount_cv <= self.max_amount_cv)
+        ]
+
+        is_recurring = np.zeros(int(keys.max()) + 1, dtype=bool)
+        is_recurring[recurring.index.to_numpy()] = True
+        rows[order] = is_recurring[series_keys]
+
+        # the labels of each series, from its first charge
+        first_charges = order[np.flatnonzero(np.r_[True, series_keys[1:] != series_keys[:-1]])]
+        labels = df.iloc[first_charges][self.columns + ["expense_category"]]
+        labels.index = keys[first_charges]
+
+        last_date = pd.to_datetime(recurring["last_day"].to_numpy(), unit="D")
+        series = labels.loc[recurring.index].assign(
+            period=[period_label(days) for days in recurring["median"]],
+            interval_days=recurring["median"].to_numpy(),
+            occurrences=recurring["occurrences"].to_numpy(),
+            amount=recurring["amount"].round(2).to_numpy(),
+            last_date=last_date,
+            next_date=last_date + pd.to_timedelta(recurring["median"].to_numpy(), unit="D"),
+        )
+        series = series.sort_values(by="amount", ascending=False, ignore_index=True)
+        return RecurringExpenses(series=series, rows=rows)
+
+    def _empty_series(self) -> pd.DataFrame:
+        return pd.DataFrame(
+            columns=self.columns
+            + ["expense_category", "period", "interval_days", "occurrences", "amount"]
+            + ["last_date", "next_date"]
+        )
@@ -0,0 +1,159 @@
+"""
+This script contains the rendering layer of the dashboard: the only place, together with
+app.py, that talks to Streamlit. It draws the result objects and the figures produced by the
+computation layer (metrics_dataclasses.py and plots_dataclasses.py).
+"""
+
+# --- Import packages --- #
+import plotly.graph_objects as go
+import streamlit as st
+from typing import Callable, Optional
+from streamlit.delta_generator import DeltaGenerator
+from .ingestion import IngestionJob
+from .profiling import Profiler, profiled
+from .results_dataclasses import MetricResult, TransactionPage
+
+
+@profiled()
+def display_metric(result: MetricResult, side: Optional[DeltaGenerator] = None) -> DeltaGenerator:
+    """
+    Displays a metric using Streamlit, showing the current total and the difference from a previous total.
+
+    Parameters
+    ----------
+    result : MetricResult
+        The metric computed by the ExpenseMetric class.
+    side : DeltaGenerator, optional
+        The place where the metric should be inserted (for instance, left, center, right).
+        Defaults to the current container.
+
+    Returns
+    -------
+    DeltaGenerator
+        The Streamlit element of the metric.
+    """
+    side = st if side is None else side
+    return side.metric(
+        label=result.label,
+        value=result.value,
+        delta=result.delta,
+        delta_color=result.delta_color,
+        help=result.help_text,
+    )
+
+
+# Streamlit serializes the figure to JSON inside plotly_chart: this is the serialization hot path
+@profiled()
+def display_plot(fig: go.Figure, side: Optional[DeltaGenerator] = None, **kwargs) -> DeltaGenerator:
+    """
+    Displays a Plotly figure using Streamlit, stretched to the width of the container.
+
+    Parameters
+    ----------
+    fig : go.Figure
+        The figure built by the ExpensePlot or ExpensePlotMonth classes.
+    side : DeltaGenerator, optional
+        The place where the plot should be inserted. Defaults to the current container.
+    **kwargs
+        Additional keyword arguments forwarded to st.plotly_chart (for instance, theme).
+
+    Returns
+    -------
+    DeltaGenerator
+        The Streamlit element of the plot.
+    """
+    side = st if side is None else side
+    # use_container_width is deprecated: width="stretch" gives the same layout
+    kwargs.setdefault("width", "stretch")
+    return side.plotly_chart(fig, **kwargs)
+
+
+@profiled()
+def display_transactions(result: TransactionPage, side: Optional[DeltaGenerator] = None) -> None:
+    """
+    Displays a page of transactions: the table only holds the rows of the page, and the caption
+    tells where the page is among all the transactions.
+
+    Parameters
+    ----------
+    result : TransactionPage
+        The page built by TransactionIndex.page.
+    side : DeltaGenerator, optional
+        The place where the transactions should be inserted. Defaults to the current container.
+    """
+    side = st if side is None else side
+    side.markdown(f"**{result.title}**")
+    if result.total_rows == 0:
+        side.caption("No transactions.")
+        return
+    side.dataframe(result.frame, hide_index=True, width="stretch")
+    last_row = result.first_row + len(result.frame) - 1
+    side.caption(
+        f"Transactions {result.first_row}-{last_row} of {result.total_rows} "
+        f"(page {result.page} of {result.pages}), for a total of {result.total_value}."
+    )
+
+
+def display_profiling_panel(profiler: Profiler, side: Optional[DeltaGenerator] = None) -> None:
+    """
+    Displays the per-rerun breakdown collected by the profiler: the time (and, if traced, the memory
+    peak) of each hot path and the hit rate of the caches.
+
+    Parameters
+    ----------
+    profiler : Profiler
+        The profiler of the current rerun.
+    side : DeltaGenerator, optional
+        The place where the panel should be inserted. Defaults to the current container.
+    """
+    side = st if side is None else side
+    with side.expander("Profiling", expanded=True):
+        st.caption(f"Rerun {profiler.rerun}: {profiler.total_seconds():.3f} s in total")
+        summary = profiler.summary()
+        if not profiler.track_allocations:
+            summary = summary.drop(columns=["peak_kib"])
+        st.dataframe(summary, hide_index=True)
+
+        cache_hit_rates = profiler.cache_hit_rates()
+        if cache_hit_rates:
+            st.dataframe(
+                {
+                    "cache": list(cache_hit_rates.keys()),
+                    "hit_rate": [round(rate, 2) for rate in cache_hit_rates.values()],
+                },
+                hide_index=True,
+            )
+        else:
+            st.caption("No cache lookups in this rerun.")
+
+
+@st.fragment(run_every=0.5)
+def display_ingestion_progress(
+    job: IngestionJob, on_cancel: Optional[Callable[[], None]] = None
+) -> None:
+    """
+    Displays the progress of the ingestion and the totals per category of the rows parsed so far.
+
+    The fragment refreshes itself every half a second, without holding the script thread,
+    and reruns the whole app once the job is done.
+
+    Parameters
+    ----------
+    job : IngestionJob
+        The job parsing the uploaded file in the background.
+    on_cancel : Optional[Callable[[], None]], optional
+        Called when the upload is cancelled, such as to stop waiting for a job shared with other
+        sessions. Defaults to None: the job is cancelled.
+    """
+    if job.done:
+        st.rerun()
+
+    st.progress(job.progress, text=f"Parsing the file: {job.aggregates.rows} rows so far...")
+    partial_category_totals = job.partial_category_totals()
+    if not partial_category_totals.empty:
+        st.caption("Expenses per category in the rows parsed so far")
+        st.bar_chart(partial_category_totals)
+
+    if st.button("Cancel"):
+        (on_cancel or job.cancel)()
+        st.rerun()
@@ -0,0 +1,87 @@
+"""
+This script contains the typed result objects returned by the computation layer
+(metrics_dataclasses.py and plots_dataclasses.py).
+
+The results only hold plain numbers and small, already aggregated dataframes: they can be
+cached, compared in the tests and benchmarked without importing Streamlit. Drawing them is
+the job of the rendering layer (render.py).
+"""
+
+# --- Import packages --- #
+import pandas as pd
+from dataclasses import dataclass, field
+from typing import Optional
+
+
+@dataclass(frozen=True)
+class MetricResult:
+    """
+    The numbers behind a single metric card.
+
+    Attributes:
+        label (str): Label of the metric.
+        value (Optional[float]): Value shown in the metric. None when there is no data.
+        delta (Optional[float]): Change compared to the reference period. Default is None.
+        delta_color (str): Color indicator for the delta value. Default is 'normal'.
+        help_text (Optional[str]): Tooltip text of the metric. Default is None.
+    """
+
+    label: str
+    value: Optional[float]
+    delta: Optional[float] = None
+    delta_color: str = "normal"
+    help_text: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class AggregateResult:
+    """
+    An aggregated dataframe ready to be turned into a chart.
+
+    Attributes:
+        frame (pd.DataFrame): The aggregated data (for instance, the sum of the values per category).
+        title (str): Title of the chart built from the data. Default is ''.
+    """
+
+    frame: pd.DataFrame
+    title: str = ""
+
+
+@dataclass(frozen=True)
+class WaterfallResult:
+    """
+    The bars of the monthly waterfall breakdown.
+
+    Attributes:
+        labels (list[str]): Label of each bar, the last one being the remaining income.
+        values (list[float]): Income as a positive value, expenses as negative values, 0 for the total.
+        annotation (list[float]): Text shown on top of each bar.
+    """
+
+    labels: list[str]
+    values: list[float]
+    annotation: list[float] = field(default_factory=list)
+
+
+@dataclass(frozen=True)
+class TransactionPage:
+    """
+    A page of the transactions behind a bar of a chart.
+
+    Attributes:
+        frame (pd.DataFrame): The transactions of the page.
+        page (int): The page, from 1.
+        pages (int): Number of pages.
+        first_row (int): Number of the first transaction of the page, from 1 (0 if there is none).
+        total_rows (int): Number of transactions of every page.
+        total_value (float): Sum of the values of the transactions of every page.
+        title (str): Title of the transactions. Default is ''.
+    """
+
+    frame: pd.DataFrame
+    page: int
+    pages: int
+    first_row: int
+    total_rows: int
+    total_value: float
+    title: str = ""
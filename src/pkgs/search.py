@@ -0,0 +1,291 @@
+"""
+This script contains the full-text search of the ledger, over the stores, the expense types
+and the cities, such as "lidl or billa in vienna over 50 in 2024".
+
+The search is backed by an inverted index, built once per ledger: each distinct value of a
+column is split into words, and each word points to the rows of the values it appears in. A
+ledger has few distinct stores, types and cities for many rows, so the words are looked up in a
+small sorted vocabulary (a word of the query matches every word it is the start of, such as
+"bill" for "billa"), and the rows of a value are a slice of the rows sorted by value. No string
+column is scanned at query time: the matches are unions and intersections of sorted row numbers.
+"""
+
+# --- Import packages --- #
+import bisect
+import re
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass, field
+from typing import Optional
+from .profiling import profiled
+
+# the columns searched, and the words of the query restricted to each column
+SEARCH_COLUMNS = ["store", "expense_type", "city"]
+# words of the query that only make the sentence readable
+STOP_WORDS = {"all", "and", "at", "the", "than", "more", "less", "euro", "eur"}
+# words of the query that introduce a bound on the value
+MIN_VALUE_WORDS = {"over", "above", ">", ">="}
+MAX_VALUE_WORDS = {"under", "below", "<", "<="}
+
+_WORD = re.compile(r"[<>]=?|\d+(?:[.,]\d+)?|\w+", re.UNICODE)
+
+
+def _words(text: str) -> list[str]:
+    return _WORD.findall(str(text).casefold())
+
+
+def _is_year(word: str) -> bool:
+    return word.isdigit() and len(word) == 4
+
+
+def _number(word: Optional[str]) -> Optional[float]:
+    try:
+        return float(word.replace(",", "."))
+    except (AttributeError, ValueError):
+        return None
+
+
+@dataclass(frozen=True)
+class SearchQuery:
+    """
+    A parsed search query: the rows must match every group of words, and the filters.
+
+    Attributes:
+        groups (list[list[tuple[str, Optional[str]]]]): The groups of words, such as
+            [[("lidl", None), ("billa", None)], [("vienna", "city")]] for "lidl or billa in vienna":
+            a row matches a group if it matches one of its words, in the column given (None for
+            any of the SEARCH_COLUMNS).
+        years (list[int]): The years of the rows, if any. Default is [] (every year).
+        min_value (Optional[float]): The rows must be over this value. Default is None.
+        max_value (Optional[float]): The rows must be under this value. Default is None.
+    """
+
+    groups: list[list[tuple[str, Optional[str]]]] = field(default_factory=list)
+    years: list[int] = field(default_factory=list)
+    min_value: Optional[float] = None
+    max_value: Optional[float] = None
+
+
+def parse_query(text: str) -> SearchQuery:
+    """
+    Parses a search query, such as "all lidl or billa in vienna over 50 in 2024".
+
+    The words are matched with the stores, the expense types and the cities; "or" joins two
+    words, the other words must all match. "in" is followed by a city or a year, "over"/"above"
+    and "under"/"below" by a value. The case does not matter.
+
+    Parameters
+    ----------
+    text : str
+        The query typed by the user.
+
+    Returns
+    -------
+    SearchQuery
+        The parsed query.
+
+    Raises
+    ------
+    ValueError
+        If "over", "under" (and so on) is not followed by a number, or "in" by anything.
+    """
+    words = [word for word in _words(text) if word not in STOP_WORDS]
+    groups, years = [], []
+    min_value = max_value = None
+    join = False
+    position = 0
+    while position < len(words):
+        word = words[position]
+        following = words[position + 1] if position + 1 < len(words) else None
+        position += 1
+        if word == "or":
+            join = bool(groups)
+            continue
+        if word in MIN_VALUE_WORDS or word in MAX_VALUE_WORDS:
+            value = _number(following)
+            if value is None:
+                raise ValueError(f'"{word}" must be followed by a number, such as "{word} 50".')
+            if word in MIN_VALUE_WORDS:
+                min_value = value
+            else:
+                max_value = value
+            position += 1
+            continue
+        column = None
+        if word == "in":
+            if following is None:
+                raise ValueError('"in" must be followed by a city or a year, such as "in 2024".')
+            word, column = following, "city"
+            position += 1
+        if _is_year(word):
+            years.append(int(word))
+            continue
+        if join:
+            groups[-1].append((word, column))
+        else:
+            groups.append([(word, column)])
+        join = False
+    return SearchQuery(groups=groups, years=years, min_value=min_value, max_value=max_value)
+
+
+def _union(rows: list[np.ndarray], size: int) -> np.ndarray:
+    # sorted row numbers of any of the lists, each sorted: marked in a mask instead of sorted
+    rows = [part for part in rows if part.size]
+    if len(rows) <= 1:
+        return rows[0] if rows else np.array([], dtype=np.int64)
+    mask = np.zeros(size, dtype=bool)
+    for part in rows:
+        mask[part] = True
+    return np.flatnonzero(mask)
+
+
+@dataclass
+class _ColumnIndex:
+    # the words of the distinct values, sorted, and the codes of the values of each word
+    words: list[str]
+    values: list[np.ndarray]
+    # the rows sorted by value code: the rows of the value c are order[offsets[c]:offsets[c + 1]]
+    order: np.ndarray
+    offsets: np.ndarray
+
+    @classmethod
+    def from_series(cls, column: pd.Series) -> "_ColumnIndex":
+        codes, uniques = pd.factorize(column)
+        postings: dict[str, list[int]] = {}
+        for code, value in enumerate(uniques):
+            for word in set(_words(value)):
+                postings.setdefault(word, []).append(code)
+        words = sorted(postings)
+        indexed = np.flatnonzero(codes >= 0)
+        # stable: the rows of a value stay in ledger order
+        order = indexed[np.argsort(codes[indexed], kind="stable")]
+        offsets = np.concatenate(
+            [[0], np.cumsum(np.bincount(codes[indexed], minlength=len(uniques)))]
+        )
+        return cls(
+            words=words,
+            values=[np.array(postings[word]) for word in words],
+            order=order,
+            offsets=offsets,
+        )
+
+    def rows(self, prefix: str, size: int) -> np.ndarray:
+        # the words starting with the prefix are a range of the sorted words
+        start = bisect.bisect_left(self.words, prefix)
+        stop = bisect.bisect_left(self.words, prefix + "\uffff")
+        if start == stop:
+            return np.array([], dtype=np.int64)
+        codes = np.unique(np.concatenate(self.values[start:stop]))
+        return _union(
+            [self.order[self.offsets[code] : self.offsets[code + 1]] for code in codes], size
+        )
+
+
+@dataclass
+class SearchIndex:
+    """
+    A class to search the ledger by store, expense type and city, without scanning it.
+
+    Attributes:
+        columns (dict[str, _ColumnIndex]): The inverted index of each searched column of the ledger.
+        years (np.ndarray): The year of each row, 0 for the rows without a date.
+        values (np.ndarray): The value of each row.
+
+    Methods:
+        from_dataframe(df):
+            Builds the index of a ledger.
+        search(query):
+            Returns the rows matching a query, parsed or not.
+    """
+
+    columns: dict[str, _ColumnIndex]
+    years: np.ndarray
+    values: np.ndarray
+
+    @classmethod
+    @profiled()
+    def from_dataframe(cls, df: pd.DataFrame) -> "SearchIndex":
+        """
+        Builds the inverted index of the stores, expense types and cities of a ledger.
+
+        Parameters
+        ----------
+        df : pd.DataFrame
+            The expenses.
+
+        Returns
+        -------
+        SearchIndex
+            The index of the ledger.
+        """
+        return cls(
+            columns={
+                column: _ColumnIndex.from_series(df[column])
+                for column in SEARCH_COLUMNS
+                if column in df.columns
+            },
+            years=df["date"].dt.year.fillna(0).to_numpy(dtype=np.int64),
+            values=df["value"].to_numpy(dtype=np.float64),
+        )
+
+    def _word_rows(self, word: str, column: Optional[str]) -> np.ndarray:
+        columns = list(self.columns) if column is None else [column]
+        # a row may match the same word in its store and in its type: counted once
+        return _union(
+            [
+                self.columns[name].rows(word, len(self.values))
+                for name in columns
+                if name in self.columns
+            ],
+            len(self.values),
+        )
+
+    @profiled()
+    def search(self, query) -> np.ndarray:
+        """
+        Finds the rows matching a query.
+
+        Parameters
+        ----------
+        query : str or SearchQuery
+            The query typed by the user, or already parsed by parse_query.
+
+        Returns
+        -------
+        np.ndarray
+            The positions of the matching rows in the ledger, in ledger order.
+
+        Raises
+        ------
+        ValueError
+            If the query cannot be parsed, see parse_query.
+        """
+        if isinstance(query, str):
+            query = parse_query(query)
+
+        size = len(self.values)
+        groups = sorted(
+            (
+                _union([self._word_rows(word, column) for word, column in group], size)
+                for group in query.groups
+            ),
+            key=len,
+        )
+        # the rarest group first: the rows kept only get fewer, and are checked in a mask
+        rows = groups[0] if groups else np.arange(size)
+        for group_rows in groups[1:]:
+            if rows.size == 0:
+                break
+            mask = np.zeros(size, dtype=bool)
+            mask[group_rows] = True
+            rows = rows[mask[rows]]
+
+        # the filters are only checked on the rows matching the words
+        keep = np.ones(len(rows), dtype=bool)
+        if query.years:
+            keep &= np.isin(self.years[rows], query.years)
+        if query.min_value is not None:
+            keep &= self.values[rows] > query.min_value
+        if query.max_value is not None:
+            keep &= self.values[rows] < query.max_value
+        return rows[keep]
@@ -0,0 +1,203 @@
+"""
+This script contains the SQL query backend of the dashboard.
+
+The ledger is loaded once into an embedded database running in the same process: DuckDB when it is
+installed (a columnar, multi-threaded analytical engine), otherwise SQLite from the standard library.
+The aggregations behind ExpenseMetric, ExpensePlot and ExpensePlotMonth are then pushed down to the
+database as SQL queries, and only their (small) results come back as pandas objects.
+"""
+
+# --- Import packages --- #
+import datetime
+import sqlite3
+import threading
+import pandas as pd
+from dataclasses import dataclass, field
+from typing import Any, Optional
+from .global_vars import NON_EXPENSE_CATEGORIES
+
+try:
+    import duckdb
+except ImportError:  # optional dependency: fall back to SQLite
+    duckdb = None
+
+# columns of the ledger loaded into the database
+SQL_COLUMNS = ["expense_category", "expense_type", "value", "store", "city", "year", "month"]
+
+# the dates are stored as the number of days since 1970-01-01: the same integer
+# parameters work with every engine, and comparing integers is as fast as it gets
+_EPOCH = datetime.date(1970, 1, 1)
+
+# filter keeping only the expenses, with one placeholder per non-expense category
+# the rows without a category are expenses, as for pandas: NOT IN alone would drop them (NULL)
+_EXPENSES_ONLY = (
+    "(expense_category IS NULL OR expense_category NOT IN "
+    f"({', '.join('?' * len(NON_EXPENSE_CATEGORIES))}))"
+)
+
+
+def _day_number(date: datetime.date) -> int:
+    return (date - _EPOCH).days
+
+
+@dataclass
+class SQLBackend:
+    """
+    A class to compute the aggregations of the dashboard as SQL queries on an embedded database.
+
+    Attributes:
+        connection (Any): The connection to the in-process database, holding the "expenses" table.
+        engine (str): Either "duckdb" or "sqlite".
+
+    Methods:
+        from_dataframe(df, engine):
+            Loads the ledger into a new in-process database.
+        total_expenses(past_date, today_date):
+            Sum of the expenses between two dates.
+        total_expenses_per_category(past_date, today_date, category):
+            Sum of the values of a category between two dates.
+        total_income(past_date, today_date):
+            Sum of the income between two dates.
+        total_expenses_month(year, month):
+            Sum of the expenses in a month.
+        category_totals(past_date, today_date), store_totals(past_date, today_date):
+            Sum of the expenses per category (per store) between two dates.
+        month_category_totals(year, month, expenses_only):
+            Sum of the values per category in a month.
+        year_category_totals(year):
+            Sum of the expenses per category and month in a year.
+    """
+
+    connection: Any
+    engine: str
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame, engine: Optional[str] = None) -> "SQLBackend":
+        """
+        Loads the ledger into a new in-process database.
+
+        The data is copied into the database, so the pandas dataframe is not needed by the queries.
+
+        Parameters
+        ----------
+        df : pd.DataFrame
+            The expenses, with the 'date' column parsed as datetime and the calendar columns.
+        engine : str, optional
+            Either "duckdb" or "sqlite". Defaults to DuckDB if it is installed, otherwise SQLite.
+
+        Returns
+        -------
+        SQLBackend
+            The backend, ready to be queried.
+        """
+        engine = engine if engine is not None else ("duckdb" if duckdb is not None else "sqlite")
+        # the rows without a date (malformed in the file) are left out of every total, as in pandas
+        df = df[df["date"].notna()]
+        table = df[SQL_COLUMNS].astype({"year": "int64", "month": "int64"})
+        table.insert(0, "day", df["date"].to_numpy().astype("datetime64[D]").astype("int64"))
+        table["months_text"] = df["months_text"].astype(str)
+
+        if engine == "duckdb":
+            if duckdb is None:
+                raise ImportError("The duckdb package is needed to use the DuckDB engine.")
+            connection = duckdb.connect(":memory:")
+            connection.register("expenses_df", table)
+            connection.execute("CREATE TABLE expenses AS SELECT * FROM expenses_df")
+            connection.unregister("expenses_df")
+        else:
+            # the queries may come from any of the threads running the Streamlit sessions
+            connection = sqlite3.connect(":memory:", check_same_thread=False)
+            table.to_sql("expenses", connection, index=False)
+            # DuckDB does not need indexes, SQLite uses them to avoid scanning the whole table
+            connection.execute("CREATE INDEX expenses_day ON expenses (day)")
+            connection.execute("CREATE INDEX expenses_year_month ON expenses (year, month)")
+
+        return cls(connection=connection, engine=engine)
+
+    def _query(self, sql: str, parameters: list) -> list[tuple]:
+        # the connections are not safe to be used by several threads at the same time
+        with self._lock:
+            return self.connection.execute(sql, parameters).fetchall()
+
+    def _scalar(self, sql: str, parameters: list) -> float:
+        return self._query(sql, parameters)[0][0]
+
+    def _frame(self, sql: str, parameters: list, columns: list[str]) -> pd.DataFrame:
+        frame = pd.DataFrame(self._query(sql, parameters), columns=columns)
+        # as with the pandas groupby, the rows without a category (or store) are not a group
+        return frame.dropna(subset=columns[:-1]).reset_index(drop=True)
+
+    def total_expenses(self, past_date: datetime.date, today_date: datetime.date) -> float:
+        """Sum of the expenses between two dates, both included, excluding the non-expense categories."""
+        return self._scalar(
+            f"SELECT COALESCE(SUM(value), 0) FROM expenses WHERE day BETWEEN ? AND ? AND {_EXPENSES_ONLY}",
+            [_day_number(past_date), _day_number(today_date), *NON_EXPENSE_CATEGORIES],
+        )
+
+    def total_expenses_per_category(
+        self, past_date: datetime.date, today_date: datetime.date, category: str
+    ) -> Optional[float]:
+        """Sum of the values of a category between two dates, both included. None if the category has no data."""
+        return self._scalar(
+            "SELECT SUM(value) FROM expenses WHERE day BETWEEN ? AND ? AND expense_category = ?",
+            [_day_number(past_date), _day_number(today_date), category],
+        )
+
+    def total_income(self, past_date: datetime.date, today_date: datetime.date) -> float:
+        """Sum of the income between two dates, both included."""
+        return self._scalar(
+            "SELECT COALESCE(SUM(value), 0) FROM expenses "
+            "WHERE day BETWEEN ? AND ? AND expense_category = 'income'",
+            [_day_number(past_date), _day_number(today_date)],
+        )
+
+    def total_expenses_month(self, year: int, month: int) -> float:
+        """Sum of the expenses in a month, excluding the non-expense categories."""
+        return self._scalar(
+            f"SELECT COALESCE(SUM(value), 0) FROM expenses WHERE year = ? AND month = ? AND {_EXPENSES_ONLY}",
+            [int(year), int(month), *NON_EXPENSE_CATEGORIES],
+        )
+
+    def category_totals(self, past_date: datetime.date, today_date: datetime.date) -> pd.DataFrame:
+        """Sum of the expenses per category between two dates, with the columns "expense_category" and "value"."""
+        return self._frame(
+            "SELECT expense_category, SUM(value) FROM expenses "
+            f"WHERE day BETWEEN ? AND ? AND {_EXPENSES_ONLY} "
+            "GROUP BY expense_category ORDER BY expense_category",
+            [_day_number(past_date), _day_number(today_date), *NON_EXPENSE_CATEGORIES],
+            columns=["expense_category", "value"],
+        )
+
+    def store_totals(self, past_date: datetime.date, today_date: datetime.date) -> pd.DataFrame:
+        """Sum of the expenses per store between two dates, with the columns "store" and "value"."""
+        return self._frame(
+            "SELECT store, SUM(value) FROM expenses "
+            f"WHERE day BETWEEN ? AND ? AND {_EXPENSES_ONLY} "
+            "GROUP BY store ORDER BY store",
+            [_day_number(past_date), _day_number(today_date), *NON_EXPENSE_CATEGORIES],
+            columns=["store", "value"],
+        )
+
+    def month_category_totals(
+        self, year: int, month: int, expenses_only: bool = True
+    ) -> pd.DataFrame:
+        """Sum of the values per category in a month, with the columns "expense_category" and "value"."""
+        expenses_filter = f"AND {_EXPENSES_ONLY} " if expenses_only else ""
+        return self._frame(
+            "SELECT expense_category, SUM(value) FROM expenses "
+            f"WHERE year = ? AND month = ? {expenses_filter}"
+            "GROUP BY expense_category ORDER BY expense_category",
+            [int(year), int(month), *(NON_EXPENSE_CATEGORIES if expenses_only else [])],
+            columns=["expense_category", "value"],
+        )
+
+    def year_category_totals(self, year: int) -> pd.DataFrame:
+        """Sum of the expenses per category and month, with the columns "expense_category", "months_text" and "value"."""
+        return self._frame(
+            "SELECT expense_category, months_text, SUM(value) FROM expenses "
+            f"WHERE year = ? AND {_EXPENSES_ONLY} "
+            "GROUP BY expense_category, month, months_text ORDER BY expense_category, month",
+            [int(year), *NON_EXPENSE_CATEGORIES],
+            columns=["expense_category", "months_text", "value"],
+        )
@@ -0,0 +1,222 @@
+"""
+This script contains the validation of the uploaded ledger, before and while it is parsed.
+
+Before the full parse, the header and a sample of the first rows are checked: a missing column,
+or a 'value' (date) column without a single number (date) in the sample, fails at once with a
+SchemaError, instead of deep inside the metrics or the plots after the whole file has been read.
+While the file is parsed, the types are coerced in bulk, chunk by chunk: the malformed values
+become missing values and are listed in a ValidationReport, with their line in the file. A chunk
+whose values are already numbers (the common case) is not coerced at all.
+"""
+
+# --- Import packages --- #
+import io
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass, field
+from typing import Optional
+
+# columns every ledger must have; the categories may be filled in by the categorization rules
+REQUIRED_COLUMNS = ["date", "value", "store"]
+CATEGORY_COLUMNS = ["expense_category", "expense_type"]
+# number of rows read to check the file before the full parse
+SAMPLE_ROWS = 1_000
+
+
+class SchemaError(ValueError):
+    """The uploaded file does not have the columns, or the types, of a ledger."""
+
+
+@dataclass
+class ValidationReport:
+    """
+    A class to collect the malformed values of a ledger, chunk by chunk.
+
+    Attributes:
+        counts (dict[str, int]): Number of malformed values per column.
+        max_rows (int): Most malformed values listed, the other ones are only counted. Default is 1000.
+        line_offset (int): Line of the file of the first row parsed, minus 2 (the header and the
+            numbering from 1): not 0 when only the rows appended to a previous version are parsed.
+
+    Methods:
+        add(column, values, malformed):
+            Records the malformed values of a column of a chunk.
+        frame():
+            Returns the malformed values listed, with their line, column, value and problem.
+    """
+
+    counts: dict[str, int] = field(default_factory=dict)
+    max_rows: int = 1_000
+    line_offset: int = 0
+    _rows: list[pd.DataFrame] = field(default_factory=list)
+    _listed: int = 0
+
+    @property
+    def total(self) -> int:
+        """Number of malformed values of the ledger."""
+        return sum(self.counts.values())
+
+    def add(self, column: str, values: pd.Series, malformed: np.ndarray, problem: str) -> None:
+        """
+        Records the malformed values of a column of a chunk.
+
+        Parameters
+        ----------
+        column : str
+            The name of the column.
+        values : pd.Series
+            The values of the column, as read from the file, indexed by row number.
+        malformed : np.ndarray
+            One boolean per value, True for the malformed ones.
+        problem : str
+            What is wrong with the values, such as "not a number".
+        """
+        count = int(malformed.sum())
+        if count == 0:
+            return
+        self.counts[column] = self.counts.get(column, 0) + count
+        listed = values.loc[malformed].iloc[: max(self.max_rows - self._listed, 0)]
+        if listed.empty:
+            return
+        self._rows.append(
+            pd.DataFrame(
+                {
+                    "line": listed.index.to_numpy() + self.line_offset + 2,
+                    "column": column,
+                    "value": listed.astype(str).to_numpy(),
+                    "problem": problem,
+                }
+            )
+        )
+        self._listed += len(listed)
+
+    def frame(self) -> pd.DataFrame:
+        """The malformed values listed, by line of the file."""
+        if not self._rows:
+            return pd.DataFrame(columns=["line", "column", "value", "problem"])
+        return pd.concat(self._rows, ignore_index=True).sort_values(by="line", ignore_index=True)
+
+
+def coerce_values(values: pd.Series) -> tuple[pd.Series, np.ndarray]:
+    """
+    Coerces the 'value' column into floats, vectorized. Strings with a decimal comma are accepted.
+
+    Parameters
+    ----------
+    values : pd.Series
+        The values, as read from the file.
+
+    Returns
+    -------
+    tuple[pd.Series, np.ndarray]
+        The values as float64, NaN where malformed; and one boolean per value, True where malformed.
+    """
+    if pd.api.types.is_numeric_dtype(values):
+        # the common path: read as numbers by the parser, nothing to check
+        return values.astype(np.float64), np.zeros(len(values), dtype=bool)
+    text = values.astype("string").str.strip().str.replace(",", ".", regex=False)
+    coerced = pd.to_numeric(text, errors="coerce").astype(np.float64)
+    return coerced, (values.notna() & coerced.isna()).to_numpy()
+
+
+def check_sample(sample: pd.DataFrame, categorized: bool = False) -> None:
+    """
+    Checks the header and the first rows of a ledger, before the full parse.
+
+    Parameters
+    ----------
+    sample : pd.DataFrame
+        The first rows of the file, read as strings.
+    categorized : bool, optional
+        True if the missing categories are filled in by categorization rules. Defaults to False.
+
+    Raises
+    ------
+    SchemaError
+        If a required column is missing, or if the 'value' or 'date' column has no valid value
+        in the sample, as when the columns are swapped or the separator is not ";".
+    """
+    required = REQUIRED_COLUMNS + ([] if categorized else CATEGORY_COLUMNS)
+    missing = [column for column in required if column not in sample.columns]
+    if missing:
+        found = ", ".join(map(str, sample.columns[:10]))
+        raise SchemaError(
+            f"Missing column(s) {', '.join(missing)}. The columns found are: {found}. "
+            "The columns must be separated by a semicolon (;)."
+        )
+
+    values = sample["value"].dropna()
+    if not values.empty and coerce_values(values)[1].all():
+        raise SchemaError(
+            f"The 'value' column has no number in the first {len(sample)} rows, "
+            f"such as {values.iloc[0]!r}."
+        )
+    dates = sample["date"].dropna()
+    if not dates.empty and pd.to_datetime(dates, dayfirst=True, errors="coerce").isna().all():
+        raise SchemaError(
+            f"The 'date' column has no date (dd/mm/yyyy) in the first {len(sample)} rows, "
+            f"such as {dates.iloc[0]!r}."
+        )
+
+
+def check_csv_sample(buffer: io.BytesIO, categorized: bool = False) -> None:
+    """
+    Reads the header and the first SAMPLE_ROWS rows of a .csv file, and checks them.
+
+    The buffer is rewound, to be parsed from the start afterwards.
+
+    Parameters
+    ----------
+    buffer : io.BytesIO
+        The content of the uploaded file.
+    categorized : bool, optional
+        True if the missing categories are filled in by categorization rules. Defaults to False.
+
+    Raises
+    ------
+    SchemaError
+        See check_sample.
+    """
+    position = buffer.tell()
+    try:
+        sample = pd.read_csv(buffer, sep=";", nrows=SAMPLE_ROWS, dtype=str)
+    except pd.errors.EmptyDataError:
+        raise SchemaError("The file is empty.") from None
+    finally:
+        buffer.seek(position)
+    check_sample(sample, categorized)
+
+
+def malformed_dates(raw: pd.Series, parsed: pd.Series) -> np.ndarray:
+    """One boolean per date, True where a date was given but could not be parsed."""
+    return (raw.notna() & parsed.isna()).to_numpy()
+
+
+def coerce_chunk(
+    chunk: pd.DataFrame, report: Optional[ValidationReport], optional_columns: list[str]
+) -> pd.DataFrame:
+    """
+    Coerces the 'value' column of a chunk in bulk, and adds the missing optional columns.
+
+    Parameters
+    ----------
+    chunk : pd.DataFrame
+        A chunk of the ledger, as read from the file.
+    report : Optional[ValidationReport]
+        Where to record the malformed values, if given.
+    optional_columns : list[str]
+        The columns added, as missing values, when the file does not have them.
+
+    Returns
+    -------
+    pd.DataFrame
+        The same chunk, with 'value' as float64.
+    """
+    raw = chunk["value"]
+    chunk["value"], malformed = coerce_values(raw)
+    if report is not None:
+        report.add("value", raw, malformed, "not a number")
+    for column in optional_columns:
+        if column not in chunk.columns:
+            chunk[column] = pd.Series(np.nan, index=chunk.index, dtype="object")
+    return chunk
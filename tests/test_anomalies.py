@@ -0,0 +1,123 @@
+"""
+Script to test the anomalies.py detection of the unusual spending.
+"""
+
+import unittest
+import numpy as np
+import pandas as pd
+from datetime import date
+from src.pkgs.aggregates import ExpenseAggregates
+from src.pkgs.metrics_dataclasses import ExpenseMetric
+
+
+class TestAnomalies(unittest.TestCase):
+    """
+    Test the SpendingAnomalies class, flagging the days and transactions far above the usual ones.
+
+    Methods
+    -------
+
+    test_flag_spike()
+        Test that a single large expense is flagged, as a day and as a transaction.
+
+    test_incremental_update()
+        Test that ingesting the ledger in chunks gives the same result as all at once.
+
+    test_reversed_chunks()
+        Test that a ledger from the newest rows, in chunks, gives the same result as in order.
+
+    test_compute_anomalies()
+        Test the number of unusual days and transactions of a timeframe.
+    """
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        days = pd.date_range(start="2024-01-01", periods=60, freq="D")
+        values = rng.normal(20.0, 2.0, len(days))
+        # a single expense five times higher than the usual groceries
+        values[40] = 100.0
+        self.df = pd.DataFrame(
+            {
+                "date": days,
+                "expense_category": "food",
+                "expense_type": "grocery",
+                "value": values,
+                "store": "lidl",
+            }
+        )
+
+    def test_flag_spike(self):
+        """Assert if only the day and the transaction of the large expense are flagged."""
+        # 1.ARRANGE
+        aggregates = ExpenseAggregates()
+
+        # 2.ACT
+        aggregates.update(self.df)
+        days = aggregates.anomalies.days_between(date(2024, 1, 1), date(2024, 2, 29))
+        transactions = aggregates.anomalies.transactions_between(
+            date(2024, 1, 1), date(2024, 2, 29)
+        )
+
+        # 3.ASSERT
+        self.assertEqual(days["date"].tolist(), [pd.Timestamp("2024-02-10")])
+        return self.assertEqual(transactions["value"].tolist(), [100.0])
+
+    def test_incremental_update(self):
+        """Assert if the state after two chunks is the state after the whole ledger."""
+        # 1.ARRANGE
+        whole, chunked = ExpenseAggregates(), ExpenseAggregates()
+
+        # 2.ACT
+        whole.update(self.df)
+        chunked.update(self.df.iloc[:30])
+        chunked.update(self.df.iloc[30:])
+        whole.anomalies.flush()
+        chunked.anomalies.flush()
+
+        # 3.ASSERT
+        pd.testing.assert_frame_equal(
+            chunked.anomalies._transaction_state, whole.anomalies._transaction_state
+        )
+        pd.testing.assert_frame_equal(chunked.anomalies._day_state, whole.anomalies._day_state)
+        return pd.testing.assert_frame_equal(chunked.anomalies.days, whole.anomalies.days)
+
+    def test_reversed_chunks(self):
+        """Assert if the chunks of a ledger sorted from the newest row are scored by date."""
+        # 1.ARRANGE
+        ordered, reversed_ = ExpenseAggregates(), ExpenseAggregates()
+        newest_first = self.df.iloc[::-1]
+
+        # 2.ACT
+        for start in range(0, len(self.df), 20):
+            ordered.update(self.df.iloc[start : start + 20])
+            reversed_.update(newest_first.iloc[start : start + 20])
+        ordered.anomalies.flush()
+        reversed_.anomalies.flush()
+
+        # 3.ASSERT
+        pd.testing.assert_frame_equal(
+            reversed_.anomalies._transaction_state, ordered.anomalies._transaction_state
+        )
+        pd.testing.assert_frame_equal(reversed_.anomalies._day_state, ordered.anomalies._day_state)
+        pd.testing.assert_frame_equal(
+            reversed_.anomalies.transactions.reset_index(drop=True),
+            ordered.anomalies.transactions.reset_index(drop=True),
+        )
+        return pd.testing.assert_frame_equal(reversed_.anomalies.days, ordered.anomalies.days)
+
+    def test_compute_anomalies(self):
+        """Assert if the unusual spending is only counted in the timeframe containing it."""
+        # 1.ARRANGE
+        aggregates = ExpenseAggregates()
+        aggregates.update(self.df)
+        february = ExpenseMetric(self.df, today_date=date(2024, 2, 29), past_date=date(2024, 2, 1))
+        january = ExpenseMetric(self.df, today_date=date(2024, 1, 31), past_date=date(2024, 1, 1))
+
+        # 2.ACT
+        unusual_days, unusual_transactions = february.compute_anomalies(aggregates.anomalies)
+        no_days, _ = january.compute_anomalies(aggregates.anomalies)
+
+        # 3.ASSERT
+        self.assertEqual(unusual_days.value, 1)
+        self.assertEqual(unusual_transactions.value, 1)
+        return self.assertEqual(no_days.value, 0)
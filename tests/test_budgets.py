@@ -0,0 +1,90 @@
+"""
+Script to test the budgets.py budget targets.
+"""
+
+import unittest
+import pandas as pd
+from datetime import date
+from src.pkgs.aggregates import ExpenseAggregates
+from src.pkgs.budgets import BudgetTargets, read_budgets
+from src.pkgs.metrics_dataclasses import ExpenseMetric
+
+# a target for every month, and a higher one for food in January 2024
+BUDGETS = b"""expense_category;budget;year;month
+food;300;;
+food;400;2024;1
+restaurant;100;;
+"""
+
+
+class TestBudgets(unittest.TestCase):
+    """
+    Test the BudgetTargets class, comparing the budgets with the monthly aggregates.
+
+    Methods
+    -------
+
+    test_targets()
+        Test that the most specific target of each category is used.
+
+    test_report()
+        Test the budget-vs-actual and the projection of a month in progress.
+
+    test_metric_budget_by_category()
+        Test the metric with the budget left for a category.
+    """
+
+    def setUp(self):
+        self.targets = BudgetTargets(read_budgets(BUDGETS, "csv"))
+        df = pd.DataFrame(
+            {
+                "date": pd.to_datetime(["2024-01-05", "2024-01-10", "2024-02-01", "2024-02-10"]),
+                "expense_category": ["food", "restaurant", "food", "food"],
+                "value": [100.0, 150.0, 60.0, 90.0],
+            }
+        )
+        self.aggregates = ExpenseAggregates()
+        self.aggregates.update(df)
+
+    def test_targets(self):
+        """Assert if a target for the month overrides the target for every month."""
+        # 1.ARRANGE & 2.ACT
+        january = self.targets.targets(2024, 1)
+        february = self.targets.targets(2024, 2)
+
+        # 3.ASSERT
+        self.assertEqual(january.to_dict(), {"food": 400.0, "restaurant": 100.0})
+        return self.assertEqual(february.to_dict(), {"food": 300.0, "restaurant": 100.0})
+
+    def test_report(self):
+        """Assert if the report of a past month and of a month in progress are right."""
+        # 1.ARRANGE
+        monthly = self.aggregates.monthly
+
+        # 2.ACT: January is over, February 2024 (29 days) is at its 10th day
+        january = self.targets.report(monthly, 2024, 1, as_of=date(2024, 2, 10))
+        february = self.targets.report(monthly, 2024, 2, as_of=date(2024, 2, 10))
+
+        # 3.ASSERT
+        january = january.frame.set_index("expense_category")
+        february = february.frame.set_index("expense_category")
+        self.assertEqual(january.loc["restaurant", "variance"], 50.0)
+        self.assertEqual(january.loc["restaurant", "projected_overspend"], 50.0)
+        self.assertEqual(january.loc["food", "burn_rate"], 0.25)
+        self.assertEqual(february.loc["food", "projected"], round(150.0 * 29 / 10, 2))
+        self.assertEqual(february.loc["food", "projected_overspend"], 135.0)
+        return self.assertEqual(february.loc["restaurant", "actual"], 0.0)
+
+    def test_metric_budget_by_category(self):
+        """Assert if the metric shows the budget left and the projected margin."""
+        # 1.ARRANGE
+        report = self.targets.report(self.aggregates.monthly, 2024, 2, as_of=date(2024, 2, 10))
+        metric = ExpenseMetric(df=pd.DataFrame())
+
+        # 2.ACT
+        result = metric.metric_budget_by_category(report, "food")
+
+        # 3.ASSERT
+        self.assertEqual(result.value, 150.0)
+        self.assertEqual(result.delta, -135.0)
+        return self.assertIsNone(metric.metric_budget_by_category(report, "transportation"))
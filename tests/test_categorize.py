@@ -0,0 +1,123 @@
+"""
+Script to test the categorize.py auto-categorization of the raw bank exports.
+"""
+
+import unittest
+import numpy as np
+import pandas as pd
+from src.pkgs.categorize import UNCATEGORIZED, CategoryRules, read_rules
+from src.pkgs.ingestion import IngestionJob
+
+RULES_DATA = (
+    b"match;pattern;expense_category;expense_type\n"
+    b"exact;ACME GmbH;income;salary\n"
+    b"contains;lidl;food;grocery\n"
+    b"regex;netflix|spotify;entertainment;subscription\n"
+    b"contains;shop;clothing;\n"
+)
+
+
+class TestCategorize(unittest.TestCase):
+    """
+    Test the CategoryRules class, filling the missing categories from the stores.
+
+    Methods
+    -------
+
+    test_categorize_store()
+        Test the exact, contains and regex rules, and the stores matching none of them.
+
+    test_categorize_store_separate_rules()
+        Test the regular expressions with global flags or groups, matched apart from the others.
+
+    test_categorize()
+        Test that only the rows without a category are filled, once per distinct store.
+
+    test_read_rules_invalid()
+        Test that a rules file with an unknown kind of match is rejected.
+
+    test_job_with_rules()
+        Test that a bank export without categories is categorized while being ingested.
+    """
+
+    def setUp(self):
+        self.rules = CategoryRules(read_rules(RULES_DATA, "csv"))
+
+    def test_categorize_store(self):
+        """Assert if each store gets the category of the first rule matching it."""
+        # 1.ARRANGE, 2.ACT & 3.ASSERT
+        self.assertEqual(self.rules.categorize_store("  acme   GMBH "), ("income", "salary"))
+        self.assertEqual(self.rules.categorize_store("POS LIDL 1234 WIEN"), ("food", "grocery"))
+        self.assertEqual(
+            self.rules.categorize_store("NETFLIX.COM"), ("entertainment", "subscription")
+        )
+        # a rule without a type gives the uncategorized type
+        self.assertEqual(self.rules.categorize_store("Shoe shop"), ("clothing", "other"))
+        return self.assertEqual(self.rules.categorize_store("unknown"), UNCATEGORIZED)
+
+    def test_categorize_store_separate_rules(self):
+        """Assert if the rules with a global flag or a backreference keep the order of the file."""
+        # 1.ARRANGE
+        data = (
+            b"match;pattern;expense_category;expense_type\n"
+            b"regex;(?i)billa;food;grocery\n"
+            b"contains;bill;home & living;bills\n"
+            b"regex;^(\\w)\\1;others;double\n"
+        )
+
+        # 2.ACT
+        rules = CategoryRules(read_rules(data, "csv"))
+
+        # 3.ASSERT
+        self.assertEqual(rules.categorize_store("BILLA 123"), ("food", "grocery"))
+        self.assertEqual(rules.categorize_store("Phone bill"), ("home & living", "bills"))
+        return self.assertEqual(rules.categorize_store("ssd store"), ("others", "double"))
+
+    def test_categorize(self):
+        """Assert if the rows with a category keep it, and the other ones get it from their store."""
+        # 1.ARRANGE
+        df = pd.DataFrame(
+            {
+                "expense_category": ["home & living", np.nan, np.nan, np.nan],
+                "expense_type": ["rent", np.nan, "cinema", np.nan],
+                "store": ["lidl", "lidl", "Spotify", np.nan],
+            }
+        )
+
+        # 2.ACT
+        result = self.rules.categorize(df)
+
+        # 3.ASSERT
+        self.assertEqual(
+            result["expense_category"].tolist(), ["home & living", "food", "entertainment", "other"]
+        )
+        self.assertEqual(result["expense_type"].tolist(), ["rent", "grocery", "cinema", "other"])
+        # every distinct store is remembered for the next chunks
+        return self.assertEqual(set(self.rules._memo), {"lidl", "Spotify"})
+
+    def test_read_rules_invalid(self):
+        """Assert if an unknown kind of match raises a ValueError."""
+        # 1.ARRANGE
+        data = b"match;pattern;expense_category;expense_type\nfuzzy;lidl;food;grocery\n"
+
+        # 2.ACT & 3.ASSERT
+        with self.assertRaises(ValueError):
+            read_rules(data, "csv")
+
+    def test_job_with_rules(self):
+        """Assert if the categories found by the rules are in the result and the aggregates."""
+        # 1.ARRANGE
+        data = b"date;value;store\n01/06/2024;3000;ACME GmbH\n02/06/2024;20;Lidl\n03/06/2024;12;Netflix\n"
+        job = IngestionJob(data, "csv", rules=self.rules)
+
+        # 2.ACT
+        job.start().wait(timeout=30)
+
+        # 3.ASSERT
+        self.assertIsNone(job.error)
+        self.assertEqual(
+            job.result()["expense_category"].tolist(), ["income", "food", "entertainment"]
+        )
+        return self.assertEqual(
+            job.partial_category_totals().to_dict(), {"food": 20.0, "entertainment": 12.0}
+        )
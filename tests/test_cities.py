@@ -0,0 +1,88 @@
+"""
+Script to test the cities.py rollup of the expenses per day and city.
+"""
+
+import datetime
+import unittest
+import pandas as pd
+from src.pkgs.cities import CityRollup
+
+
+class TestCityRollup(unittest.TestCase):
+    """
+    Test the CityRollup class, filled chunk by chunk while ingesting.
+
+    Methods
+    -------
+
+    test_city_totals()
+        Test that the expenses per city of a month are those of the ledger, without the income.
+
+    test_travel_periods()
+        Test that a trip ends with a day at home, or with a long gap, and is attributed to its city.
+    """
+
+    def setUp(self):
+        self.df = pd.DataFrame(
+            {
+                "date": pd.to_datetime(
+                    [
+                        "2024-01-01",
+                        "2024-01-02",
+                        "2024-01-04",
+                        "2024-01-05",
+                        "2024-01-06",
+                        "2024-01-07",
+                        "2024-02-01",
+                        "2024-02-02",
+                        "2024-02-10",
+                    ]
+                ),
+                "expense_category": ["food"] * 8 + ["income"],
+                "value": [10.0, 20.0, 30.0, 40.0, 50.0, 60.0, 70.0, 5.0, 2000.0],
+                "city": [
+                    "vienna",
+                    "milan",
+                    "milan",
+                    "vienna",
+                    "milan",
+                    "vienna",
+                    "vienna",
+                    "paris",
+                    None,
+                ],
+            }
+        )
+        self.rollup = CityRollup()
+        # two chunks, the second one overlapping the days of the first one
+        self.rollup.update(self.df.iloc[[0, 1, 3, 6]])
+        self.rollup.update(self.df.iloc[[2, 4, 5, 7, 8]])
+
+    def test_city_totals(self):
+        """Assert if the totals of January are per city, and those of the year leave the income out."""
+        # 1.ARRANGE & 2.ACT
+        january = self.rollup.city_totals(2024, 1).frame
+        year = self.rollup.city_totals(2024).frame
+
+        # 3.ASSERT
+        self.assertEqual(
+            january.to_dict("records"),
+            [
+                {"city": "vienna", "value": 110.0},
+                {"city": "milan", "value": 100.0},
+            ],
+        )
+        return self.assertEqual(year["value"].sum(), 285.0)
+
+    def test_travel_periods(self):
+        """Assert if the days in Milan are two trips, split by a day in Vienna, the home city."""
+        # 1.ARRANGE & 2.ACT
+        trips = self.rollup.travel_periods(2024).frame
+
+        # 3.ASSERT
+        self.assertEqual(self.rollup.home_city(), "vienna")
+        self.assertEqual(trips["city"].tolist(), ["milan", "milan", "paris"])
+        self.assertEqual(trips["start"].tolist()[0], datetime.date(2024, 1, 2))
+        # one day without expenses does not end the trip
+        self.assertEqual(trips["days"].tolist(), [3, 1, 1])
+        return self.assertEqual(trips["expenses"].tolist(), [50.0, 50.0, 5.0])
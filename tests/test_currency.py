@@ -0,0 +1,88 @@
+"""
+Script to test the currency.py conversion of a multi-currency ledger.
+"""
+
+import unittest
+import numpy as np
+import pandas as pd
+from src.pkgs.currency import CurrencyConverter, read_fx_rates
+
+# one unit of each currency in euros, on the days the rates changed
+FX_RATES = b"""date;currency;rate
+01/01/2024;EUR;1
+01/01/2024;USD;0.9
+01/01/2024;CHF;1.05
+10/01/2024;USD;0.8
+"""
+
+
+class TestCurrency(unittest.TestCase):
+    """
+    Test the CurrencyConverter class, converting every row with the last rate known on its date.
+
+    Methods
+    -------
+
+    test_convert()
+        Test the converted values, for two base currencies.
+
+    test_convert_cached()
+        Test that a ledger is converted only once per base currency.
+
+    test_read_fx_rates_missing_column()
+        Test that a rates file without the rate column is refused.
+    """
+
+    def setUp(self):
+        self.df = pd.DataFrame(
+            {
+                "date": pd.to_datetime(
+                    ["2023-12-31", "2024-01-02", "2024-01-05", "2024-01-10", "2024-01-15"]
+                ),
+                "expense_category": ["food"] * 5,
+                "value": [10.0, 100.0, 50.0, 100.0, 20.0],
+                "currency": ["EUR", "USD", "EUR", "USD", "CHF"],
+            }
+        )
+        self.converter = CurrencyConverter(self.df, read_fx_rates(FX_RATES, "csv"))
+
+    def test_convert(self):
+        """Assert if every row is converted with the rate of its currency on its date."""
+        # 1.ARRANGE & 2.ACT
+        in_euros = self.converter.convert("EUR")
+        in_dollars = self.converter.convert("USD")
+
+        # 3.ASSERT: the first row is in EUR, no conversion needed even before the first rate
+        np.testing.assert_allclose(in_euros.df["value"], [10.0, 90.0, 50.0, 80.0, 21.0])
+        np.testing.assert_allclose(
+            in_dollars.df["value"], [np.nan, 100.0, 50.0 / 0.9, 100.0, 21.0 / 0.8]
+        )
+        self.assertEqual(in_euros.missing_rates, 0)
+        self.assertEqual(in_dollars.missing_rates, 1)
+        self.assertEqual(self.converter.currencies(), ["CHF", "EUR", "USD"])
+        self.assertEqual(self.converter.default_base(), "EUR")
+        # the raw rows are left untouched
+        return self.assertEqual(self.df["value"].tolist(), [10.0, 100.0, 50.0, 100.0, 20.0])
+
+    def test_convert_cached(self):
+        """Assert if the same base currency returns the same conversion, and its aggregates."""
+        # 1.ARRANGE
+        in_euros = self.converter.convert("EUR")
+
+        # 2.ACT
+        self.converter.convert("USD")
+
+        # 3.ASSERT
+        self.assertIs(self.converter.convert("EUR"), in_euros)
+        # the anomalies are scored with the conversion, as with the parsing of a ledger
+        self.assertEqual(in_euros.aggregates.anomalies._pending_rows, [])
+        return self.assertAlmostEqual(in_euros.aggregates.totals["food"], 251.0)
+
+    def test_read_fx_rates_missing_column(self):
+        """Assert if a rates file without the "rate" column raises a ValueError."""
+        # 1.ARRANGE
+        data = b"date;currency\n01/01/2024;EUR\n"
+
+        # 2.ACT & 3.ASSERT
+        with self.assertRaises(ValueError):
+            read_fx_rates(data, "csv")
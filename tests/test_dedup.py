@@ -0,0 +1,88 @@
+"""
+Script to test the dedup.py removal of the duplicate transactions across uploads.
+"""
+
+import unittest
+import pandas as pd
+from src.pkgs.dedup import Deduplicator, FingerprintIndex, fingerprint
+from src.pkgs.ingestion import IngestionJob
+
+# the sample data shipped with the repository, in the same format as the uploaded files
+with open("data/data_example.csv", "rb") as sample_file:
+    SAMPLE_DATA = sample_file.read()
+
+
+class TestDedup(unittest.TestCase):
+    """
+    Test the Deduplicator class, dropping the rows of an upload that are already in the ledger.
+
+    Methods
+    -------
+
+    test_fingerprint()
+        Test that the fingerprint only depends on the date, value, store and expense type.
+
+    test_filter()
+        Test that the rows are dropped only as many times as they are in the ledger, across chunks.
+
+    test_job_merge()
+        Test that two overlapping exports give the same ledger as the whole export.
+    """
+
+    def setUp(self):
+        self.df = pd.DataFrame(
+            {
+                "date": pd.to_datetime(["2024-06-01", "2024-06-01", "2024-06-02"]),
+                "expense_category": ["food", "food", "food"],
+                "expense_type": ["coffee", "coffee", "grocery"],
+                "value": [2.5, 2.5, 40.0],
+                "store": ["bar", "bar", "lidl"],
+                "city": ["vienna", "vienna", "graz"],
+            }
+        )
+
+    def test_fingerprint(self):
+        """Assert if two identical coffees have the same fingerprint, whatever their city."""
+        # 1.ARRANGE & 2.ACT
+        hashes = fingerprint(self.df.assign(city=["vienna", "graz", "graz"]))
+
+        # 3.ASSERT
+        self.assertEqual(hashes[0], hashes[1])
+        return self.assertNotEqual(hashes[0], hashes[2])
+
+    def test_filter(self):
+        """Assert if a third coffee is kept when the ledger has two, even in another chunk."""
+        # 1.ARRANGE
+        deduplicator = Deduplicator(FingerprintIndex.from_dataframe(self.df))
+        upload = pd.concat([self.df, self.df.iloc[[0]]], ignore_index=True)
+
+        # 2.ACT
+        first = deduplicator.filter(upload.iloc[:2])
+        second = deduplicator.filter(upload.iloc[2:])
+
+        # 3.ASSERT
+        self.assertTrue(first.empty)
+        self.assertEqual(second.index.tolist(), [3])
+        self.assertEqual(deduplicator.dropped, 3)
+        return self.assertEqual(deduplicator.index().counts.max(), 3)
+
+    def test_job_merge(self):
+        """Assert if the overlapping rows of the second export are dropped."""
+        # 1.ARRANGE: two exports, overlapping on the rows 3 and 4 of the sample
+        header, *rows = SAMPLE_DATA.splitlines(keepends=True)
+        first_job = IngestionJob(header + b"".join(rows[:5]), "csv").start()
+        first_job.wait(timeout=30)
+
+        # 2.ACT
+        job = IngestionJob(
+            header + b"".join(rows[3:]), "csv", base=first_job.ingested(), deduplicate=True
+        )
+        job.start().wait(timeout=30)
+
+        # 3.ASSERT
+        full_job = IngestionJob(SAMPLE_DATA, "csv").start()
+        full_job.wait(timeout=30)
+        self.assertTrue(job.merged)
+        self.assertEqual(job.duplicates, 2)
+        pd.testing.assert_frame_equal(job.result(), full_job.result())
+        return pd.testing.assert_frame_equal(job.aggregates.monthly, full_job.aggregates.monthly)
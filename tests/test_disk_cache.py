@@ -0,0 +1,71 @@
+"""
+Script to test the disk_cache.py cache of the parsed ledgers on disk.
+"""
+
+import tempfile
+import unittest
+import pandas as pd
+from src.pkgs.disk_cache import DiskLedgerCache
+from src.pkgs.ingestion import IngestionJob
+
+# the sample data shipped with the repository, in the same format as the uploaded files
+with open("data/data_example.csv", "rb") as sample_file:
+    SAMPLE_DATA = sample_file.read()
+
+
+class TestDiskLedgerCache(unittest.TestCase):
+    """
+    Test the DiskLedgerCache class, keeping the parsed ledgers across the restarts of the server.
+
+    Methods
+    -------
+
+    test_store_load()
+        Test that a ledger read back from its file has the expenses and aggregates parsed.
+
+    test_invalid_file()
+        Test that an altered file, or a file of another version, is ignored and deleted.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = DiskLedgerCache(self.directory.name)
+        self.job = IngestionJob(SAMPLE_DATA, "csv").start()
+        self.job.wait(timeout=30)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_store_load(self):
+        """Assert if the job read back is done, with the same expenses and category totals."""
+        # 1.ARRANGE
+        self.cache.store("version", self.job)
+
+        # 2.ACT
+        restored = self.cache.load("version", SAMPLE_DATA, "csv")
+
+        # 3.ASSERT
+        self.assertTrue(restored.done)
+        pd.testing.assert_frame_equal(restored.result(), self.job.result())
+        pd.testing.assert_series_equal(
+            restored.aggregates.category_totals(), self.job.aggregates.category_totals()
+        )
+        return self.assertEqual(restored.ingested().digest, self.job.ingested().digest)
+
+    def test_invalid_file(self):
+        """Assert if an altered file is deleted, and a file is only read for its own version."""
+        # 1.ARRANGE
+        self.cache.store("version", self.job)
+        path = self.cache._path("version")
+        path.rename(self.cache._path("other version"))
+        self.cache.store("version", self.job)
+        path.write_bytes(path.read_bytes()[:-10])
+
+        # 2.ACT
+        altered = self.cache.load("version", SAMPLE_DATA, "csv")
+        renamed = self.cache.load("other version", SAMPLE_DATA, "csv")
+
+        # 3.ASSERT
+        self.assertIsNone(altered)
+        self.assertIsNone(renamed)
+        return self.assertEqual(list(self.cache.directory.iterdir()), [])
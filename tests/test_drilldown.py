@@ -0,0 +1,95 @@
+"""
+Script to test the drilldown.py index of the transactions behind the bars of the charts.
+"""
+
+import datetime
+import unittest
+import numpy as np
+import pandas as pd
+from src.pkgs.drilldown import TransactionIndex
+
+
+class TestTransactionIndex(unittest.TestCase):
+    """
+    Test the TransactionIndex class, returning the rows of a category in a timeframe or a month.
+
+    Methods
+    -------
+
+    test_positions()
+        Test that the rows of a category between two dates are those of a filter of the ledger.
+
+    test_positions_in_month()
+        Test that the rows of a category, and of a store, in a month are found.
+
+    test_page()
+        Test that a page holds only its rows, and the total of every page.
+    """
+
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        dates = pd.to_datetime("2023-01-01") + pd.to_timedelta(
+            np.sort(rng.integers(0, 500, 2_000)), unit="D"
+        )
+        self.df = pd.DataFrame(
+            {
+                "date": dates,
+                "expense_category": rng.choice(["food", "rent", "travel"], 2_000),
+                "expense_type": "misc",
+                "value": rng.uniform(1, 100, 2_000).round(2),
+                "store": rng.choice(["lidl", "spar", None], 2_000),
+                "city": "vienna",
+            }
+        )
+        self.index = TransactionIndex.from_dataframe(self.df)
+
+    def test_positions(self):
+        """Assert if the rows found are those of the category, with both dates included."""
+        # 1.ARRANGE
+        past_date, today_date = datetime.date(2023, 3, 15), datetime.date(2023, 9, 2)
+        dates = self.df["date"].dt.date
+
+        # 2.ACT
+        positions = self.index.positions("food", past_date, today_date)
+
+        # 3.ASSERT
+        expected = (
+            (self.df["expense_category"] == "food") & (dates >= past_date) & (dates <= today_date)
+        )
+        np.testing.assert_array_equal(positions, np.flatnonzero(expected))
+        return self.assertEqual(self.index.positions("unknown", past_date, today_date).tolist(), [])
+
+    def test_positions_in_month(self):
+        """Assert if the rows of a month are found, for the whole category and for a store."""
+        # 1.ARRANGE
+        month = (self.df["date"].dt.year == 2023) & (self.df["date"].dt.month == 5)
+        rent = month & (self.df["expense_category"] == "rent")
+
+        # 2.ACT
+        positions = self.index.positions_in_month("rent", 2023, 5)
+        store_positions = self.index.positions_in_month("rent", 2023, 5, store="spar")
+
+        # 3.ASSERT
+        np.testing.assert_array_equal(positions, np.flatnonzero(rent))
+        np.testing.assert_array_equal(
+            store_positions, np.flatnonzero(rent & (self.df["store"] == "spar"))
+        )
+        # a month without data
+        return self.assertEqual(self.index.positions_in_month("rent", 2030, 1).tolist(), [])
+
+    def test_page(self):
+        """Assert if the last page holds the remaining rows, and the total is of every page."""
+        # 1.ARRANGE
+        positions = self.index.positions_in_month("food", 2023, 5)
+
+        # 2.ACT
+        pages = TransactionIndex.page_count(positions, page_size=10)
+        result = self.index.page(positions, pages, page_size=10)
+
+        # 3.ASSERT
+        self.assertEqual(result.page, pages)
+        self.assertEqual(result.first_row, (pages - 1) * 10 + 1)
+        self.assertEqual(len(result.frame), len(positions) - (pages - 1) * 10)
+        return self.assertAlmostEqual(
+            result.total_value, self.df["value"].iloc[positions].sum(), places=2
+        )
@@ -0,0 +1,88 @@
+"""
+Script to test the forecasting.py forecast of the monthly expenses.
+"""
+
+import unittest
+import numpy as np
+import pandas as pd
+from datetime import date
+from src.pkgs.aggregates import ExpenseAggregates
+from src.pkgs.forecasting import SpendForecast
+from src.pkgs.metrics_dataclasses import ExpenseMetric
+
+
+class TestForecasting(unittest.TestCase):
+    """
+    Test the SpendForecast class, fitted on the monthly cube of the aggregates.
+
+    Methods
+    -------
+
+    test_fit_seasonal()
+        Test that the months spending more every year have a higher forecast.
+
+    test_report()
+        Test the month-end projection of the month in progress, and that reports are looked up.
+
+    test_metric_month_end_forecast()
+        Test the metric built from the report.
+    """
+
+    def setUp(self):
+        # 10 a day on food for three years, twice as much in December
+        days = pd.date_range(start="2021-01-01", end="2024-03-15", freq="D")
+        self.df = pd.DataFrame(
+            {
+                "date": days,
+                "expense_category": "food",
+                "expense_type": "grocery",
+                "value": np.where(days.month == 12, 20.0, 10.0),
+                "store": "lidl",
+            }
+        )
+        self.aggregates = ExpenseAggregates()
+        self.aggregates.update(self.df)
+
+    def test_fit_seasonal(self):
+        """Assert if December is forecast about twice as much as an average month."""
+        # 1.ARRANGE & 2.ACT
+        forecast = SpendForecast.fit(self.aggregates)
+
+        # 3.ASSERT
+        # March 2024 is still in progress: the model stops at February
+        self.assertEqual(forecast.months, 38)
+        december = forecast.predict(2024, 12)["food"]
+        april = forecast.predict(2024, 4)["food"]
+        # 31 days at 20 in December, 30 days at 10 in April
+        return self.assertAlmostEqual(december / april, 620 / 300, places=1)
+
+    def test_report(self):
+        """Assert if the month-end projection adds the forecast of the days left to the actual."""
+        # 1.ARRANGE
+        forecast = SpendForecast.fit(self.aggregates)
+        days_left = 1 - 15 / 31
+
+        # 2.ACT
+        report = forecast.report(2024, 3, as_of=date(2024, 3, 15))
+
+        # 3.ASSERT
+        row = report.frame.set_index("expense_category").loc["food"]
+        self.assertEqual(row["actual"], 150.0)
+        self.assertAlmostEqual(
+            row["month_end"], 150.0 + forecast.predict(2024, 3)["food"] * days_left, places=1
+        )
+        self.assertEqual(report.title, "Forecast - Mar 2024")
+        return self.assertIs(forecast.report(2024, 3, as_of=date(2024, 3, 15)), report)
+
+    def test_metric_month_end_forecast(self):
+        """Assert if the metric sums the month-end projection of every category."""
+        # 1.ARRANGE
+        report = SpendForecast.fit(self.aggregates).report(2024, 3, as_of=date(2024, 3, 15))
+        metric = ExpenseMetric(self.df, today_date=date(2024, 3, 15), past_date=date(2024, 3, 1))
+
+        # 2.ACT
+        result = metric.metric_month_end_forecast(report)
+
+        # 3.ASSERT
+        self.assertEqual(result.value, round(report.frame["month_end"].sum(), 2))
+        return self.assertEqual(result.delta, round(result.value - 150.0, 2))
@@ -0,0 +1,76 @@
+"""
+Script to test the heatmaps.py bins of the expenses per weekday, week and day of the month.
+"""
+
+import unittest
+import numpy as np
+import pandas as pd
+from src.pkgs.heatmaps import SpendingBins
+
+
+class TestSpendingBins(unittest.TestCase):
+    """
+    Test the SpendingBins class, filled chunk by chunk while ingesting.
+
+    Methods
+    -------
+
+    test_weekday_week_totals()
+        Test that each expense is in the cell of its weekday and week, and the income in none.
+
+    test_update_in_chunks()
+        Test that the bins of a ledger added in chunks are those of the whole ledger.
+    """
+
+    def setUp(self):
+        self.df = pd.DataFrame(
+            {
+                # 2024-01-01 is a Monday: week 0 has no day
+                "date": pd.to_datetime(
+                    ["2024-01-01", "2024-01-07", "2024-01-08", "2024-12-31", "2025-03-15"]
+                ),
+                "expense_category": ["food", "food", "income", "apparel", "food"],
+                "value": [10.0, 5.0, 2000.0, 40.0, 7.5],
+            }
+        )
+
+    def test_weekday_week_totals(self):
+        """Assert if the expenses are binned on their day, and the days outside the year are missing."""
+        # 1.ARRANGE
+        bins = SpendingBins()
+
+        # 2.ACT
+        bins.update(self.df)
+        result = bins.weekday_week_totals(2024).frame
+
+        # 3.ASSERT
+        self.assertEqual(result.loc["Monday", 1], 10.0)
+        self.assertEqual(result.loc["Sunday", 1], 5.0)
+        # the income is not an expense
+        self.assertEqual(result.loc["Monday", 2], 0.0)
+        # 2024-12-31 is the Tuesday of week 53, after which the year is over
+        self.assertEqual(result.loc["Tuesday", 53], 40.0)
+        self.assertTrue(np.isnan(result.loc["Wednesday", 53]))
+        return self.assertNotIn(0, result.columns)
+
+    def test_update_in_chunks(self):
+        """Assert if adding the ledger in chunks, with a new category later on, gives the same bins."""
+        # 1.ARRANGE
+        whole, chunked = SpendingBins(), SpendingBins()
+
+        # 2.ACT
+        whole.update(self.df)
+        for start in range(0, len(self.df), 2):
+            chunked.update(self.df.iloc[start : start + 2])
+
+        # 3.ASSERT
+        for year in (2024, 2025):
+            pd.testing.assert_frame_equal(
+                chunked.weekday_week_totals(year).frame, whole.weekday_week_totals(year).frame
+            )
+            pd.testing.assert_frame_equal(
+                chunked.category_day_totals(year).frame, whole.category_day_totals(year).frame
+            )
+        return self.assertEqual(
+            whole.category_day_totals(2024).frame.index.tolist(), ["apparel", "food"]
+        )
@@ -0,0 +1,59 @@
+"""
+Script to test the hierarchy.py category / type / store hierarchy of the expenses.
+"""
+
+import datetime
+import unittest
+import pandas as pd
+from src.pkgs.hierarchy import ExpenseHierarchy
+
+
+class TestExpenseHierarchy(unittest.TestCase):
+    """
+    Test the ExpenseHierarchy class, folding the smallest nodes into "other".
+
+    Methods
+    -------
+
+    test_totals()
+        Test that the smallest stores are folded into "other", and the total is kept.
+
+    test_totals_cached()
+        Test that a timeframe is computed once, and that the income is left out.
+    """
+
+    def setUp(self):
+        self.df = pd.DataFrame(
+            {
+                "date": pd.to_datetime(["2024-06-01"] * 6 + ["2024-07-01"]),
+                "expense_category": ["food"] * 5 + ["income", "food"],
+                "expense_type": ["grocery"] * 4 + [None, "salary", "grocery"],
+                "value": [50.0, 30.0, 15.0, 5.0, 8.0, 2000.0, 99.0],
+                "store": ["lidl", "billa", "spar", "hofer", "lidl", "company", "lidl"],
+            }
+        )
+        self.hierarchy = ExpenseHierarchy(self.df, max_children=3)
+        self.june = (datetime.date(2024, 6, 1), datetime.date(2024, 6, 30))
+
+    def test_totals(self):
+        """Assert if spar and hofer are folded together, and the row without a type is kept."""
+        # 1.ARRANGE & 2.ACT
+        result = self.hierarchy.totals(*self.june).frame
+
+        # 3.ASSERT
+        grocery = result.loc[result["expense_type"] == "grocery"].set_index("store")["value"]
+        self.assertEqual(grocery.to_dict(), {"billa": 30.0, "lidl": 50.0, "other": 20.0})
+        self.assertIn("(none)", result["expense_type"].tolist())
+        return self.assertEqual(result["value"].sum(), 108.0)
+
+    def test_totals_cached(self):
+        """Assert if the same timeframe returns the same result, without the income."""
+        # 1.ARRANGE
+        first = self.hierarchy.totals(*self.june)
+
+        # 2.ACT
+        second = self.hierarchy.totals(*self.june)
+
+        # 3.ASSERT
+        self.assertIs(first, second)
+        return self.assertNotIn("income", first.frame["expense_category"].tolist())
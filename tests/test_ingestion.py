@@ -0,0 +1,206 @@
+"""
+Script to test the ingestion.py background worker and the aggregates it builds.
+"""
+
+import unittest
+import pandas as pd
+from datetime import date
+from src.pkgs.aggregates import ExpenseAggregates
+from src.pkgs.ingestion import (
+    SORTED_BY_DATE,
+    IngestionJob,
+    add_calendar_columns,
+    read_expenses,
+    sort_by_date,
+)
+
+# the sample data shipped with the repository, in the same format as the uploaded files
+with open("data/data_example.csv", "rb") as sample_file:
+    SAMPLE_DATA = sample_file.read()
+
+
+class TestIngestion(unittest.TestCase):
+    """
+    Test the IngestionJob class, parsing a file in a background thread chunk by chunk.
+
+    Methods
+    -------
+
+    test_job_result()
+        Test that parsing in chunks yields the same data as parsing the whole file at once.
+
+    test_job_cancel()
+        Test that a cancelled job stops before parsing the file.
+
+    test_job_incremental()
+        Test that a ledger with new rows appended is ingested by parsing only the new rows.
+
+    test_job_extended_last_line()
+        Test that a ledger whose last line, without a new line, is extended is parsed again.
+
+    test_sort_by_date()
+        Test that the ledger is sorted once, and that a sorted ledger is not sorted again.
+
+    test_window_totals()
+        Test the totals between two dates computed from the prefix sums of the aggregates.
+
+    test_window_category_totals()
+        Test the expense categories with data between two dates, used by the category dropdown.
+
+    test_add_calendar_columns()
+        Test that the calendar columns derived from the date match those of the sample data.
+    """
+
+    def test_job_result(self):
+        """Assert if the chunks and the aggregates of the job match the whole file, sorted by date."""
+        # 1.ARRANGE
+        job = IngestionJob(SAMPLE_DATA, "csv", chunksize=2)
+
+        # 2.ACT
+        job.start().wait(timeout=30)
+
+        # 3.ASSERT
+        expected_df = read_expenses(SAMPLE_DATA, "csv").sort_values(
+            by=["date"], kind="stable", ignore_index=True
+        )
+        self.assertIsNone(job.error)
+        self.assertEqual(job.progress, 1.0)
+        pd.testing.assert_frame_equal(job.result(), expected_df)
+        self.assertTrue(job.result().attrs[SORTED_BY_DATE])
+        self.assertEqual(job.aggregates.rows, len(expected_df))
+        return self.assertEqual(
+            job.partial_category_totals().to_dict(),
+            {"home & living": 1000.0, "food": 120.0, "transportation": 50.0},
+        )
+
+    def test_job_cancel(self):
+        """Assert if a job cancelled before starting does not keep any row."""
+        # 1.ARRANGE
+        job = IngestionJob(SAMPLE_DATA, "csv", chunksize=2)
+
+        # 2.ACT
+        job.cancel()
+        job.start().wait(timeout=30)
+
+        # 3.ASSERT
+        self.assertTrue(job.done and job.cancelled)
+        return self.assertEqual(job.aggregates.rows, 0)
+
+    def test_job_incremental(self):
+        """Assert if the incremental ingestion gives the same data and aggregates as a full one."""
+        # 1.ARRANGE: the previous version of the ledger has the last two rows missing
+        lines = SAMPLE_DATA.splitlines(keepends=True)
+        previous_data, new_rows = b"".join(lines[:-2]), b"".join(lines[-2:])
+        previous_job = IngestionJob(previous_data, "csv", chunksize=2).start()
+        previous_job.wait(timeout=30)
+
+        # 2.ACT
+        job = IngestionJob(previous_data + new_rows, "csv", base=previous_job.ingested())
+        job.start().wait(timeout=30)
+
+        # 3.ASSERT
+        full_job = IngestionJob(SAMPLE_DATA, "csv").start()
+        full_job.wait(timeout=30)
+        self.assertTrue(job.incremental)
+        pd.testing.assert_frame_equal(job.result(), full_job.result())
+        pd.testing.assert_frame_equal(job.aggregates.prefix, full_job.aggregates.prefix)
+        pd.testing.assert_frame_equal(job.aggregates.monthly, full_job.aggregates.monthly)
+        # the aggregates of the previous version are left untouched
+        return self.assertEqual(previous_job.aggregates.rows + 2, job.aggregates.rows)
+
+    def test_job_extended_last_line(self):
+        """Assert if a ledger extending the unterminated last line of the previous one is parsed."""
+        # 1.ARRANGE: the previous version ends in the middle of the value of its last row
+        cut = SAMPLE_DATA.rindex(b"0;") + 1
+        previous_job = IngestionJob(SAMPLE_DATA[:cut], "csv").start()
+        previous_job.wait(timeout=30)
+
+        # 2.ACT
+        job = IngestionJob(SAMPLE_DATA, "csv", base=previous_job.ingested())
+        job.start().wait(timeout=30)
+
+        # 3.ASSERT
+        full_job = IngestionJob(SAMPLE_DATA, "csv").start()
+        full_job.wait(timeout=30)
+        self.assertFalse(job.incremental)
+        return pd.testing.assert_frame_equal(job.result(), full_job.result())
+
+    def test_sort_by_date(self):
+        """Assert if an unsorted ledger is sorted and flagged, and a flagged one is returned as is."""
+        # 1.ARRANGE
+        df = pd.DataFrame(
+            {
+                "date": pd.to_datetime(["2024-01-03", "2024-01-01", "2024-01-03", "2024-01-02"]),
+                "value": [1.0, 2.0, 3.0, 4.0],
+            }
+        )
+
+        # 2.ACT
+        sorted_df = sort_by_date(df)
+
+        # 3.ASSERT: the rows of the same day keep their order
+        self.assertEqual(sorted_df["value"].tolist(), [2.0, 4.0, 1.0, 3.0])
+        self.assertEqual(sorted_df.index.tolist(), [0, 1, 2, 3])
+        self.assertTrue(sorted_df.attrs[SORTED_BY_DATE])
+        return self.assertIs(sort_by_date(sorted_df), sorted_df)
+
+    def test_window_totals(self):
+        """Assert if the totals from the prefix sums match the filtered dataframe."""
+        # 1.ARRANGE
+        df = read_expenses(SAMPLE_DATA, "csv")
+        aggregates = ExpenseAggregates()
+
+        # 2.ACT: aggregate the ledger in two chunks, the second one being more recent
+        aggregates.update(df.iloc[:5])
+        aggregates.update(df.iloc[5:])
+        result = aggregates.window_totals(date(2024, 6, 2), date(2024, 7, 1))
+
+        # 3.ASSERT
+        expected = (
+            df.loc[(df["date"] >= "2024-06-02") & (df["date"] <= "2024-07-01")]
+            .groupby("expense_category")["value"]
+            .sum()
+        )
+        return self.assertEqual(result[result != 0].sort_index().to_dict(), expected.to_dict())
+
+    def test_window_category_totals(self):
+        """Assert if only the expense categories with data in the window are listed, highest first."""
+        # 1.ARRANGE
+        df = read_expenses(SAMPLE_DATA, "csv")
+        aggregates = ExpenseAggregates()
+        aggregates.update(df)
+
+        # 2.ACT
+        result = aggregates.window_category_totals(date(2024, 6, 2), date(2024, 6, 30))
+
+        # 3.ASSERT
+        expected = (
+            df.loc[
+                (df["date"] >= "2024-06-02")
+                & (df["date"] <= "2024-06-30")
+                & ~df["expense_category"].isin(["income", "investment", "savings"])
+            ]
+            .groupby("expense_category")["value"]
+            .sum()
+            .round(2)
+            .sort_values(ascending=False)
+        )
+        return pd.testing.assert_series_equal(result, expected, check_names=False)
+
+    def test_add_calendar_columns(self):
+        """Assert if the derived calendar columns have the same values as the ones in the file."""
+        # 1.ARRANGE: the sample data already has the calendar columns, computed in Excel
+        expected_df = pd.read_csv(
+            "data/data_example.csv", sep=";", parse_dates=["date"], dayfirst=True
+        )
+        calendar_columns = ["month", "year", "weekday_number", "weekday_text", "months_text"]
+
+        # 2.ACT
+        result_df = add_calendar_columns(expected_df.drop(columns=calendar_columns))
+
+        # 3.ASSERT
+        return pd.testing.assert_frame_equal(
+            result_df[calendar_columns].astype({"weekday_text": str, "months_text": str}),
+            expected_df[calendar_columns],
+            check_dtype=False,
+        )
@@ -0,0 +1,162 @@
+"""
+Script to test the ledgers.py cache of the ledgers shared by the sessions.
+"""
+
+import os
+import unittest
+from unittest import mock
+from src.pkgs.ingestion import IngestionJob
+from src.pkgs.ledgers import (
+    WORKSPACES_VARIABLE,
+    LedgerCache,
+    ledger_bytes,
+    ledger_version,
+    workspaces_enabled,
+)
+
+# the sample data shipped with the repository, in the same format as the uploaded files
+with open("data/data_example.csv", "rb") as sample_file:
+    SAMPLE_DATA = sample_file.read()
+
+
+def parsed_job() -> IngestionJob:
+    job = IngestionJob(SAMPLE_DATA, "csv").start()
+    job.wait(timeout=30)
+    return job
+
+
+class TestLedgerCache(unittest.TestCase):
+    """
+    Test the LedgerCache class, sharing the parsed ledgers within the quotas of the tenants.
+
+    Methods
+    -------
+
+    test_shared_ledger()
+        Test that a ledger is found by its version, only by the sessions of its tenant.
+
+    test_tenant_quota()
+        Test that the ledgers used least recently by a tenant over its quota are evicted.
+
+    test_running_not_evicted()
+        Test that a ledger still being parsed is kept over the quota, and evicted once parsed.
+
+    test_release()
+        Test that a ledger being parsed is cancelled once no session waits for it.
+
+    test_latest()
+        Test that the ledger opened last by a session, still in the cache, is found.
+
+    test_workspaces_enabled()
+        Test that the workspaces are only enabled by their environment variable.
+    """
+
+    def test_shared_ledger(self):
+        """Assert if the same content is the same ledger, unless the rules differ."""
+        # 1.ARRANGE
+        cache = LedgerCache()
+        version = ledger_version(SAMPLE_DATA, "csv")
+        job = parsed_job()
+
+        # 2.ACT
+        cache.put("team", "ledger.csv", version, job, holder="first")
+        shared = cache.get("team", ledger_version(SAMPLE_DATA, "csv"), holder="second")
+
+        # 3.ASSERT
+        self.assertIs(shared.job, job)
+        self.assertIsNone(cache.get("other team", version))
+        self.assertNotEqual(ledger_version(SAMPLE_DATA, "csv", rules_version="rules"), version)
+        return self.assertEqual(cache.usage("team"), ledger_bytes(job))
+
+    def test_tenant_quota(self):
+        """Assert if the third ledger of a tenant evicts the one it used least recently."""
+        # 1.ARRANGE
+        size = ledger_bytes(parsed_job())
+        cache = LedgerCache(tenant_quota=2 * size)
+        cache.put("team", "january.csv", "january", parsed_job())
+        cache.put("team", "february.csv", "february", parsed_job())
+        cache.put("other team", "march.csv", "march", parsed_job())
+        cache.get("team", "january")
+
+        # 2.ACT
+        cache.put("team", "april.csv", "april", parsed_job())
+
+        # 3.ASSERT
+        names = [ledger.name for ledger in cache.ledgers("team")]
+        self.assertEqual(names, ["april.csv", "january.csv"])
+        return self.assertEqual(len(cache.ledgers("other team")), 1)
+
+    def test_running_not_evicted(self):
+        """Assert if the parsing of a ledger over the quota goes on, until it is done."""
+        # 1.ARRANGE
+        cache = LedgerCache(tenant_quota=1)
+        job = IngestionJob(SAMPLE_DATA, "csv")
+        cache.put("team", "ledger.csv", "version", job, holder="first")
+
+        # 2.ACT
+        cache.put("team", "other.csv", "other version", parsed_job())
+        kept = cache.get("team", "version")
+        job.start().wait(timeout=30)
+        evicted = cache.get("team", "version")
+
+        # 3.ASSERT
+        self.assertIs(kept.job, job)
+        self.assertFalse(job.cancelled)
+        return self.assertIsNone(evicted)
+
+    def test_release(self):
+        """Assert if the parsing goes on while a session waits for it, and is cancelled after."""
+        # 1.ARRANGE
+        cache = LedgerCache()
+        job = IngestionJob(SAMPLE_DATA, "csv")
+        cache.put("team", "ledger.csv", "version", job, holder="first")
+        cache.get("team", "version", holder="second")
+
+        # 2.ACT
+        first_cancelled = cache.release("team", "version", "first")
+        second_cancelled = cache.release("team", "version", "second")
+
+        # 3.ASSERT
+        self.assertFalse(first_cancelled)
+        self.assertTrue(second_cancelled)
+        self.assertTrue(job.cancelled)
+        return self.assertIsNone(cache.get("team", "version"))
+
+    def test_latest(self):
+        """Assert if the ledger opened last is skipped once cancelled, and dropped by the session."""
+        # 1.ARRANGE
+        cache = LedgerCache()
+        job = parsed_job()
+        cache.put("team", "january.csv", "january", job)
+        cache.put("team", "february.csv", "february", IngestionJob(SAMPLE_DATA, "csv"), "first")
+        cache.release("team", "february", "first")
+        versions = {"january.csv": "january", "february.csv": "february"}
+
+        # 2.ACT
+        name, latest = cache.latest("team", versions, holder="first")
+
+        # 3.ASSERT
+        self.assertEqual(name, "january.csv")
+        self.assertIs(latest.job, job)
+        self.assertEqual(versions, {"january.csv": "january"})
+        return self.assertIsNone(cache.latest("other team", versions))
+
+    def test_workspaces_enabled(self):
+        """Assert if the workspaces are disabled unless the variable enables them."""
+        # 1.ARRANGE
+        environment = {
+            key: value for key, value in os.environ.items() if key != WORKSPACES_VARIABLE
+        }
+
+        # 2.ACT
+        with mock.patch.dict(os.environ, environment, clear=True):
+            unset = workspaces_enabled()
+        with mock.patch.dict(os.environ, {WORKSPACES_VARIABLE: "true"}):
+            enabled = workspaces_enabled()
+        with mock.patch.dict(os.environ, {WORKSPACES_VARIABLE: "0"}):
+            disabled = workspaces_enabled()
+
+        # 3.ASSERT
+        self.assertFalse(unset)
+        self.assertTrue(enabled)
+        return self.assertFalse(disabled)
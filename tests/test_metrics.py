@@ -9,7 +9,10 @@ from faker import Faker  # to create dummy/fake data
 # if no standard provider from Faker is sufficient, you create your own
 from faker.providers import DynamicProvider
 from datetime import datetime
+from src.pkgs.aggregates import ExpenseAggregates
+from src.pkgs.ingestion import sort_by_date
 from src.pkgs.metrics_dataclasses import ExpenseMetric
+from src.pkgs.results_dataclasses import MetricResult
 
 
 # create subclass that imports the unittest.TestCase class to derive its methods (inheritance)
@@ -272,3 +275,133 @@ class TestMetric(unittest.TestCase):
         ]["value"].sum()
 
         return self.assertTrue(result_value == expected_value)
+
+    def test_compute_metrics(self):
+        """
+        Assert if the compute_metrics() method returns a MetricResult with the total expenses
+        of the timeframe and the difference with the previous 30 days, without drawing anything,
+        using the arrange/act/assert testing methodology.
+
+        """
+        # 1.ARRANGE
+        # one expense of 10 per day, plus one income per day that must be ignored
+        df = pd.DataFrame(
+            {
+                "date": list(pd.date_range(start="2024-01-01", freq="D", periods=90)) * 2,
+                "expense_category": ["food"] * 90 + ["income"] * 90,
+                "value": [10.0] * 90 + [1000.0] * 90,
+            }
+        )
+        past_date = datetime.strptime("2024-02-01", "%Y-%m-%d").date()
+        today_date = datetime.strptime("2024-02-10", "%Y-%m-%d").date()
+
+        # 2.ACT
+        result = ExpenseMetric(df=df, past_date=past_date, today_date=today_date).compute_metrics()
+
+        # 3.ASSERT: 10 days in the timeframe, 31 days in the previous 30 days (both ends included)
+        expected_result = MetricResult(
+            label="Expenses in the timeframe",
+            value=100.0,
+            delta=100.0 - 310.0,
+            delta_color="inverse",
+            help_text="vs. previous 30 days",
+        )
+        return self.assertEqual(result, expected_result)
+
+    def test_compute_metrics_with_aggregates(self):
+        """
+        Assert if the metrics looked up in the per-day aggregates are the same as the ones
+        computed by filtering the dataframe, using the arrange/act/assert testing methodology.
+
+        """
+        # 1.ARRANGE
+        df = pd.DataFrame(
+            {
+                "date": list(pd.date_range(start="2024-01-01", freq="D", periods=90)) * 2,
+                "expense_category": ["food"] * 90 + ["income"] * 90,
+                "value": [10.25] * 90 + [1000.0] * 90,
+            }
+        )
+        df["year"] = df["date"].dt.year
+        df["month"] = df["date"].dt.month
+        aggregates = ExpenseAggregates()
+        aggregates.update(df)
+        past_date = datetime.strptime("2024-02-01", "%Y-%m-%d").date()
+        today_date = datetime.strptime("2024-02-10", "%Y-%m-%d").date()
+        metric = ExpenseMetric(df=df, past_date=past_date, today_date=today_date)
+        metric_aggregates = ExpenseMetric(
+            df=df, past_date=past_date, today_date=today_date, aggregates=aggregates
+        )
+
+        # 2.ACT & 3.ASSERT
+        self.assertEqual(metric_aggregates.compute_metrics(), metric.compute_metrics())
+        self.assertEqual(metric_aggregates.compute_total_income(), metric.compute_total_income())
+        self.assertEqual(
+            metric_aggregates.compute_metrics_by_category("food"),
+            metric.compute_metrics_by_category("food"),
+        )
+        return self.assertEqual(
+            metric_aggregates.total_expenses_timeframe(df, 2024, 2),
+            metric.total_expenses_timeframe(df, 2024, 2),
+        )
+
+    def test_total_per_category_empty_window_with_aggregates(self):
+        """
+        Assert if a category without rows in the timeframe has no total (None), both with the
+        aggregates and with the dataframe, using the arrange/act/assert testing methodology.
+
+        """
+        # 1.ARRANGE
+        df = pd.DataFrame(
+            {
+                "date": pd.to_datetime(["2024-01-05", "2024-01-20", "2024-02-05"]),
+                "expense_category": ["food", "restaurant", "restaurant"],
+                "value": [10.0, 25.0, 30.0],
+            }
+        )
+        aggregates = ExpenseAggregates()
+        aggregates.update(df)
+        past_date = datetime.strptime("2024-02-01", "%Y-%m-%d").date()
+        today_date = datetime.strptime("2024-02-29", "%Y-%m-%d").date()
+        metric = ExpenseMetric(df=df, past_date=past_date, today_date=today_date)
+        metric_aggregates = ExpenseMetric(
+            df=df, past_date=past_date, today_date=today_date, aggregates=aggregates
+        )
+
+        # 2.ACT
+        result = metric_aggregates.total_expenses_per_category_between(
+            past_date, today_date, "food"
+        )
+
+        # 3.ASSERT
+        self.assertEqual(
+            result, metric.total_expenses_per_category_between(past_date, today_date, "food")
+        )
+        self.assertIsNone(result)
+        return self.assertEqual(
+            metric_aggregates.total_expenses_per_category_between(
+                past_date, today_date, "restaurant"
+            ),
+            metric.total_expenses_per_category_between(past_date, today_date, "restaurant"),
+        )
+
+    def test_filter_data_sorted(self):
+        """
+        Assert if the binary search on a ledger sorted by date returns the same rows as the
+        filter on the dates, using the arrange/act/assert testing methodology.
+
+        """
+        # 1.ARRANGE: several rows per day, with a time of the day
+        df = pd.DataFrame(
+            {"date": pd.date_range(start="2024-01-01", freq="7h", periods=300), "value": 1.0}
+        )
+        sorted_df = sort_by_date(df.copy())
+        past_date = datetime.strptime("2024-01-10", "%Y-%m-%d").date()
+        today_date = datetime.strptime("2024-01-20", "%Y-%m-%d").date()
+
+        # 2.ACT
+        result_df = ExpenseMetric(df=sorted_df).filter_data(sorted_df, past_date, today_date)
+
+        # 3.ASSERT
+        expected_df = ExpenseMetric(df=df).filter_data(df, past_date, today_date)
+        return pd.testing.assert_frame_equal(result_df, expected_df)
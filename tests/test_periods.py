@@ -0,0 +1,65 @@
+"""
+Script to test the periods.py period catalog.
+"""
+
+import unittest
+import pandas as pd
+from src.pkgs.ingestion import read_expenses
+from src.pkgs.periods import PeriodCatalog
+
+with open("data/data_example.csv", "rb") as sample_file:
+    SAMPLE_DATA = sample_file.read()
+
+
+class TestPeriodCatalog(unittest.TestCase):
+    """
+    Test the PeriodCatalog class, listing the years and months of a ledger sorted by date.
+
+    Methods
+    -------
+
+    test_years_and_months()
+        Test that the years and months are the ones found by scanning the ledger.
+
+    test_rows()
+        Test that the slices of the catalog are the rows found by filtering the ledger.
+    """
+
+    def setUp(self):
+        # two years of data, with a gap in the months of the first one
+        self.df = pd.DataFrame(
+            {
+                "date": pd.to_datetime(
+                    ["2023-11-02", "2023-11-20", "2024-01-05", "2024-02-10", "2024-02-11"]
+                ),
+                "value": [1.0, 2.0, 3.0, 4.0, 5.0],
+            }
+        )
+        self.df["year"] = self.df["date"].dt.year
+        self.df["month"] = self.df["date"].dt.month
+
+    def test_years_and_months(self):
+        """Assert if the catalog lists the years and months with data, in order."""
+        # 1.ARRANGE & 2.ACT
+        catalog = PeriodCatalog.from_dataframe(self.df)
+
+        # 3.ASSERT
+        self.assertEqual(catalog.years, [2023, 2024])
+        self.assertEqual(catalog.months_of(2023), [11])
+        self.assertEqual(catalog.months_of(2024), [1, 2])
+        return self.assertEqual(catalog.months_of(2022), [])
+
+    def test_rows(self):
+        """Assert if the rows of a year and of a month match the filtered ledger."""
+        # 1.ARRANGE
+        df = read_expenses(SAMPLE_DATA, "csv").sort_values(by=["date"]).reset_index(drop=True)
+        catalog = PeriodCatalog.from_dataframe(df)
+
+        # 2.ACT
+        month_rows = catalog.rows(df, 2024, 6)
+        year_rows = catalog.rows(df, 2024)
+
+        # 3.ASSERT
+        pd.testing.assert_frame_equal(month_rows, df.loc[(df["year"] == 2024) & (df["month"] == 6)])
+        pd.testing.assert_frame_equal(year_rows, df.loc[df["year"] == 2024])
+        return self.assertTrue(catalog.rows(df, 2024, 12).empty)
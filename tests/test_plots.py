@@ -0,0 +1,71 @@
+"""
+Script to test the plots_dataclasses.py aggregations.
+"""
+
+import unittest
+import pandas as pd
+from datetime import datetime
+from src.pkgs.plots_dataclasses import ExpensePlot, ExpensePlotMonth
+
+
+class TestPlot(unittest.TestCase):
+    """
+    Test the aggregations behind the plots: they must return the numbers shown in the charts
+    without needing Streamlit.
+
+    Methods
+    -------
+
+    test_category_totals()
+        Test the category_totals method of the ExpensePlot class.
+
+    test_waterfall_totals()
+        Test the waterfall_totals method of the ExpensePlotMonth class.
+    """
+
+    def setUp(self):
+        # Sample DataFrame for testing: two months of data with income and expenses
+        self.df = pd.DataFrame(
+            {
+                "date": pd.to_datetime(
+                    ["2024-01-05", "2024-01-10", "2024-01-15", "2024-01-20", "2024-02-01"]
+                ),
+                "expense_category": ["income", "food", "food", "restaurant", "food"],
+                "value": [3000.0, 50.0, 25.5, 30.0, 70.0],
+                "store": ["company", "lidl", "billa", "mcdonald's", "lidl"],
+            }
+        )
+        self.df["year"] = self.df["date"].dt.year
+        self.df["month"] = self.df["date"].dt.month
+
+    def test_category_totals(self):
+        """Assert if the category totals only contain the expenses of the timeframe."""
+        # 1.ARRANGE
+        past_date = datetime.strptime("2024-01-01", "%Y-%m-%d").date()
+        today_date = datetime.strptime("2024-01-31", "%Y-%m-%d").date()
+        plot = ExpensePlot(self.df, past_date, today_date)
+
+        # 2.ACT
+        result = plot.category_totals(self.df, today_date, past_date)
+
+        # 3.ASSERT
+        expected_df = pd.DataFrame(
+            {"expense_category": ["food", "restaurant"], "value": [75.5, 30.0]}
+        )
+        return pd.testing.assert_frame_equal(result.frame, expected_df)
+
+    def test_waterfall_totals(self):
+        """Assert if the waterfall starts from the income and subtracts each category."""
+        # 1.ARRANGE
+        plot = ExpensePlotMonth(self.df, 2024, 1)
+
+        # 2.ACT
+        result = plot.waterfall_totals(self.df, 2024, 1)
+
+        # 3.ASSERT
+        self.assertEqual(result.labels[0], "Income")
+        self.assertEqual(result.labels[-1], "Remaining Income")
+        self.assertEqual(result.values[0], 3000.0)
+        self.assertEqual(result.values[result.labels.index("Food")], -75.5)
+        self.assertEqual(result.values[result.labels.index("Restaurant")], -30.0)
+        return self.assertEqual(result.annotation[-1], 3000.0 - 75.5 - 30.0)
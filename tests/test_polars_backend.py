@@ -0,0 +1,158 @@
+"""
+Script to test the polars_backend.py query backend against the pandas computations.
+"""
+
+import unittest
+import pandas as pd
+from datetime import datetime
+from src.pkgs.backends import build_backend
+from src.pkgs.ingestion import read_expenses
+from src.pkgs.metrics_dataclasses import ExpenseMetric
+from src.pkgs.plots_dataclasses import ExpensePlot, ExpensePlotMonth
+from src.pkgs.polars_backend import PolarsBackend, pl
+from src.pkgs.sql_backend import SQLBackend
+
+with open("data/data_example.csv", "rb") as sample_file:
+    SAMPLE_DATA = sample_file.read()
+
+
+@unittest.skipUnless(pl is not None, "the polars package is not installed")
+class TestPolarsBackend(unittest.TestCase):
+    """
+    Test that the Polars queries return the same numbers as the pandas computations.
+
+    Methods
+    -------
+
+    test_build_backend()
+        Test that the Polars engine is built by the build_backend function.
+
+    test_polars_metrics()
+        Test the metrics computed with the Polars engine.
+
+    test_polars_plots()
+        Test the plot aggregations computed with the Polars engine.
+
+    test_uncategorized_parity()
+        Test that the rows without a category are expenses with pandas, SQLite and Polars.
+
+    test_malformed_date()
+        Test that the rows with a malformed date are left out by the SQL and Polars engines.
+    """
+
+    def setUp(self):
+        self.df = read_expenses(SAMPLE_DATA, "csv").sort_values(by=["date"])
+        self.past_date = datetime.strptime("2024-06-10", "%Y-%m-%d").date()
+        self.today_date = datetime.strptime("2024-07-01", "%Y-%m-%d").date()
+        self.backend = PolarsBackend.from_dataframe(self.df)
+
+    def test_build_backend(self):
+        """Assert if build_backend returns a Polars backend, and no backend for pandas."""
+        # 1.ARRANGE & 2.ACT
+        backend = build_backend("Polars", self.df)
+
+        # 3.ASSERT
+        self.assertIsInstance(backend, PolarsBackend)
+        return self.assertIsNone(build_backend("pandas", self.df))
+
+    def test_polars_metrics(self):
+        """Assert if the Polars engine computes the same metrics as pandas."""
+        # 1.ARRANGE
+        pandas_metric = ExpenseMetric(self.df, self.today_date, self.past_date)
+        polars_metric = ExpenseMetric(
+            self.df, self.today_date, self.past_date, backend=self.backend
+        )
+
+        # 2.ACT & 3.ASSERT
+        self.assertEqual(polars_metric.compute_metrics(), pandas_metric.compute_metrics())
+        self.assertEqual(polars_metric.compute_total_income(), pandas_metric.compute_total_income())
+        self.assertEqual(
+            polars_metric.compute_metrics_by_category("food"),
+            pandas_metric.compute_metrics_by_category("food"),
+        )
+        self.assertIsNone(
+            polars_metric.total_expenses_per_category_between(
+                self.past_date, self.today_date, "not a category"
+            )
+        )
+        return self.assertEqual(
+            polars_metric.total_expenses_timeframe(self.df, 2024, 6),
+            pandas_metric.total_expenses_timeframe(self.df, 2024, 6),
+        )
+
+    def test_polars_plots(self):
+        """Assert if the Polars engine computes the same plot aggregations as pandas."""
+        # 1.ARRANGE
+        pandas_plot = ExpensePlot(self.df, self.past_date, self.today_date)
+        polars_plot = ExpensePlot(self.df, self.past_date, self.today_date, backend=self.backend)
+        pandas_month = ExpensePlotMonth(self.df, 2024, 6)
+        polars_month = ExpensePlotMonth(self.df, 2024, 6, backend=self.backend)
+
+        # 2.ACT
+        pandas_stores = pandas_plot.store_totals(self.df, self.today_date, self.past_date)
+        polars_stores = polars_plot.store_totals(self.df, self.today_date, self.past_date)
+        pandas_year = pandas_month.year_category_totals(self.df, 2024).frame
+        polars_year = polars_month.year_category_totals(self.df, 2024).frame
+
+        # 3.ASSERT
+        pd.testing.assert_frame_equal(polars_stores.frame, pandas_stores.frame)
+        pd.testing.assert_series_equal(polars_year["value"], pandas_year["value"])
+        return self.assertEqual(
+            polars_month.waterfall_totals(self.df, 2024, 6),
+            pandas_month.waterfall_totals(self.df, 2024, 6),
+        )
+
+    def test_uncategorized_parity(self):
+        """Assert if a row with a NaN category is an expense for every engine."""
+        # 1.ARRANGE
+        self.df.loc[self.df.index[-1], "expense_category"] = float("nan")
+        pandas_metric = ExpenseMetric(self.df, self.today_date, self.past_date)
+        backends = [
+            PolarsBackend.from_dataframe(self.df),
+            SQLBackend.from_dataframe(self.df, engine="sqlite"),
+        ]
+
+        # 2.ACT
+        results = [
+            ExpenseMetric(
+                self.df, self.today_date, self.past_date, backend=backend
+            ).compute_metrics()
+            for backend in backends
+        ]
+
+        # 3.ASSERT
+        for result in results:
+            self.assertEqual(result, pandas_metric.compute_metrics())
+        return self.assertEqual(
+            ExpensePlot(self.df, self.past_date, self.today_date, backend=backends[0])
+            .category_totals(self.df, self.today_date, self.past_date)
+            .frame["value"]
+            .sum(),
+            ExpensePlot(self.df, self.past_date, self.today_date)
+            .category_totals(self.df, self.today_date, self.past_date)
+            .frame["value"]
+            .sum(),
+        )
+
+    def test_malformed_date(self):
+        """Assert if a ledger with a malformed date gives the pandas metrics with every engine."""
+        # 1.ARRANGE
+        malformed = SAMPLE_DATA.replace(b"01/06/2024;home", b"notadate;home", 1)
+        self.df = read_expenses(malformed, "csv").sort_values(by=["date"])
+        pandas_metric = ExpenseMetric(self.df, self.today_date, self.past_date)
+
+        # 2.ACT
+        backends = [build_backend("Polars", self.df), build_backend("SQL", self.df)]
+
+        # 3.ASSERT
+        self.assertTrue(self.df["date"].isna().any())
+        for backend in backends:
+            self.assertEqual(
+                ExpenseMetric(
+                    self.df, self.today_date, self.past_date, backend=backend
+                ).compute_metrics(),
+                pandas_metric.compute_metrics(),
+            )
+        return self.assertEqual(
+            backends[0].total_expenses_month(2024, 6), backends[1].total_expenses_month(2024, 6)
+        )
@@ -0,0 +1,52 @@
+"""
+Script to test the profiling.py hooks.
+"""
+
+import unittest
+from src.pkgs.profiling import get_profiler, profiled, start_rerun
+
+
+class TestProfiling(unittest.TestCase):
+    """
+    Test the counters collected by the profiler of the current rerun.
+
+    Methods
+    -------
+
+    test_profiled()
+        Test that the decorator records every call of the decorated function.
+
+    test_cache_hit_rates()
+        Test the hit rate computed from the cache counters.
+    """
+
+    def test_profiled(self):
+        """Assert if every call is recorded under the qualified name of the function."""
+        # 1.ARRANGE
+        start_rerun()
+
+        @profiled()
+        def hot_path(value):
+            return value * 2
+
+        # 2.ACT
+        results = [hot_path(value) for value in range(3)]
+        summary = get_profiler().summary()
+
+        # 3.ASSERT
+        self.assertEqual(results, [0, 2, 4])
+        record = summary.loc[summary["name"].str.endswith("hot_path")].iloc[0]
+        return self.assertEqual(record["calls"], 3)
+
+    def test_cache_hit_rates(self):
+        """Assert if a new rerun starts from empty counters and computes the hit rate per cache."""
+        # 1.ARRANGE
+        profiler = start_rerun()
+
+        # 2.ACT
+        for hit in [True, True, True, False]:
+            profiler.count_cache("ledger", hit)
+
+        # 3.ASSERT
+        self.assertTrue(profiler.summary().empty)
+        return self.assertEqual(profiler.cache_hit_rates(), {"ledger": 0.75})
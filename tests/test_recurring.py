@@ -0,0 +1,85 @@
+"""
+Script to test the recurring.py detection of the recurring expenses.
+"""
+
+import unittest
+import numpy as np
+import pandas as pd
+from datetime import date
+from src.pkgs.ingestion import sort_by_date
+from src.pkgs.metrics_dataclasses import ExpenseMetric
+from src.pkgs.recurring import RecurringDetector, period_label
+
+
+class TestRecurring(unittest.TestCase):
+    """
+    Test the RecurringDetector class, finding the regular charges of similar amounts.
+
+    Methods
+    -------
+
+    test_detect()
+        Test that the rent and the subscription are found, and the irregular expenses are not.
+
+    test_period_label()
+        Test the names of the periods.
+
+    test_compute_recurring_split()
+        Test the split of the expenses of a timeframe into recurring and one-off expenses.
+    """
+
+    def setUp(self):
+        months = pd.date_range(start="2024-01-01", periods=6, freq="MS")
+        weeks = pd.date_range(start="2024-01-03", periods=20, freq="7D")
+        rng = np.random.default_rng(0)
+        self.df = sort_by_date(
+            pd.DataFrame(
+                {
+                    "date": list(months) + list(weeks) + list(months + pd.Timedelta(days=9)),
+                    "expense_category": ["home & living"] * 6 + ["food"] * 20 + ["clothing"] * 6,
+                    "expense_type": ["rent"] * 6 + ["grocery"] * 20 + ["shoes"] * 6,
+                    # the groceries change a lot from one week to the other
+                    "value": [800.0] * 6 + list(rng.uniform(20, 150, 20)) + [80.0] * 6,
+                    # the shoes are bought from a different store every time
+                    "store": ["landlord"] * 6 + ["lidl"] * 20 + [f"shop {i}" for i in range(6)],
+                }
+            )
+        )
+
+    def test_detect(self):
+        """Assert if only the monthly rent is a recurring expense."""
+        # 1.ARRANGE & 2.ACT
+        result = RecurringDetector().detect(self.df)
+
+        # 3.ASSERT
+        self.assertEqual(result.series["store"].tolist(), ["landlord"])
+        self.assertEqual(result.series.loc[0, "period"], "monthly")
+        # the median interval between January and June is 31 days
+        self.assertEqual(result.series.loc[0, "next_date"], pd.Timestamp("2024-07-02"))
+        return self.assertEqual(
+            self.df.loc[result.rows, "expense_type"].unique().tolist(), ["rent"]
+        )
+
+    def test_period_label(self):
+        """Assert if the intervals are named after the closest usual period."""
+        # 1.ARRANGE, 2.ACT & 3.ASSERT
+        self.assertEqual(period_label(7), "weekly")
+        self.assertEqual(period_label(29), "monthly")
+        self.assertEqual(period_label(365), "yearly")
+        return self.assertEqual(period_label(50), "every 50 days")
+
+    def test_compute_recurring_split(self):
+        """Assert if the recurring and one-off expenses add up to the expenses of the timeframe."""
+        # 1.ARRANGE
+        recurring = RecurringDetector().detect(self.df)
+        metric = ExpenseMetric(self.df, today_date=date(2024, 2, 29), past_date=date(2024, 2, 1))
+
+        # 2.ACT
+        recurring_metric, one_off_metric = metric.compute_recurring_split(recurring.rows)
+
+        # 3.ASSERT
+        self.assertEqual(recurring_metric.value, 800.0)
+        return self.assertEqual(
+            recurring_metric.value + one_off_metric.value,
+            metric.total_expenses_between(date(2024, 2, 1), date(2024, 2, 29)),
+        )
@@ -0,0 +1,86 @@
+"""
+Script to test the search.py inverted index of the stores, expense types and cities.
+"""
+
+import unittest
+import numpy as np
+import pandas as pd
+from src.pkgs.search import SearchIndex, SearchQuery, parse_query
+
+
+class TestSearch(unittest.TestCase):
+    """
+    Test the parsing of the queries, and the rows found by the SearchIndex class.
+
+    Methods
+    -------
+
+    test_parse_query()
+        Test that the words, the cities, the years and the values of a query are told apart.
+
+    test_search()
+        Test that the rows found are those of a scan of the ledger.
+
+    test_search_prefix()
+        Test that a word matches the words it is the start of, in any column, once per row.
+    """
+
+    def setUp(self):
+        self.df = pd.DataFrame(
+            {
+                "date": pd.to_datetime(
+                    ["2023-12-30", "2024-01-02", "2024-01-05", "2024-02-01", "2024-02-03"]
+                ),
+                "expense_category": ["food", "food", "food", "apparel", "food"],
+                "expense_type": ["grocery", "grocery", "grocery", "shoes", "lidl snacks"],
+                "value": [80.0, 60.0, 20.0, 90.0, 55.0],
+                "store": ["Lidl", "Billa", "Lidl", "Zara", "Lidl"],
+                "city": ["Vienna", "Vienna", "Vienna", "Milan", None],
+            }
+        )
+        self.index = SearchIndex.from_dataframe(self.df)
+
+    def test_parse_query(self):
+        """Assert if the query of the example is parsed into two groups and the filters."""
+        # 1.ARRANGE & 2.ACT
+        query = parse_query("All Lidl or Billa in Vienna over 50 in 2024")
+
+        # 3.ASSERT
+        self.assertEqual(
+            query,
+            SearchQuery(
+                groups=[[("lidl", None), ("billa", None)], [("vienna", "city")]],
+                years=[2024],
+                min_value=50.0,
+            ),
+        )
+        with self.assertRaises(ValueError):
+            parse_query("lidl under")
+        return self.assertEqual(parse_query("below 12,5").max_value, 12.5)
+
+    def test_search(self):
+        """Assert if the query of the example finds the rows a scan of the ledger finds."""
+        # 1.ARRANGE
+        expected = (
+            self.df["store"].isin(["Lidl", "Billa"])
+            & (self.df["city"] == "Vienna")
+            & (self.df["value"] > 50)
+            & (self.df["date"].dt.year == 2024)
+        )
+
+        # 2.ACT
+        rows = self.index.search("lidl or billa in vienna over 50 in 2024")
+
+        # 3.ASSERT
+        np.testing.assert_array_equal(rows, np.flatnonzero(expected))
+        return self.assertEqual(self.index.search("ikea").tolist(), [])
+
+    def test_search_prefix(self):
+        """Assert if "li" finds the Lidl rows, and the Lidl snacks only once."""
+        # 1.ARRANGE & 2.ACT
+        rows = self.index.search("li")
+
+        # 3.ASSERT
+        self.assertEqual(rows.tolist(), [0, 2, 4])
+        # "in" restricts the word to the cities
+        return self.assertEqual(self.index.search("in mil").tolist(), [3])
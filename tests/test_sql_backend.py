@@ -0,0 +1,122 @@
+"""
+Script to test the sql_backend.py query backend against the pandas computations.
+"""
+
+import unittest
+import pandas as pd
+from datetime import datetime
+from src.pkgs.ingestion import read_expenses
+from src.pkgs.metrics_dataclasses import ExpenseMetric
+from src.pkgs.plots_dataclasses import ExpensePlot, ExpensePlotMonth
+from src.pkgs.sql_backend import SQLBackend, duckdb
+
+with open("data/data_example.csv", "rb") as sample_file:
+    SAMPLE_DATA = sample_file.read()
+
+
+class TestSQLBackend(unittest.TestCase):
+    """
+    Test that the SQL queries return the same numbers as the pandas computations.
+
+    Methods
+    -------
+
+    test_sqlite_metrics()
+        Test the metrics computed with the SQLite engine.
+
+    test_sqlite_plots()
+        Test the plot aggregations computed with the SQLite engine.
+
+    test_duckdb_metrics()
+        Test the metrics computed with the DuckDB engine, when it is installed.
+
+    test_sqlite_uncategorized()
+        Test that the rows without a category are counted as expenses, as with pandas.
+
+    test_sqlite_malformed_date()
+        Test that the rows with a malformed date are left out of the totals, as with pandas.
+    """
+
+    def setUp(self):
+        self.df = read_expenses(SAMPLE_DATA, "csv").sort_values(by=["date"])
+        self.past_date = datetime.strptime("2024-06-10", "%Y-%m-%d").date()
+        self.today_date = datetime.strptime("2024-07-01", "%Y-%m-%d").date()
+
+    def assert_same_metrics(self, backend: SQLBackend):
+        pandas_metric = ExpenseMetric(self.df, self.today_date, self.past_date)
+        sql_metric = ExpenseMetric(self.df, self.today_date, self.past_date, backend=backend)
+
+        self.assertEqual(sql_metric.compute_metrics(), pandas_metric.compute_metrics())
+        self.assertEqual(sql_metric.compute_total_income(), pandas_metric.compute_total_income())
+        self.assertEqual(
+            sql_metric.compute_metrics_by_category("food"),
+            pandas_metric.compute_metrics_by_category("food"),
+        )
+        self.assertEqual(
+            sql_metric.total_expenses_timeframe(self.df, 2024, 6),
+            pandas_metric.total_expenses_timeframe(self.df, 2024, 6),
+        )
+
+    def test_sqlite_metrics(self):
+        """Assert if the SQLite engine computes the same metrics as pandas."""
+        # 1.ARRANGE
+        backend = SQLBackend.from_dataframe(self.df, engine="sqlite")
+
+        # 2.ACT & 3.ASSERT
+        return self.assert_same_metrics(backend)
+
+    def test_sqlite_plots(self):
+        """Assert if the SQLite engine computes the same plot aggregations as pandas."""
+        # 1.ARRANGE
+        backend = SQLBackend.from_dataframe(self.df, engine="sqlite")
+        pandas_plot = ExpensePlot(self.df, self.past_date, self.today_date)
+        sql_plot = ExpensePlot(self.df, self.past_date, self.today_date, backend=backend)
+        pandas_month = ExpensePlotMonth(self.df, 2024, 6)
+        sql_month = ExpensePlotMonth(self.df, 2024, 6, backend=backend)
+
+        # 2.ACT
+        pandas_totals = pandas_plot.category_totals(self.df, self.today_date, self.past_date)
+        sql_totals = sql_plot.category_totals(self.df, self.today_date, self.past_date)
+        pandas_year = pandas_month.year_category_totals(self.df, 2024).frame
+        sql_year = sql_month.year_category_totals(self.df, 2024).frame
+
+        # 3.ASSERT
+        pd.testing.assert_frame_equal(sql_totals.frame, pandas_totals.frame)
+        pd.testing.assert_series_equal(
+            sql_year["value"], pandas_year["value"].reset_index(drop=True)
+        )
+        self.assertEqual(
+            sql_month.waterfall_totals(self.df, 2024, 6),
+            pandas_month.waterfall_totals(self.df, 2024, 6),
+        )
+
+    @unittest.skipUnless(duckdb is not None, "the duckdb package is not installed")
+    def test_duckdb_metrics(self):
+        """Assert if the DuckDB engine computes the same metrics as pandas."""
+        # 1.ARRANGE
+        backend = SQLBackend.from_dataframe(self.df, engine="duckdb")
+
+        # 2.ACT & 3.ASSERT
+        return self.assert_same_metrics(backend)
+
+    def test_sqlite_uncategorized(self):
+        """Assert if a row without a category is in the total expenses, as with pandas."""
+        # 1.ARRANGE
+        self.df.loc[self.df.index[-1], "expense_category"] = None
+        backend = SQLBackend.from_dataframe(self.df, engine="sqlite")
+
+        # 2.ACT & 3.ASSERT
+        return self.assert_same_metrics(backend)
+
+    def test_sqlite_malformed_date(self):
+        """Assert if a ledger with a malformed date is loaded, and its row left out of the totals."""
+        # 1.ARRANGE
+        malformed = SAMPLE_DATA.replace(b"01/06/2024;home", b"notadate;home", 1)
+        self.df = read_expenses(malformed, "csv").sort_values(by=["date"])
+
+        # 2.ACT
+        backend = SQLBackend.from_dataframe(self.df, engine="sqlite")
+
+        # 3.ASSERT
+        self.assertTrue(self.df["date"].isna().any())
+        return self.assert_same_metrics(backend)
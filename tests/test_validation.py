@@ -0,0 +1,85 @@
+"""
+Script to test the validation.py checks of the uploaded ledger.
+"""
+
+import unittest
+import numpy as np
+import pandas as pd
+from src.pkgs.ingestion import IngestionJob
+from src.pkgs.validation import SchemaError, check_sample, coerce_values
+
+HEADER = b"date;expense_category;expense_type;value;store;city\n"
+
+
+class TestValidation(unittest.TestCase):
+    """
+    Test the checks of the header and of the first rows, and the coercion of the values.
+
+    Methods
+    -------
+
+    test_check_sample()
+        Test that a missing column, or a column without any valid value, is rejected.
+
+    test_coerce_values()
+        Test that the decimal commas are accepted, and the other strings reported.
+
+    test_job_report()
+        Test that the malformed values of a file are reported with their line, and left out.
+    """
+
+    def test_check_sample(self):
+        """Assert if the samples that are not a ledger raise a SchemaError."""
+        # 1.ARRANGE
+        sample = pd.DataFrame(
+            {
+                "date": ["01/06/2024"],
+                "expense_category": ["food"],
+                "expense_type": ["grocery"],
+                "value": ["12.5"],
+                "store": ["lidl"],
+            }
+        )
+
+        # 2.ACT & 3.ASSERT
+        check_sample(sample)
+        # the categories may be missing only when the rules fill them in
+        check_sample(sample.drop(columns=["expense_category"]), categorized=True)
+        with self.assertRaises(SchemaError):
+            check_sample(sample.drop(columns=["expense_category"]))
+        with self.assertRaises(SchemaError):
+            check_sample(sample.assign(value=["lidl"]))
+        with self.assertRaises(SchemaError):
+            check_sample(sample.assign(date=["12.5"]))
+
+    def test_coerce_values(self):
+        """Assert if the values with a decimal comma are numbers, and the text is malformed."""
+        # 1.ARRANGE
+        values = pd.Series(["12,5", "3", None, "n/a"], dtype="object")
+
+        # 2.ACT
+        coerced, malformed = coerce_values(values)
+
+        # 3.ASSERT
+        np.testing.assert_array_equal(coerced.to_numpy(), [12.5, 3.0, np.nan, np.nan])
+        return self.assertEqual(malformed.tolist(), [False, False, False, True])
+
+    def test_job_report(self):
+        """Assert if the job reports the line of each malformed value, and leaves its row out."""
+        # 1.ARRANGE
+        data = HEADER + (
+            b"01/06/2024;food;grocery;20;lidl;vienna\n"
+            b"02/06/2024;food;grocery;abc;lidl;vienna\n"
+            b"31/02/2024;food;grocery;5;lidl;vienna\n"
+        )
+        job = IngestionJob(data, "csv", chunksize=2)
+
+        # 2.ACT
+        job.start().wait(timeout=30)
+
+        # 3.ASSERT
+        self.assertIsNone(job.error)
+        self.assertEqual(job.report.counts, {"value": 1, "date": 1})
+        self.assertEqual(job.report.frame()["line"].tolist(), [3, 4])
+        # only the first row has both a date and a value
+        return self.assertEqual(job.partial_category_totals().to_dict(), {"food": 20.0})